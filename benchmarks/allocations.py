@@ -0,0 +1,101 @@
+# Description: Measures the memory allocated for each message on the publish and subscribe paths, using tracemalloc.  For each case, the
+# result is the peak memory allocated while handling one message (bytes_per_message), also expressed as a number of copies of the payload.
+
+import argparse
+import tracemalloc
+import vizier.mqttinterface as mqtt
+import vizier.node as vizier_node
+import vizier.utils as utils
+from common import write_results
+
+_batch_size = 16
+
+
+def _measure(f, payload_size, repetitions):
+    """Measures the peak memory allocated by calls to f."""
+
+    # Warm up, so that caches and lazily created objects are not counted
+    f()
+
+    total = 0
+    for _ in range(repetitions):
+        tracemalloc.reset_peak()
+        current, _ = tracemalloc.get_traced_memory()
+        f()
+        _, peak = tracemalloc.get_traced_memory()
+        total += peak - current
+
+    bytes_per_message = total / repetitions
+    return {'bytes_per_message': bytes_per_message, 'copies': round(bytes_per_message / payload_size, 2)}
+
+
+def _loopback_nodes():
+    """Creates a publishing and a subscribing node on a loopback bus."""
+
+    bus = mqtt.LoopbackBus()
+    publisher = vizier_node.Node(None, None, {'end_point': 'pub', 'links': {'/stream': {'type': 'STREAM'}}, 'requests': []}, loopback=bus)
+    subscriber = vizier_node.Node(None, None, {'end_point': 'sub', 'links': {}, 'requests': [{'link': 'pub/stream', 'type': 'STREAM'}]},
+                                  loopback=bus)
+    publisher.start()
+    subscriber.start()
+
+    return publisher, subscriber
+
+
+def run(payload_sizes, repetitions):
+    """Runs the benchmark.
+
+    Args:
+        payload_sizes (list): Sizes in bytes of the payloads to measure.
+        repetitions (int): Number of messages measured for each case.
+
+    Returns:
+        A dict of results for each payload size.
+
+    """
+
+    publisher, subscriber = _loopback_nodes()
+    received = []
+    subscriber.subscribe_with_callback('pub/stream', lambda x: received.append(len(x)))
+    subscriber.subscribe_with_callback('pub/stream', lambda x: received.append(len(x)), as_memoryview=True)
+
+    results = {}
+    tracemalloc.start()
+    try:
+        for size in payload_sizes:
+            payload = bytes(size)
+            view = memoryview(payload)
+            batch = utils.create_batch([bytes(size // _batch_size)] * _batch_size)
+
+            results[str(size)] = {
+                # Payloads that Paho accepts are passed through, and other buffers are staged in one copy
+                'mqtt_staging_bytes': _measure(lambda: mqtt._as_payload(payload), size, repetitions),
+                'mqtt_staging_memoryview': _measure(lambda: mqtt._as_payload(view), size, repetitions),
+                # Unpacking a batch copies its messages, unless the batch is a memoryview
+                'parse_batch_bytes': _measure(lambda: utils.parse_batch(batch), len(batch), repetitions),
+                'parse_batch_memoryview': _measure(lambda: utils.parse_batch(memoryview(batch)), len(batch), repetitions),
+                # Messages between nodes on a loopback bus are passed by reference
+                'loopback_publish': _measure(lambda: publisher.publish('pub/stream', view), size, repetitions),
+            }
+    finally:
+        tracemalloc.stop()
+        subscriber.stop()
+        publisher.stop()
+
+    return results
+
+
+def main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-sizes', type=int, nargs='+', help='Payload sizes in bytes', default=[1024, 64*1024, 1024*1024])
+    parser.add_argument('-repetitions', type=int, help='Number of messages measured for each case', default=100)
+    parser.add_argument('-output', help='File to which the JSON results are written', default=None)
+
+    args = parser.parse_args()
+
+    write_results({'allocations': run(args.sizes, args.repetitions)}, args.output)
+
+
+if(__name__ == '__main__'):
+    main()
@@ -0,0 +1,102 @@
+# Description: Utilities shared by the benchmarks
+
+import json
+import platform
+import shutil
+import socket
+import subprocess
+import time
+import vizier.broker as broker
+
+
+class LocalBroker():
+    """A broker on this host for the benchmarks.  Runs mosquitto if it is installed, and otherwise a vizier.broker.Broker.
+
+    Attributes:
+        port (int): Port on which the broker listens.
+        name (str): Name of the broker ('mosquitto' or 'vizier').
+
+    """
+
+    def __init__(self, port):
+        self.port = port
+        self._mosquitto = shutil.which('mosquitto')
+        self.name = 'vizier' if self._mosquitto is None else 'mosquitto'
+        self._broker = None
+
+    def _wait_listening(self, timeout=5):
+        """Waits until the broker accepts connections."""
+
+        deadline = time.time() + timeout
+        while True:
+            try:
+                socket.create_connection(('localhost', self.port), timeout=timeout).close()
+                return
+            except OSError:
+                if(time.time() > deadline):
+                    raise RuntimeError('Broker did not start on port ({})'.format(self.port))
+                time.sleep(0.01)
+
+    def start(self):
+        """Starts the broker, returning once it is listening."""
+
+        if(self._mosquitto is None):
+            self._broker = broker.Broker(port=self.port)
+            self._broker.start()
+        else:
+            self._broker = subprocess.Popen([self._mosquitto, '-p', str(self.port)], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            self._wait_listening()
+
+    def stop(self):
+        """Stops the broker, closing all of its connections."""
+
+        if(self._mosquitto is None):
+            self._broker.stop()
+        else:
+            self._broker.terminate()
+            self._broker.wait()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+
+def summarize(samples):
+    """Summarizes latency samples.
+
+    Args:
+        samples (list): Latencies in seconds.
+
+    Returns:
+        A dict containing the number of samples, and their mean, 50th and 99th percentiles and maximum in milliseconds.
+
+    """
+
+    ordered = sorted(samples)
+
+    def percentile(p):
+        return 1000 * ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+    return {'count': len(ordered), 'mean_ms': 1000 * sum(ordered) / len(ordered), 'p50_ms': percentile(0.5), 'p99_ms': percentile(0.99),
+            'max_ms': 1000 * ordered[-1]}
+
+
+def write_results(results, output=None):
+    """Writes the results of benchmarks as JSON, along with a description of the environment in which they ran.
+
+    Args:
+        results (dict): Results of the benchmarks.
+        output (str, optional): File to which the results are written.  If None, they are printed.
+
+    """
+
+    results = dict(results, environment={'python': platform.python_version(), 'platform': platform.platform(), 'time': time.time()})
+
+    if(output is None):
+        print(json.dumps(results, indent=2))
+    else:
+        with open(output, 'w') as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,65 @@
+# Description: Measures the time taken by Vizier.start to discover the nodes on the network, as the number of nodes grows
+
+import argparse
+import time
+import vizier.node as vizier_node
+import vizier.vizier as vizier
+from common import LocalBroker, write_results
+
+
+def run(port, node_counts=(1, 10, 50), repetitions=3):
+    """Runs the benchmark against a broker on localhost.
+
+    Args:
+        port (int): Port of the broker.
+        node_counts (list): Numbers of nodes to discover.
+        repetitions (int): Number of times Vizier.start is timed for each number of nodes.
+
+    Returns:
+        A dict containing, for each number of nodes, the mean and maximum time in seconds taken by Vizier.start, and the number of
+        nodes discovered.
+
+    """
+
+    results = {}
+    for count in node_counts:
+        names = ['node_{}'.format(x) for x in range(count)]
+        nodes = [vizier_node.Node('localhost', port, {'end_point': x, 'links': {'/data': {'type': 'DATA'}, '/stream': {'type': 'STREAM'}},
+                                                      'requests': []}) for x in names]
+        for x in nodes:
+            x.start()
+
+        samples = []
+        discovered = 0
+        try:
+            for _ in range(repetitions):
+                v = vizier.Vizier('localhost', port, names)
+                start = time.perf_counter()
+                v.start()
+                samples.append(time.perf_counter() - start)
+                discovered = len(v._nodes_to_descriptors)
+                v.stop()
+        finally:
+            for x in nodes:
+                x.stop()
+
+        results[str(count)] = {'mean_s': sum(samples) / len(samples), 'max_s': max(samples), 'discovered': discovered}
+
+    return results
+
+
+def main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-port', type=int, help='Port of the local broker', default=1885)
+    parser.add_argument('-nodes', type=int, nargs='+', help='Numbers of nodes to discover', default=[1, 10, 50])
+    parser.add_argument('-output', help='File to which the JSON results are written', default=None)
+
+    args = parser.parse_args()
+
+    with LocalBroker(args.port) as broker:
+        write_results({'broker': broker.name, 'discovery': run(args.port, node_counts=args.nodes)}, args.output)
+
+
+if(__name__ == '__main__'):
+    main()
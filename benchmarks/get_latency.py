@@ -0,0 +1,66 @@
+# Description: Measures the latency of GET requests through Node.get.  Each request transfers the full body of the link, since the
+# requester's cache of conditional GET responses is cleared before it
+
+import argparse
+import time
+import vizier.node as vizier_node
+from common import LocalBroker, summarize, write_results
+
+
+def run(port, requests=1000, payload_sizes=(16, 64*1024)):
+    """Runs the benchmark against a broker on localhost.
+
+    Args:
+        port (int): Port of the broker.
+        requests (int): Number of GET requests made for each payload size.
+        payload_sizes (list): Sizes in bytes of the responses.
+
+    Returns:
+        A dict of latency summaries (see common.summarize) for each payload size, including the number of failed requests.
+
+    """
+
+    provider = vizier_node.Node('localhost', port, {'end_point': 'provider', 'links': {'/data': {'type': 'DATA'}}, 'requests': []})
+    requester = vizier_node.Node('localhost', port, {'end_point': 'requester', 'links': {},
+                                                     'requests': [{'link': 'provider/data', 'type': 'DATA', 'required': True}]})
+    provider.start()
+    requester.start()
+
+    results = {}
+    try:
+        for size in payload_sizes:
+            provider.put('provider/data', bytes(size))
+
+            samples = []
+            failures = 0
+            for _ in range(requests):
+                # Forget the cached response, so that the provider sends the body rather than a 'not modified' response
+                requester._get_cache.clear()
+                start = time.perf_counter()
+                if(requester.get('provider/data', timeout=1, attempts=5) is None):
+                    failures += 1
+                samples.append(time.perf_counter() - start)
+
+            results[str(size)] = dict(summarize(samples), failures=failures)
+    finally:
+        requester.stop()
+        provider.stop()
+
+    return results
+
+
+def main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-port', type=int, help='Port of the local broker', default=1885)
+    parser.add_argument('-requests', type=int, help='Number of GET requests for each payload size', default=1000)
+    parser.add_argument('-output', help='File to which the JSON results are written', default=None)
+
+    args = parser.parse_args()
+
+    with LocalBroker(args.port) as broker:
+        write_results({'broker': broker.name, 'get_latency': run(args.port, requests=args.requests)}, args.output)
+
+
+if(__name__ == '__main__'):
+    main()
@@ -0,0 +1,68 @@
+# Description: Measures the time taken for GET requests to succeed again after the broker restarts
+
+import argparse
+import time
+import vizier.node as vizier_node
+from common import LocalBroker, summarize, write_results
+
+
+def run(broker, restarts=3, timeout=30):
+    """Runs the benchmark, restarting the given broker.
+
+    Args:
+        broker (common.LocalBroker): The running broker.
+        restarts (int): Number of times the broker is restarted.
+        timeout (double): Maximum time in seconds to wait for recovery after each restart.
+
+    Returns:
+        A dict summarizing the time between each restart of the broker and the first successful GET request (see common.summarize), and
+        the number of restarts after which the nodes did not recover.
+
+    """
+
+    provider = vizier_node.Node('localhost', broker.port, {'end_point': 'provider', 'links': {'/data': {'type': 'DATA'}}, 'requests': []})
+    requester = vizier_node.Node('localhost', broker.port, {'end_point': 'requester', 'links': {},
+                                                            'requests': [{'link': 'provider/data', 'type': 'DATA', 'required': True}]})
+    provider.start()
+    requester.start()
+    provider.put('provider/data', b'data')
+
+    samples = []
+    failures = 0
+    try:
+        for _ in range(restarts):
+            broker.stop()
+            broker.start()
+            start = time.perf_counter()
+
+            # Failed requests resolve to None
+            while requester.get('provider/data', timeout=0.05, attempts=1) is None:
+                if(time.perf_counter() - start > timeout):
+                    failures += 1
+                    break
+            else:
+                samples.append(time.perf_counter() - start)
+    finally:
+        requester.stop()
+        provider.stop()
+
+    results = summarize(samples) if samples else {'count': 0}
+    results['failures'] = failures
+    return results
+
+
+def main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-port', type=int, help='Port of the local broker', default=1885)
+    parser.add_argument('-restarts', type=int, help='Number of times the broker is restarted', default=3)
+    parser.add_argument('-output', help='File to which the JSON results are written', default=None)
+
+    args = parser.parse_args()
+
+    with LocalBroker(args.port) as broker:
+        write_results({'broker': broker.name, 'reconnect': run(broker, restarts=args.restarts)}, args.output)
+
+
+if(__name__ == '__main__'):
+    main()
@@ -0,0 +1,84 @@
+# Description: Runs all of the benchmarks against a local broker and writes their results as JSON.  Given the results of an earlier run
+# (e.g., of the previous release), also reports the measurements that regressed.
+#
+# Usage: python benchmarks/run.py -output results.json -baseline previous_results.json
+
+import argparse
+import json
+import sys
+import allocations
+import discovery
+import get_latency
+import reconnect
+import throughput
+from common import LocalBroker, write_results
+
+
+def _regressions(results, baseline, tolerance, path=''):
+    """Finds the measurements that are worse than in the baseline by more than the tolerance (a fraction).  Times (keys ending in _ms or
+    _s) and allocations (bytes_per_message) regress when they grow, and rates (keys ending in _per_second) regress when they shrink.  Maxima
+    are too noisy to compare.
+    """
+
+    found = []
+    for key, value in results.items():
+        if(key not in baseline):
+            continue
+
+        name = path + '/' + key
+        if(isinstance(value, dict)):
+            found.extend(_regressions(value, baseline[key], tolerance, name))
+        elif(isinstance(value, (int, float)) and baseline[key]):
+            change = value / baseline[key] - 1
+            if(key.startswith('max_')):
+                regressed = False
+            elif(key.endswith(('_ms', '_s')) or key == 'bytes_per_message'):
+                regressed = change > tolerance
+            elif(key.endswith('_per_second')):
+                regressed = change < -tolerance
+            else:
+                regressed = False
+
+            if(regressed):
+                found.append({'measurement': name, 'baseline': baseline[key], 'value': value, 'change': change})
+
+    return found
+
+
+def main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-port', type=int, help='Port of the local broker', default=1885)
+    parser.add_argument('-output', help='File to which the JSON results are written', default=None)
+    parser.add_argument('-baseline', help='JSON results of an earlier run, against which the results are compared', default=None)
+    parser.add_argument('-tolerance', type=float, help='Fraction by which a measurement may be worse than the baseline', default=0.2)
+
+    args = parser.parse_args()
+
+    with LocalBroker(args.port) as broker:
+        results = {
+            'broker': broker.name,
+            'get_latency': get_latency.run(args.port),
+            'throughput': throughput.run(args.port),
+            'discovery': discovery.run(args.port),
+            'reconnect': reconnect.run(broker),
+            'allocations': allocations.run([1024, 64*1024, 1024*1024], 100),
+        }
+
+    write_results(results, args.output)
+
+    if(args.baseline is not None):
+        with open(args.baseline, 'r') as f:
+            regressions = _regressions(results, json.load(f), args.tolerance)
+
+        for x in regressions:
+            print('Regression in {measurement}: {baseline:.4g} -> {value:.4g} ({change:+.0%})'.format(**x), file=sys.stderr)
+
+        if(regressions):
+            return 1
+
+    return 0
+
+
+if(__name__ == '__main__'):
+    sys.exit(main())
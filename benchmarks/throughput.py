@@ -0,0 +1,88 @@
+# Description: Measures the throughput of data published on a STREAM link and received by a subscribed node
+
+import argparse
+import threading
+import time
+import vizier.node as vizier_node
+from common import LocalBroker, write_results
+
+
+def run(port, messages=10000, payload_sizes=(64, 1024, 16*1024, 256*1024), timeout=30):
+    """Runs the benchmark against a broker on localhost.
+
+    Args:
+        port (int): Port of the broker.
+        messages (int): Number of messages published for each payload size.
+        payload_sizes (list): Sizes in bytes of the published messages.
+        timeout (double): Maximum time in seconds to wait for the messages of each payload size.
+
+    Returns:
+        A dict containing, for each payload size, the number of messages received and the rate at which they were received.
+
+    """
+
+    publisher = vizier_node.Node('localhost', port, {'end_point': 'publisher', 'links': {'/stream': {'type': 'STREAM'}}, 'requests': []})
+    subscriber = vizier_node.Node('localhost', port, {'end_point': 'subscriber', 'links': {},
+                                                      'requests': [{'link': 'publisher/stream', 'type': 'STREAM'}]})
+    publisher.start()
+    subscriber.start()
+
+    lock = threading.Lock()
+    done = threading.Event()
+    received = 0
+    expected = 0
+
+    def on_message(msg):
+        nonlocal received
+        with lock:
+            received += 1
+            if(received == expected):
+                done.set()
+
+    subscriber.subscribe_with_callback('publisher/stream', on_message)
+    # Wait for the broker to process the subscription
+    time.sleep(0.5)
+
+    results = {}
+    try:
+        for size in payload_sizes:
+            with lock:
+                received = 0
+                expected = messages
+            done.clear()
+
+            payload = bytes(size)
+            start = time.perf_counter()
+            for _ in range(messages):
+                publisher.publish('publisher/stream', payload)
+            published = time.perf_counter() - start
+
+            done.wait(timeout=timeout)
+            elapsed = time.perf_counter() - start
+
+            with lock:
+                count = received
+            results[str(size)] = {'published': messages, 'received': count, 'publish_rate': messages / published,
+                                  'messages_per_second': count / elapsed, 'megabytes_per_second': count * size / elapsed / 1e6}
+    finally:
+        subscriber.stop()
+        publisher.stop()
+
+    return results
+
+
+def main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-port', type=int, help='Port of the local broker', default=1885)
+    parser.add_argument('-messages', type=int, help='Number of messages for each payload size', default=10000)
+    parser.add_argument('-output', help='File to which the JSON results are written', default=None)
+
+    args = parser.parse_args()
+
+    with LocalBroker(args.port) as broker:
+        write_results({'broker': broker.name, 'throughput': run(args.port, messages=args.messages)}, args.output)
+
+
+if(__name__ == '__main__'):
+    main()
@@ -37,6 +37,9 @@ def main():
     # Get the links for Publishing/Subscribing
     publishable_link = list(node.publishable_links)[0]
 
+    # Send the samples from the tight loop below in batches
+    node.enable_batching(publishable_link)
+
     tick = time.time()
     while time.time()-tick<=10:
         output = 'Seconds since start: ' + str(time.time()-tick)
@@ -36,7 +36,8 @@ def main():
     # Get the links for Publishing/Subscribing
     publishable_link = list(node.publishable_links)[0]
     subscribable_link = list(node.subscribable_links)[0]
-    msg_queue = node.subscribe(subscribable_link)
+    latest = node.subscribe_latest(subscribable_link)
+    seq = 0
 
     # Control stuffs
     ref = 5.0
@@ -44,8 +45,11 @@ def main():
     print('\n')
     while abs(ref - state) >= 0.001:
         try:
-            message = msg_queue.get(timeout=1).decode(encoding='UTF-8')
-            state = float(message)
+            sample = latest.wait_newer(seq, timeout=1)
+            if(sample is None):
+                continue
+            message, _, seq = sample
+            state = float(message.decode(encoding='UTF-8'))
         except KeyboardInterrupt:
             break
         except Exception:
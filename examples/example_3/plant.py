@@ -8,6 +8,7 @@ import json
 import argparse
 import random
 import vizier.node as vizier_node
+import vizier.mqttinterface as mqtt
 
 
 def main():
@@ -39,7 +40,8 @@ def main():
     # Get the links for Publishing/Subscribing
     publishable_link = list(node.publishable_links)[0]
     subscribable_link = list(node.subscribable_links)[0]
-    msg_queue = node.subscribe(subscribable_link)
+    # Only the most recent input matters, so older inputs are discarded
+    msg_queue = node.subscribe(subscribable_link, policy=mqtt.DropPolicy.LATEST)
 
     # Set the initial condition
     state = 10*random.random() - 5
@@ -18,6 +18,11 @@ REQUIRED = [
     'graphviz'
 ]
 
+# What packages are optional?
+EXTRAS = {
+    'msgpack': ['msgpack'],
+}
+
 # The rest you shouldn't have to touch too much :)
 # ------------------------------------------------
 # Except, perhaps the License and Trove Classifiers!
@@ -78,6 +83,7 @@ setup(
     url=URL,
     packages=find_packages(exclude=('tests',)),
     install_requires=REQUIRED,
+    extras_require=EXTRAS,
     include_package_data=True,
     license='MIT',
     classifiers=[
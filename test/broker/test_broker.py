@@ -0,0 +1,113 @@
+from vizier import broker
+from vizier import mqttinterface
+import paho.mqtt.client as paho
+import queue
+import time
+import unittest
+
+
+class TestBroker(unittest.TestCase):
+
+    def setUp(self):
+        self.broker = broker.Broker(port=0)
+        self.broker.start()
+
+        self.client_one = mqttinterface.MQTTInterface(port=self.broker.port, host='localhost')
+        self.client_two = mqttinterface.MQTTInterface(port=self.broker.port, host='localhost')
+        self.client_one.start(timeout=5)
+        self.client_two.start(timeout=5)
+
+    def test_publish(self):
+        q_one = self.client_one.subscribe('test/+')
+        q_two = self.client_one.subscribe('test/#')
+        q_three = self.client_one.subscribe('other')
+        # Messages from another client are only delivered once the broker has processed the subscriptions
+        time.sleep(0.2)
+        self.client_two.send_message('test/topic', b'test')
+
+        self.assertEqual(q_one.get(timeout=5), b'test')
+        self.assertEqual(q_two.get(timeout=5), b'test')
+        self.assertTrue(q_three.empty())
+
+    def test_retained(self):
+        received = queue.Queue()
+        client = paho.Client(client_id='retained')
+        client.on_message = lambda c, u, msg: received.put((msg.topic, msg.payload, msg.retain))
+        client.connect('localhost', self.broker.port)
+        client.loop_start()
+
+        try:
+            client.publish('retained/a', b'a', qos=1, retain=True).wait_for_publish()
+            client.publish('retained/b', b'b', qos=1, retain=True).wait_for_publish()
+            # An empty payload removes the retained message
+            client.publish('retained/b', b'', qos=1, retain=True).wait_for_publish()
+
+            client.subscribe('retained/#', qos=1)
+            self.assertEqual(received.get(timeout=5), ('retained/a', b'a', True))
+            time.sleep(0.2)
+            self.assertTrue(received.empty())
+        finally:
+            client.loop_stop()
+            client.disconnect()
+
+    def test_will(self):
+        q = self.client_one.subscribe('will/topic')
+        time.sleep(0.2)
+
+        client = paho.Client(client_id='will')
+        client.will_set('will/topic', b'gone')
+        client.connect('localhost', self.broker.port)
+        client.loop_start()
+        time.sleep(0.2)
+
+        # Closing the socket without a DISCONNECT packet publishes the will
+        client.loop_stop()
+        client.socket().close()
+
+        self.assertEqual(q.get(timeout=5), b'gone')
+
+    def tearDown(self):
+        self.client_one.stop()
+        self.client_two.stop()
+        self.broker.stop()
+
+
+class TestSubscriptionTrie(unittest.TestCase):
+
+    def test_match(self):
+        trie = broker._SubscriptionTrie()
+        trie.add('a/+', 'one', 0)
+        trie.add('a/#', 'one', 1)
+        trie.add('#', 'two', 0)
+        trie.add('a/b', 'three', 0)
+
+        self.assertEqual(trie.match('a/b'), {'one': 1, 'two': 0, 'three': 0})
+        self.assertEqual(trie.match('a'), {'one': 1, 'two': 0})
+        self.assertEqual(trie.match('$SYS/a'), {})
+
+        trie.remove('a/b', 'three')
+        trie.remove('a/#', 'one')
+        self.assertEqual(trie.match('a/b'), {'one': 0, 'two': 0})
+        self.assertNotIn('b', trie._root.children['a'].children)
+
+
+class TestRetainedStore(unittest.TestCase):
+
+    def test_match(self):
+        store = broker._RetainedStore()
+        store.set('a', b'1', 0)
+        store.set('a/b', b'2', 0)
+        store.set('a/b/c', b'3', 0)
+        store.set('$SYS/a', b'4', 0)
+
+        def topics(channel):
+            return sorted(x[0] for x in store.match(channel))
+
+        self.assertEqual(topics('a/#'), ['a', 'a/b', 'a/b/c'])
+        self.assertEqual(topics('a/+'), ['a/b'])
+        self.assertEqual(topics('#'), ['a', 'a/b', 'a/b/c'])
+        self.assertEqual(topics('$SYS/#'), ['$SYS/a'])
+
+        store.set('a/b/c', b'', 0)
+        self.assertEqual(topics('a/#'), ['a', 'a/b'])
+        self.assertEqual(store.count, 3)
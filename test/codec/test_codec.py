@@ -0,0 +1,26 @@
+import unittest
+import vizier.codec as codec
+
+
+class TestCodec(unittest.TestCase):
+
+    def setUp(self):
+        self.message = {'status': 200, 'body': b'\x00\x01data', 'type': 'DATA'}
+
+    def test_json(self):
+        json_codec = codec.get_codec('json')
+        encoded = json_codec.encode(self.message)
+
+        self.assertIs(codec.detect_codec(encoded), json_codec)
+        self.assertEqual(json_codec.decode(encoded), self.message)
+
+    @unittest.skipIf(codec.msgpack is None, 'msgpack is not installed')
+    def test_msgpack(self):
+        msgpack_codec = codec.get_codec('msgpack')
+        encoded = msgpack_codec.encode(self.message)
+
+        self.assertIs(codec.detect_codec(encoded), msgpack_codec)
+        self.assertEqual(msgpack_codec.decode(encoded), self.message)
+
+    def test_unknown(self):
+        self.assertRaises(ValueError, codec.get_codec, 'xml')
@@ -1,14 +1,31 @@
+from vizier import broker
 from vizier import mqttinterface
+import asyncio
+import threading
 import time
 import unittest
 import concurrent.futures as futures
 
 
+# The tests run against a broker on an ephemeral port, so no external broker is needed
+_broker = None
+
+
+def setUpModule():
+    global _broker
+    _broker = broker.Broker(port=0)
+    _broker.start()
+
+
+def tearDownModule():
+    _broker.stop()
+
+
 class TestMQTTInterface(unittest.TestCase):
 
     def setUp(self):
-        self.client_one = mqttinterface.MQTTInterface(port=1883, host='localhost')
-        self.client_two = mqttinterface.MQTTInterface(port=1883, host='localhost')
+        self.client_one = mqttinterface.MQTTInterface(port=_broker.port, host='localhost')
+        self.client_two = mqttinterface.MQTTInterface(port=_broker.port, host='localhost')
 
         self.client_one.start()
         self.client_two.start()
@@ -22,6 +39,22 @@ class TestMQTTInterface(unittest.TestCase):
         message = q.get()
         self.assertEqual(test_message, message.decode(encoding='UTF-8'))
 
+    def test_send_buffer(self):
+        q = self.client_one.subscribe('test/topic')
+        self.client_one.send_message('test/topic', memoryview(b'xtestx')[1:-1])
+
+        self.assertEqual(q.get(timeout=5), b'test')
+
+    def test_wildcard_subscribe(self):
+        q_one = self.client_one.subscribe('test/+')
+        q_two = self.client_one.subscribe('test/#')
+        # Messages from another client are only delivered once the broker has processed the subscriptions
+        time.sleep(0.5)
+        self.client_two.send_message('test/topic', b'test')
+
+        self.assertEqual(q_one.get(timeout=5), b'test')
+        self.assertEqual(q_two.get(timeout=5), b'test')
+
     def test_subscribe_with_callback(self):
 
         test_value = False
@@ -40,6 +73,156 @@ class TestMQTTInterface(unittest.TestCase):
         self.client_two.stop()
 
 
+class TestConnectionPool(unittest.TestCase):
+
+    def test_shared_subscriptions(self):
+        pool = mqttinterface.ConnectionPool(port=_broker.port, host='localhost', connections=2)
+        client_one = pool.create_interface()
+        client_two = pool.create_interface()
+        client_one.start()
+        client_two.start()
+
+        q_one = client_one.subscribe('test/pool')
+        q_two = client_two.subscribe('test/pool')
+        client_one.send_message('test/pool', b'a')
+        self.assertEqual((q_one.get(timeout=5), q_two.get(timeout=5)), (b'a', b'a'))
+
+        # Unsubscribing one client leaves the other's subscription in place
+        client_one.unsubscribe('test/pool')
+        client_one.send_message('test/pool', b'b')
+        self.assertEqual(q_two.get(timeout=5), b'b')
+        self.assertTrue(q_one.empty())
+
+        client_one.stop()
+        client_two.stop()
+        self.assertRaises(ValueError, pool.create_interface().start)
+
+
+class TestAsyncMQTTInterface(unittest.TestCase):
+
+    def test_subscribe(self):
+
+        async def run():
+            client = mqttinterface.AsyncMQTTInterface(port=_broker.port, host='localhost')
+            await client.start()
+
+            q = client.subscribe('test/async_topic')
+            client.send_message('test/async_topic', 'test'.encode(encoding='UTF-8'))
+            message = await asyncio.wait_for(q.get(), 5)
+
+            await client.stop()
+            return message
+
+        self.assertEqual(asyncio.run(run()), b'test')
+
+
+class TestTopicTrie(unittest.TestCase):
+
+    def test_match(self):
+        trie = mqttinterface._TopicTrie({'a/b': (1, 2), 'a/+': (3,), 'a/#': (4,), '#': (5,), '+/b/c': (6,)})
+
+        self.assertEqual(sorted(trie.match('a/b')), [1, 2, 3, 4, 5])
+        self.assertEqual(sorted(trie.match('a')), [4, 5])
+        self.assertEqual(sorted(trie.match('a/b/c')), [4, 5, 6])
+        self.assertEqual(sorted(trie.match('b')), [5])
+        self.assertEqual(trie.match('$SYS/b/c'), [])
+
+    def test_topic_matches(self):
+        self.assertTrue(mqttinterface.topic_matches('robot_1/#', 'robot_1/status'))
+        self.assertFalse(mqttinterface.topic_matches('+/status', 'robot_1/pose'))
+
+
+class TestSubscription(unittest.TestCase):
+
+    def test_serial(self):
+        received = []
+        release = threading.Event()
+
+        def callback(topic, msg):
+            release.wait()
+            received.append(msg)
+
+        executor = futures.ThreadPoolExecutor(max_workers=1)
+        subscription = mqttinterface.Subscription('test/topic', callback, mqttinterface.ExecutionMode.SERIAL, executor, 3, None)
+
+        # Messages count as pending until the callback has handled them
+        for x in range(6):
+            subscription.dispatch('test/topic', x)
+        release.set()
+        executor.shutdown(wait=True)
+
+        self.assertEqual(received, [0, 1, 2])
+        stats = subscription.stats()
+        self.assertEqual((stats['messages'], stats['dropped'], stats['pending']), (3, 3, 0))
+        self.assertGreater(stats['max_latency'], 0)
+
+    def test_inline(self):
+        received = []
+        subscription = mqttinterface.Subscription('test/topic', lambda x, y: received.append(y), mqttinterface.ExecutionMode.INLINE,
+                                                  None, 1, None)
+
+        for x in range(3):
+            subscription.dispatch('test/topic', x)
+
+        self.assertEqual(received, [0, 1, 2])
+        self.assertEqual(subscription.stats()['messages'], 3)
+
+
+class TestSubscriptionQueue(unittest.TestCase):
+
+    def offer_all(self, q):
+        for x in range(5):
+            q.offer(x)
+
+        return [q.get_nowait() for _ in range(q.qsize())]
+
+    def test_drop_policies(self):
+        q = mqttinterface.SubscriptionQueue(maxsize=2, policy=mqttinterface.DropPolicy.DROP_OLDEST)
+        self.assertEqual(self.offer_all(q), [3, 4])
+        self.assertEqual(q.dropped, 3)
+
+        q = mqttinterface.SubscriptionQueue(maxsize=2, policy=mqttinterface.DropPolicy.DROP_NEWEST)
+        self.assertEqual(self.offer_all(q), [0, 1])
+        self.assertEqual(q.dropped, 3)
+
+        q = mqttinterface.SubscriptionQueue(policy=mqttinterface.DropPolicy.LATEST)
+        self.assertEqual(self.offer_all(q), [4])
+
+        q = mqttinterface.SubscriptionQueue()
+        self.assertEqual(self.offer_all(q), [0, 1, 2, 3, 4])
+        self.assertEqual(q.dropped, 0)
+
+    def test_async_drop_policies(self):
+        q = mqttinterface.AsyncSubscriptionQueue(maxsize=2, policy=mqttinterface.DropPolicy.DROP_OLDEST)
+        self.assertEqual(self.offer_all(q), [3, 4])
+        self.assertEqual(q.dropped, 3)
+
+        self.assertRaises(ValueError, mqttinterface.AsyncSubscriptionQueue, maxsize=2)
+
+
+class TestLatestValue(unittest.TestCase):
+
+    def test_wait_newer(self):
+        latest = mqttinterface.LatestValue()
+        self.assertEqual(latest.get(), (None, None, 0))
+        self.assertEqual(latest.wait_newer(0, timeout=0.1), None)
+
+        latest.offer(b'a')
+        latest.offer(b'b')
+        msg, _, seq = latest.wait_newer(0)
+        self.assertEqual((msg, seq), (b'b', 2))
+
+        def work():
+            time.sleep(0.5)
+            latest.offer(b'c')
+
+        with futures.ThreadPoolExecutor() as e:
+            e.submit(work)
+            msg, _, seq = latest.wait_newer(seq, timeout=5)
+
+        self.assertEqual((msg, seq), (b'c', 3))
+
+
 class TestCountDownLatch(unittest.TestCase):
 
     def setUp(self):
@@ -0,0 +1,46 @@
+import unittest
+import vizier.retry as retry
+
+
+class TestRetryPolicy(unittest.TestCase):
+
+    def test_backoff(self):
+        policy = retry.RetryPolicy(timeout=0.1, backoff=2, max_timeout=0.5, jitter=0, deadline=1)
+
+        self.assertAlmostEqual(policy.attempt_timeout(0, 0), 0.1)
+        self.assertAlmostEqual(policy.attempt_timeout(2, 0.3), 0.4)
+        self.assertAlmostEqual(policy.attempt_timeout(5, 0.3), 0.5)
+
+        # Waits never extend past the deadline
+        self.assertAlmostEqual(policy.attempt_timeout(5, 0.9), 0.1)
+        self.assertIsNone(policy.attempt_timeout(5, 1.0))
+
+    def test_jitter(self):
+        policy = retry.RetryPolicy(timeout=1, jitter=0.5, deadline=10)
+
+        for _ in range(100):
+            self.assertTrue(0.5 <= policy.attempt_timeout(0, 0) <= 1.5)
+
+    def test_fixed(self):
+        policy = retry.RetryPolicy.fixed(0.25, 3)
+
+        self.assertEqual([policy.attempt_timeout(x, 100) for x in range(4)], [0.25, 0.25, 0.25, None])
+        self.assertRaises(ValueError, retry.RetryPolicy, deadline=None, attempts=None)
+
+    def test_max_duration(self):
+        self.assertAlmostEqual(retry.RetryPolicy.fixed(0.25, 3).max_duration(), 0.75)
+        self.assertAlmostEqual(retry.RetryPolicy(timeout=0.1, backoff=2, max_timeout=0.5, jitter=0, deadline=None, attempts=4).max_duration(), 1.2)
+        self.assertEqual(retry.RetryPolicy(timeout=1, jitter=0.5, deadline=2, attempts=10).max_duration(), 2)
+        self.assertEqual(retry.RetryPolicy(deadline=3).max_duration(), 3)
+
+
+class TestRetryStats(unittest.TestCase):
+
+    def test_increment(self):
+        stats = retry.RetryStats()
+        stats.increment('retries')
+        stats.increment('retries')
+
+        self.assertEqual(stats.get()['retries'], 2)
+        stats.reset()
+        self.assertEqual(stats.get()['retries'], 0)
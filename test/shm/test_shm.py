@@ -0,0 +1,29 @@
+import vizier.shm as shm
+import unittest
+
+
+class TestSharedMemory(unittest.TestCase):
+
+    def setUp(self):
+        self.ring = shm.SharedMemoryRing(64)
+        self.reader = shm.SharedMemoryReader()
+
+    def test_read(self):
+        frame = shm.parse_frame(self.ring.write(b'data'))
+
+        self.assertEqual(frame[0], self.ring.name)
+        self.assertEqual(bytes(self.reader.read(frame)), b'data')
+        self.assertEqual(shm.parse_frame(b'data'), None)
+
+    def test_overwritten(self):
+        first = shm.parse_frame(self.ring.write(bytes(30)))
+        # The ring wraps around, overwriting the first slot
+        self.ring.write(bytes(30))
+        self.ring.write(bytes(30))
+
+        self.assertEqual(self.reader.read(first), None)
+        self.assertRaises(ValueError, self.ring.write, bytes(64))
+
+    def tearDown(self):
+        self.reader.close()
+        self.ring.close()
@@ -1,3 +1,4 @@
+import json
 import unittest
 import vizier.utils as utils
 
@@ -5,7 +6,76 @@ import vizier.utils as utils
 class TestUtils(unittest.TestCase):
 
     def setUp(self):
-        pass 
+        pass
+
+    def test_response_filter(self):
+        message_id = utils.create_message_id('a')
+        response_link = utils.create_response_link('b', message_id)
+
+        self.assertEqual(utils.create_response_filter('a'), '+/responses/a/#')
+        self.assertEqual(utils.parse_response_link(response_link), ('b', message_id))
+        self.assertRaises(ValueError, utils.parse_response_link, 'b/requests')
+
+    def test_chunks(self):
+        chunks = utils.create_chunks('a:1', b'abcdefghij', 4)
+
+        self.assertEqual([utils.parse_chunk(x) for x in chunks], [('a:1', 0, 3, b'abcd'), ('a:1', 1, 3, b'efgh'), ('a:1', 2, 3, b'ij')])
+        self.assertEqual(utils.parse_chunk(b'{"status": 200}'), None)
+
+    def test_batch(self):
+        batch = utils.create_batch([b'a', 'bc', b''])
+
+        self.assertEqual(utils.parse_batch(batch), [b'a', b'bc', b''])
+        self.assertEqual(utils.parse_batch(b'data'), None)
+
+    def test_batch_memoryview(self):
+        # The size of a buffer is its size in bytes, not its number of items
+        batch = utils.create_batch([memoryview(b'abcd').cast('I'), bytearray(b'ef')])
+        messages = utils.parse_batch(memoryview(batch))
+
+        self.assertIsInstance(messages[0], memoryview)
+        self.assertEqual([bytes(x) for x in messages], [b'abcd', b'ef'])
+
+    def test_compile_descriptor(self):
+        descriptor = {'end_point': 'a', 'links': {'/b': {'type': 'STREAM', 'shared_memory': 1024, 'links': {'/c': {'type': 'DATA'}}},
+                                                  'a/d': {'type': 'DATA'}},
+                      'requests': [{'link': 'e/f', 'type': 'STREAM', 'required': True}, {'link': 'e/g', 'type': 'DATA'}]}
+        compiled = utils.compile_descriptor(descriptor)
+
+        self.assertEqual(set(compiled.links), {'a/b', 'a/b/c', 'a/d'})
+        self.assertEqual(compiled.data_links, {'a/b/c', 'a/d'})
+        self.assertEqual(compiled.stream_links, {'a/b'})
+        self.assertEqual(dict(compiled.shared_memory), {'a/b': 1024})
+        self.assertEqual(compiled.required_links, {'e/f'})
+        self.assertEqual(compiled.optional_links, {'e/g'})
+        self.assertEqual(compiled.gettable_links, {'e/g'})
+        self.assertEqual(compiled.subscribable_links, {'e/f'})
+
+        # The requests of the descriptor are not changed
+        self.assertNotIn('required', descriptor['requests'][1])
+
+        # Descriptors with the same content share their compiled form
+        copied = json.loads(json.dumps(descriptor))
+        self.assertIs(utils.compile_descriptor(copied), compiled)
+        self.assertEqual(hash(utils.compile_descriptor(copied)), hash(compiled))
+        copied['requests'] = []
+        self.assertNotEqual(utils.compile_descriptor(copied), compiled)
+
+        # Compiled descriptors are immutable, and expand to copies
+        self.assertRaises(AttributeError, setattr, compiled, 'end_point', 'b')
+        with self.assertRaises(TypeError):
+            compiled.links['a/e'] = {'type': 'DATA'}
+        with self.assertRaises(TypeError):
+            compiled.requests['e/g']['required'] = True
+        links, requests = compiled.expand()
+        links['a/d']['body'] = 1
+        requests['e/g']['required'] = True
+        self.assertEqual(compiled.links['a/d']['body'], '')
+        self.assertFalse(compiled.requests['e/g']['required'])
+
+        self.assertEqual(utils.generate_links_from_descriptor(descriptor), compiled.expand())
+        self.assertRaises(ValueError, utils.compile_descriptor, {'end_point': 'a', 'links': {'b/c': {'type': 'DATA'}}})
+        self.assertRaises(ValueError, utils.compile_descriptor, {'end_point': 'a', 'links': {'/b': {}}})
 
     def tearDown(self):
         pass
@@ -0,0 +1,125 @@
+import asyncio
+import json
+import vizier.node as node
+import vizier.broker as broker
+import unittest
+
+
+# The tests run against a broker on an ephemeral port, so no external broker is needed
+_broker = None
+
+
+def setUpModule():
+    global _broker
+    _broker = broker.Broker(port=0)
+    _broker.start()
+
+
+def tearDownModule():
+    _broker.stop()
+
+
+class TestAsyncNode(unittest.TestCase):
+
+    def setUp(self):
+        path_a = '../config/node_desc_a.json'
+        path_b = '../config/node_desc_b.json'
+
+        with open(path_a, 'r') as f:
+            self.node_descriptor_a = json.load(f)
+
+        with open(path_b, 'r') as f:
+            self.node_descriptor_b = json.load(f)
+
+        # Synchronous node a serves the links requested by asynchronous node b
+        self.node_a = node.Node('localhost', _broker.port, self.node_descriptor_a)
+        self.node_a.start()
+
+    def test_get_and_subscribe(self):
+
+        async def run():
+            node_b = node.AsyncNode('localhost', _broker.port, self.node_descriptor_b)
+            await node_b.start()
+
+            self.node_a.put('a/a_sub2', 'data')
+            self.assertEqual(await node_b.get('a/a_sub2'), 'data')
+            self.assertEqual(await node_b.get_many(['a/a_sub2']), {'a/a_sub2': 'data'})
+
+            messages = node_b.subscribe('a/a_sub')
+            # Give the subscription time to reach the broker
+            await asyncio.sleep(0.5)
+            self.node_a.publish('a/a_sub', 'message'.encode(encoding='UTF-8'))
+            self.assertEqual(await asyncio.wait_for(messages.__anext__(), 5), b'message')
+            await messages.aclose()
+
+            with self.assertRaises(ValueError):
+                await node_b.publish('a/a_sub', b'message')
+
+            await node_b.stop()
+
+        asyncio.run(run())
+
+    def test_serve_get(self):
+
+        async def run():
+            node_b = node.AsyncNode('localhost', _broker.port, self.node_descriptor_b)
+            await node_b.start()
+            node_b.put('b/b_sub', 'data')
+
+            # The blocking request runs off of the event loop, which serves the request
+            node_c = node.Node('localhost', _broker.port, {'end_point': 'c', 'links': {}, 'requests': [{'link': 'b/b_sub', 'type': 'DATA'}]})
+            node_c.start()
+            self.assertEqual(await asyncio.get_running_loop().run_in_executor(None, node_c.get, 'b/b_sub'), 'data')
+            node_c.stop()
+
+            await node_b.stop()
+
+        asyncio.run(run())
+
+    def test_shared_memory(self):
+
+        async def run():
+            node_c = node.AsyncNode('localhost', _broker.port, {'end_point': 'c', 'links': {'/c_shm': {'type': 'STREAM', 'shared_memory': 1024}},
+                                                                'requests': []})
+            await node_c.start()
+
+            node_d = node.Node('localhost', _broker.port, {'end_point': 'd', 'links': {}, 'requests': [{'link': 'c/c_shm', 'type': 'STREAM'}]})
+            node_d.start()
+            try:
+                q = node_d.subscribe('c/c_shm')
+                # Give the subscription time to reach the broker
+                await asyncio.sleep(0.5)
+
+                # The data is read from the publisher's ring, rather than received in an MQTT message
+                await node_c.publish('c/c_shm', b'data')
+                msg = await asyncio.get_running_loop().run_in_executor(None, q.get, True, 5)
+                self.assertIsInstance(msg, memoryview)
+                self.assertEqual(bytes(msg), b'data')
+                msg.release()
+            finally:
+                node_d.stop()
+                await node_c.stop()
+
+        asyncio.run(run())
+
+    def test_cancelled_get(self):
+
+        async def run():
+            errors = []
+            asyncio.get_running_loop().set_exception_handler(lambda loop, context: errors.append(context))
+
+            node_b = node.AsyncNode('localhost', _broker.port, self.node_descriptor_b)
+            await node_b.start()
+
+            # A request whose waiting task is cancelled fails later without raising on the event loop
+            with self.assertRaises(asyncio.TimeoutError):
+                await asyncio.wait_for(node_b._make_request('GET', 'd/d_sub', {}, timeout=0.1, attempts=2), 0.05)
+            await asyncio.sleep(0.5)
+            self.assertEqual(errors, [])
+
+            await node_b.stop()
+
+        asyncio.run(run())
+
+    def tearDown(self):
+        self.node_a.stop()
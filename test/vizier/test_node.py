@@ -1,8 +1,25 @@
 import json
+import time
 import vizier.node as node
+import vizier.utils as utils
+import vizier.broker as broker
 import unittest
 
 
+# The tests run against a broker on an ephemeral port, so no external broker is needed
+_broker = None
+
+
+def setUpModule():
+    global _broker
+    _broker = broker.Broker(port=0)
+    _broker.start()
+
+
+def tearDownModule():
+    _broker.stop()
+
+
 class TestNode(unittest.TestCase):
     def setUp(self):
 
@@ -18,7 +35,7 @@ class TestNode(unittest.TestCase):
             print('Could not open given node file {}'.format(filepath))
             return -1
 
-        self.node = node.Node('localhost', 1883, node_descriptor)
+        self.node = node.Node('localhost', _broker.port, node_descriptor)
         self.node.start()
 
     def test_publishable_topics(self):
@@ -33,5 +50,99 @@ class TestNode(unittest.TestCase):
     def test_puttable_topics(self):
         self.assertEqual(self.node.puttable_links, {'a/a_sub2'})
 
+    def test_put(self):
+        version = self.node._expanded_links['a/a_sub2']['version']
+        self.node.put('a/a_sub2', 'data')
+
+        link = self.node._expanded_links['a/a_sub2']
+        self.assertEqual(link['version'], version + 1)
+        self.assertEqual(json.loads(link['encoded']['json'][0][0].decode(encoding='UTF-8')),
+                         {'status': 200, 'body': 'data', 'type': 'DATA', 'etag': link['etag']})
+
+    def test_not_modified(self):
+        self.node.put('a/a_sub2', 'data')
+        etag = self.node._expanded_links['a/a_sub2']['etag']
+        request = utils.create_request('b/0', 'GET', 'a/a_sub2', {'if_none_match': etag})
+
+        channel, (response,) = self.node._create_response(json.dumps(request).encode(encoding='UTF-8'))
+        self.assertEqual(channel, 'a/responses/b/0')
+        self.assertEqual(json.loads(response.decode(encoding='UTF-8')), {'status': 304, 'body': None, 'type': 'DATA', 'etag': etag})
+
+    def test_chunked_response(self):
+        self.node._chunk_size = 4
+        self.node.put('a/a_sub2', 'abcdefghij')
+        etag = self.node._expanded_links['a/a_sub2']['etag']
+
+        request = utils.create_request('b/0', 'GET', 'a/a_sub2', {})
+        _, messages = self.node._create_response(json.dumps(request).encode(encoding='UTF-8'))
+        self.assertEqual(json.loads(messages[0].decode(encoding='UTF-8')),
+                         {'status': 200, 'body': None, 'type': 'DATA', 'etag': etag, 'chunks': 3, 'size': 10, 'encoding': 'str'})
+        self.assertEqual([utils.parse_chunk(x) for x in messages[1:]],
+                         [(etag, 0, 3, b'abcd'), (etag, 1, 3, b'efgh'), (etag, 2, 3, b'ij')])
+
+        # Only the missing chunks are resent
+        request = utils.create_request('b/1', 'GET', 'a/a_sub2', {'chunks': [1], 'etag': etag})
+        _, resent = self.node._create_response(json.dumps(request).encode(encoding='UTF-8'))
+        self.assertEqual(resent, [messages[0], messages[2]])
+
     def tearDown(self):
         self.node.stop()
+
+
+class TestResponseCache(unittest.TestCase):
+
+    def test_duplicates(self):
+        cache = node._ResponseCache(size=2, ttl=0.5)
+
+        self.assertEqual(cache.begin(b'request'), (True, None))
+        # Duplicates are dropped while the original is in progress
+        self.assertEqual(cache.begin(b'request'), (False, None))
+        cache.finish(b'request', ('channel', b'response'))
+        self.assertEqual(cache.begin(b'request'), (False, ('channel', b'response')))
+
+    def test_expiry(self):
+        cache = node._ResponseCache(size=2, ttl=0.5)
+
+        cache.begin(b'request')
+        cache.finish(b'request', ('channel', b'response'))
+        time.sleep(0.6)
+        self.assertEqual(cache.begin(b'request'), (True, None))
+
+        # Oldest entries are evicted past the size of the cache
+        cache.begin(b'request_2')
+        cache.begin(b'request_3')
+        self.assertEqual(cache.begin(b'request'), (True, None))
+
+    def test_abort(self):
+        cache = node._ResponseCache(size=2, ttl=0.5)
+
+        cache.begin(b'request')
+        cache.abort(b'request')
+        self.assertEqual(cache.begin(b'request'), (True, None))
+
+
+class TestKeyedExecutor(unittest.TestCase):
+
+    def test_ordering(self):
+        executor = node._KeyedExecutor(4, 100, None)
+        results = {'a': [], 'b': []}
+
+        def work(key, value):
+            time.sleep(0.01)
+            results[key].append(value)
+
+        for x in range(10):
+            executor.submit('a', lambda x=x: work('a', x))
+            executor.submit('b', lambda x=x: work('b', x))
+        executor.shutdown()
+
+        self.assertEqual(results, {'a': list(range(10)), 'b': list(range(10))})
+
+    def test_max_in_flight(self):
+        executor = node._KeyedExecutor(1, 2, None)
+
+        self.assertTrue(executor.submit('a', lambda: time.sleep(0.2)))
+        self.assertTrue(executor.submit('b', lambda: None))
+        self.assertFalse(executor.submit('c', lambda: None))
+        executor.shutdown()
+        self.assertEqual(executor._in_flight, 0)
@@ -1,8 +1,29 @@
 import json
+import queue
+import threading
+import time
 import vizier.node as node
+import vizier.retry as retry
+import vizier.codec as codec
+import vizier.mqttinterface as mqtt
+import vizier.broker as broker
 import unittest
 
 
+# The tests run against a broker on an ephemeral port, so no external broker is needed
+_broker = None
+
+
+def setUpModule():
+    global _broker
+    _broker = broker.Broker(port=0)
+    _broker.start()
+
+
+def tearDownModule():
+    _broker.stop()
+
+
 class TestVizierNodes(unittest.TestCase):
 
     def setUp(self):
@@ -27,10 +48,10 @@ class TestVizierNodes(unittest.TestCase):
             print('Could not open given node file {}'.format(path_b))
             return -1
 
-        self.node_a = node.Node('localhost', 1883, node_descriptor_a)
+        self.node_a = node.Node('localhost', _broker.port, node_descriptor_a)
         self.node_a.start()
 
-        self.node_b = node.Node('localhost', 1883, node_descriptor_b)
+        self.node_b = node.Node('localhost', _broker.port, node_descriptor_b)
         self.node_b.start()
 
     def test_publishable_links(self):
@@ -49,6 +70,202 @@ class TestVizierNodes(unittest.TestCase):
         self.assertEqual(self.node_a.puttable_links, {'a/a_sub2'})
         self.assertEqual(self.node_b.puttable_links, {'b/b_sub'})
 
+    def test_batched_publish(self):
+        q = self.node_b.subscribe('a/a_sub')
+        self.node_a.enable_batching('a/a_sub', flush_interval=0.05, max_batch=3)
+
+        for x in range(5):
+            self.node_a.publish('a/a_sub', str(x))
+        self.assertEqual([q.get(timeout=5) for _ in range(5)], [b'0', b'1', b'2', b'3', b'4'])
+
+        self.node_a.disable_batching('a/a_sub')
+        self.node_a.publish('a/a_sub', b'5')
+        self.assertEqual(q.get(timeout=5), b'5')
+
+    def test_get(self):
+        self.node_a.put('a/a_sub2', 'data')
+        self.assertEqual(self.node_b.get('a/a_sub2'), 'data')
+        self.assertEqual(self.node_b._pending_requests, {})
+
+    def test_conditional_get(self):
+        self.node_a.put('a/a_sub2', 'data')
+        self.assertEqual(self.node_b.get('a/a_sub2'), 'data')
+        etag = self.node_b._get_cache['a/a_sub2']['etag']
+
+        # Unchanged link is answered from the cache
+        self.assertEqual(self.node_b.get('a/a_sub2'), 'data')
+        self.assertEqual(self.node_b._get_cache['a/a_sub2']['etag'], etag)
+
+        self.node_a.put('a/a_sub2', 'new_data')
+        self.assertEqual(self.node_b.get('a/a_sub2'), 'new_data')
+        self.assertNotEqual(self.node_b._get_cache['a/a_sub2']['etag'], etag)
+
+    def test_chunked_get(self):
+        self.node_a._chunk_size = 1024
+        data = bytes(range(256)) * 40
+        self.node_a.put('a/a_sub2', data)
+
+        self.assertEqual(self.node_b.get('a/a_sub2'), data)
+        self.assertEqual(b''.join(self.node_b.get_stream('a/a_sub2')), data)
+
+        self.node_a.put('a/a_sub2', 'data' * 1000)
+        self.assertEqual(self.node_b.get('a/a_sub2'), 'data' * 1000)
+
+    def test_connection_pool(self):
+        pool = mqtt.ConnectionPool(port=_broker.port, host='localhost')
+        node_c = node.Node('localhost', _broker.port, {'end_point': 'c', 'links': {'/c_sub': {'type': 'DATA'}}, 'requests': []},
+                           connection_pool=pool)
+        node_d = node.Node('localhost', _broker.port, {'end_point': 'd', 'links': {}, 'requests': [{'link': 'c/c_sub', 'type': 'DATA'}]},
+                           connection_pool=pool)
+        # Pooled connections have no will, so the nodes' descriptors are only removed when they stop
+        with self.assertLogs(level='WARNING'):
+            node_c.start()
+        node_d.start()
+
+        node_c.put('c/c_sub', 'data')
+        self.assertEqual(node_d.get('c/c_sub'), 'data')
+
+        node_d.stop()
+        node_c.stop()
+
+    @unittest.skipIf(codec.msgpack is None, 'msgpack is not installed')
+    def test_msgpack_codec(self):
+        descriptor = {'end_point': 'c', 'links': {}, 'requests': [{'link': 'a/a_sub2', 'type': 'DATA'}], 'codec': 'msgpack'}
+        node_c = node.Node('localhost', _broker.port, descriptor)
+        node_c.start()
+
+        # Bytes are sent without base64 by msgpack, and with it by json
+        self.node_a.put('a/a_sub2', b'\x00\x01data')
+        self.assertEqual(node_c.get('a/a_sub2'), b'\x00\x01data')
+        self.assertEqual(self.node_b.get('a/a_sub2'), b'\x00\x01data')
+        node_c.stop()
+
+    def test_get_async(self):
+        self.node_a.put('a/a_sub2', 'data')
+        self.assertEqual(self.node_b.get_async('a/a_sub2').result(), 'data')
+        self.assertEqual(self.node_b.get_many(['a/a_sub2', 'a/a_sub2']), {'a/a_sub2': 'data'})
+        self.assertRaises(ValueError, self.node_b.get_async, 'b/b_sub')
+
+    def test_get_retry_policy(self):
+        self.node_a.put('a/a_sub2', 'data')
+        policy = retry.RetryPolicy(timeout=0.1, deadline=2)
+
+        self.assertEqual(self.node_b.get('a/a_sub2', retry_policy=policy), 'data')
+        self.assertEqual(policy.stats.get()['requests'], 1)
+        self.assertEqual(policy.stats.get()['responses'], 1)
+
+    def test_get_stopped(self):
+        # Requests are not retransmitted once the node stops, so they fail right away rather than blocking
+        self.node_b.stop()
+        start = time.monotonic()
+        self.assertIsNone(self.node_b.get('a/a_sub2', timeout=5, attempts=5))
+        self.assertEqual(self.node_b.get_many(['a/a_sub2']), {'a/a_sub2': None})
+        self.assertLess(time.monotonic() - start, 1)
+
+        self.node_b = node.Node('localhost', _broker.port, self.node_b._node_descriptor)
+        self.node_b.start()
+
+    def test_scheduler_exception(self):
+        def fail():
+            raise RuntimeError('Scheduled function failed')
+
+        # A scheduled function that raises does not stop the functions scheduled after it
+        ran = threading.Event()
+        self.node_b._scheduler.schedule(0, fail)
+        self.node_b._scheduler.schedule(0.05, ran.set)
+        self.assertTrue(ran.wait(timeout=5))
+
     def tearDown(self):
         self.node_a.stop()
         self.node_b.stop()
+
+
+class TestLoopbackNodes(unittest.TestCase):
+
+    def setUp(self):
+        self.bus = mqtt.LoopbackBus()
+
+        descriptor_c = {'end_point': 'c', 'links': {'/c_sub': {'type': 'DATA'}, '/c_stream': {'type': 'STREAM'},
+                                                    '/c_shm': {'type': 'STREAM', 'shared_memory': 4096}}, 'requests': []}
+        descriptor_d = {'end_point': 'd', 'links': {}, 'requests': [{'link': 'c/c_sub', 'type': 'DATA', 'required': True},
+                                                                     {'link': 'c/c_stream', 'type': 'STREAM'},
+                                                                     {'link': 'c/c_shm', 'type': 'STREAM'}]}
+
+        self.node_c = node.Node(None, None, descriptor_c, loopback=self.bus)
+        self.node_c.start()
+
+        self.node_d = node.Node(None, None, descriptor_d, loopback=self.bus)
+        self.node_d.start()
+
+    def test_get(self):
+        data = b'data' * 1000
+        self.node_c.put('c/c_sub', data)
+
+        # The body is passed by reference
+        self.assertIs(self.node_d.get('c/c_sub'), data)
+
+        # Without the direct path, the request and response go through the bus
+        self.node_d._loopback = None
+        self.assertEqual(self.node_d.get('c/c_sub'), data)
+
+    def test_publish(self):
+        q = self.node_d.subscribe('c/c_stream')
+        self.node_c.publish('c/c_stream', b'data')
+        self.assertEqual(q.get(timeout=5), b'data')
+
+    def test_discovery(self):
+        descriptors = {}
+        self.bus.subscribe_with_callback('vizier/discovery/+', lambda x, y: descriptors.update({x: y}), with_topic=True)
+
+        # The retained descriptors are delivered on subscribing
+        self.assertEqual(json.loads(descriptors['vizier/discovery/c']), self.node_c._node_descriptor)
+        self.assertIn('vizier/discovery/d', descriptors)
+
+        self.node_d.stop()
+        self.assertEqual(descriptors['vizier/discovery/d'], b'')
+        self.node_d = node.Node(None, None, self.node_d._node_descriptor, loopback=self.bus)
+        self.node_d.start()
+
+    def test_remote_discovery(self):
+        # Discovery messages are owned by the node they describe, rather than by a node named after the discovery prefix
+        self.assertEqual(mqtt._destination('vizier/discovery/c'), ('c', True))
+
+        descriptor = {'end_point': 'vizier', 'links': {}, 'requests': []}
+        node_v = node.Node('localhost', _broker.port, descriptor, loopback=self.bus)
+        node_e = node.Node('localhost', _broker.port, {'end_point': 'e', 'links': {}, 'requests': []})
+        node_v.start()
+        node_e.start()
+
+        try:
+            received = queue.Queue()
+            node_v._mqtt_client.subscribe_with_callback('vizier/discovery/+', lambda x, y: received.put(x), with_topic=True)
+
+            # Descriptors of nodes on the bus arrive through the bus, and those of other processes through the broker
+            topics = set()
+            while('vizier/discovery/e' not in topics):
+                topics.add(received.get(timeout=5))
+            self.assertIn('vizier/discovery/c', topics)
+        finally:
+            node_e.stop()
+            node_v.stop()
+
+    def test_publish_memoryview(self):
+        q = self.node_d.subscribe('c/c_stream', as_memoryview=True)
+        self.node_c.publish('c/c_stream', bytearray(b'data'))
+
+        msg = q.get(timeout=5)
+        self.assertIsInstance(msg, memoryview)
+        self.assertEqual(bytes(msg), b'data')
+
+    def test_shared_memory(self):
+        q = self.node_d.subscribe('c/c_shm')
+        self.node_c.publish('c/c_shm', bytearray(b'data'))
+
+        msg = q.get(timeout=5)
+        self.assertIsInstance(msg, memoryview)
+        self.assertEqual(bytes(msg), b'data')
+        msg.release()
+
+    def tearDown(self):
+        self.node_d.stop()
+        self.node_c.stop()
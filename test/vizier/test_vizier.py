@@ -1,9 +1,27 @@
 import json
+import queue
+import socket
+import time
 import vizier.node as node
 import vizier.vizier as vizier
+import vizier.broker as broker
 import unittest
 
 
+# The tests run against a broker on an ephemeral port, so no external broker is needed
+_broker = None
+
+
+def setUpModule():
+    global _broker
+    _broker = broker.Broker(port=0)
+    _broker.start()
+
+
+def tearDownModule():
+    _broker.stop()
+
+
 class TestVizierNodes(unittest.TestCase):
 
     def setUp(self):
@@ -28,13 +46,13 @@ class TestVizierNodes(unittest.TestCase):
             print('Could not open given node file {}'.format(path_b))
             return -1
 
-        self.node_a = node.Node('localhost', 1883, node_descriptor_a)
+        self.node_a = node.Node('localhost', _broker.port, node_descriptor_a)
         self.node_a.start()
 
-        self.node_b = node.Node('localhost', 1883, node_descriptor_b)
+        self.node_b = node.Node('localhost', _broker.port, node_descriptor_b)
         self.node_b.start()
 
-        self.vizier = vizier.Vizier('localhost', 1883, ['a', 'b', 'c'])
+        self.vizier = vizier.Vizier('localhost', _broker.port, ['a', 'b', 'c'])
         self.vizier.start()
 
     def test_publishable_links(self):
@@ -46,6 +64,91 @@ class TestVizierNodes(unittest.TestCase):
     def test_visualize(self):
         self.vizier.visualize()
 
+    def test_discovery(self):
+        self.assertEqual(set(self.vizier._nodes_to_descriptors), {'a', 'b'})
+
+        # Nodes are discovered from their retained descriptors, even if they are not specified
+        v = vizier.Vizier('localhost', _broker.port, [])
+        v.start(quiet_period=0.5)
+        self.assertEqual(v._nodes_to_descriptors, self.vizier._nodes_to_descriptors)
+        v.stop()
+
+        # The quiet period starts when discovery starts
+        v = vizier.Vizier('localhost', _broker.port, [])
+        time.sleep(0.5)
+        v.start()
+        discovered = set(v._nodes_to_descriptors)
+        v.stop()
+        self.assertEqual(discovered, {'a', 'b'})
+
+        # Stopped nodes are no longer discovered
+        self.node_b.stop()
+        v = vizier.Vizier('localhost', _broker.port, ['a'])
+        v.start()
+        self.assertEqual(set(v._nodes_to_descriptors), {'a'})
+        v.stop()
+        self.node_b = node.Node('localhost', _broker.port, self.node_b._node_descriptor)
+        self.node_b.start()
+
+    def test_topology(self):
+        changes = queue.Queue()
+        self.vizier.add_topology_listener(lambda x, y, z: changes.put((x, y)))
+
+        descriptor_c = {'end_point': 'c', 'links': {'/c_sub': {'type': 'DATA'}}, 'requests': []}
+        node_c = node.Node('localhost', _broker.port, descriptor_c)
+        node_c.start()
+
+        self.assertEqual(changes.get(timeout=5), (vizier.TopologyChange.JOINED, 'c'))
+        self.assertIn('c/c_sub', self.vizier.get_links())
+
+        node_c.stop()
+        self.assertEqual(changes.get(timeout=5), (vizier.TopologyChange.LEFT, 'c'))
+        self.assertNotIn('c/c_sub', self.vizier.get_links())
+        self.assertIn('a/a_sub', self.vizier.get_links())
+
+        # A node that loses its connection leaves through its last will, and joins again when it reconnects
+        node_c = node.Node('localhost', _broker.port, descriptor_c)
+        node_c.start()
+        self.assertEqual(changes.get(timeout=5), (vizier.TopologyChange.JOINED, 'c'))
+
+        node_c._mqtt_client._client.socket().shutdown(socket.SHUT_RDWR)
+        self.assertEqual(changes.get(timeout=5), (vizier.TopologyChange.LEFT, 'c'))
+        self.assertEqual(changes.get(timeout=10), (vizier.TopologyChange.JOINED, 'c'))
+        node_c.stop()
+        self.assertEqual(changes.get(timeout=5), (vizier.TopologyChange.LEFT, 'c'))
+
+    def test_verify_deps(self):
+        self.assertEqual(self.vizier.verify_deps(), {'unsatisfied': [], 'optionally_unsatisfied': []})
+
+        changes = queue.Queue()
+        self.vizier.add_dependency_listener(lambda x, y: changes.put((x, y)))
+
+        # Dependencies break when their provider leaves, and are reported once
+        descriptor_a = self.node_a._node_descriptor
+        self.node_a.stop()
+        self.assertEqual(changes.get(timeout=5), ([], [{'node': 'b', 'links': {'a/a_sub', 'a/a_sub2'}}]))
+        self.assertEqual(self.vizier.verify_deps(), {'unsatisfied': [{'node': 'b', 'unsatisfied': {'a/a_sub'}}],
+                                                     'optionally_unsatisfied': [{'endpoint': 'b', 'unsatisfied': {'a/a_sub2'}}]})
+
+        self.node_a = node.Node('localhost', _broker.port, descriptor_a)
+        self.node_a.start()
+        self.assertEqual(changes.get(timeout=5), ([{'node': 'b', 'links': {'a/a_sub', 'a/a_sub2'}}], []))
+        self.assertEqual(self.vizier.verify_deps(), {'unsatisfied': [], 'optionally_unsatisfied': []})
+
+        # Requests of a node that joins are broken if nothing provides them, and removed when it leaves
+        descriptor_c = {'end_point': 'c', 'links': {}, 'requests': [{'link': 'd/d_sub', 'type': 'DATA', 'required': False}]}
+        node_c = node.Node('localhost', _broker.port, descriptor_c)
+        try:
+            node_c.start()
+            self.assertEqual(changes.get(timeout=5), ([], [{'node': 'c', 'links': {'d/d_sub'}}]))
+            self.assertEqual(self.vizier.verify_deps()['optionally_unsatisfied'], [{'endpoint': 'c', 'unsatisfied': {'d/d_sub'}}])
+        finally:
+            node_c.stop()
+
+        # Nothing is satisfied or broken when node c leaves
+        self.assertRaises(queue.Empty, changes.get, timeout=1)
+        self.assertEqual(self.vizier.verify_deps(), {'unsatisfied': [], 'optionally_unsatisfied': []})
+
     def tearDown(self):
         self.node_a.stop()
         self.node_b.stop()
@@ -0,0 +1,811 @@
+import argparse
+import asyncio
+import binascii
+import logging
+import os
+import struct
+import threading
+import vizier.log as log
+
+# MQTT control packet types
+_CONNECT = 1
+_CONNACK = 2
+_PUBLISH = 3
+_PUBACK = 4
+_PUBREC = 5
+_PUBREL = 6
+_PUBCOMP = 7
+_SUBSCRIBE = 8
+_SUBACK = 9
+_UNSUBSCRIBE = 10
+_UNSUBACK = 11
+_PINGREQ = 12
+_PINGRESP = 13
+_DISCONNECT = 14
+
+# Protocol names for each supported protocol level (3.1 and 3.1.1)
+_protocols = {3: 'MQIsdp', 4: 'MQTT'}
+
+# Return codes of CONNACK
+_accepted = 0
+_unacceptable_protocol = 1
+_identifier_rejected = 2
+
+_uint16 = struct.Struct('>H')
+
+# Connections that have not sent a CONNECT packet within this time (in seconds) are closed
+_connect_timeout = 10
+
+
+def _encode_length(length):
+    """Encodes the remaining length of an MQTT packet."""
+
+    encoded = bytearray()
+    while True:
+        length, digit = divmod(length, 128)
+        encoded.append(digit | 0x80 if length > 0 else digit)
+        if(length == 0):
+            return bytes(encoded)
+
+
+def _encode_string(string):
+    """Encodes a length-prefixed UTF-8 string."""
+
+    encoded = string.encode(encoding='UTF-8')
+    return _uint16.pack(len(encoded)) + encoded
+
+
+def _read_string(data, offset):
+    """Reads a length-prefixed UTF-8 string, returning it and the offset after it."""
+
+    length, = _uint16.unpack_from(data, offset)
+    offset += _uint16.size
+    if(offset + length > len(data)):
+        raise ValueError('String of length ({0}) exceeds packet of length ({1})'.format(length, len(data)))
+
+    return bytes(data[offset:offset+length]).decode(encoding='UTF-8'), offset + length
+
+
+def _packet(packet_type, flags, body):
+    """Creates an MQTT packet."""
+
+    return bytes([(packet_type << 4) | flags]) + _encode_length(len(body)) + body
+
+
+def _is_valid_channel(channel):
+    """Checks that the wildcards of a channel are only '+' or '#' levels, and that '#' is the last level."""
+
+    levels = channel.split('/')
+    for i, x in enumerate(levels):
+        if(('+' in x or '#' in x) and len(x) > 1):
+            return False
+        if(x == '#' and i != len(levels) - 1):
+            return False
+
+    return len(channel) > 0
+
+
+class _SubscriptionNode():
+    """A level of a _SubscriptionTrie.
+
+    Attributes:
+        children (dict): Maps the next level of the channel (possibly '+' or '#') to a _SubscriptionNode.
+        subscribers (dict): Maps each connection subscribed to the channel ending at this level to the granted QoS.
+
+    """
+
+    __slots__ = ('children', 'subscribers')
+
+    def __init__(self):
+        self.children = {}
+        self.subscribers = {}
+
+
+class _SubscriptionTrie():
+    """Trie of the channels to which connections are subscribed, which finds the subscribers of a topic with MQTT wildcard semantics.
+
+    Unlike mqttinterface._TopicTrie, the trie is changed in place, since it is only used from the broker's event loop.
+
+    """
+
+    def __init__(self):
+        self._root = _SubscriptionNode()
+
+    def add(self, channel, connection, qos):
+        """Subscribes a connection to a channel, replacing any previous subscription of the connection to the channel."""
+
+        node = self._root
+        for level in channel.split('/'):
+            node = node.children.setdefault(level, _SubscriptionNode())
+        node.subscribers[connection] = qos
+
+    def remove(self, channel, connection):
+        """Unsubscribes a connection from a channel, removing levels that are no longer used."""
+
+        path = [self._root]
+        levels = channel.split('/')
+        for level in levels:
+            node = path[-1].children.get(level)
+            if(node is None):
+                return
+            path.append(node)
+
+        path[-1].subscribers.pop(connection, None)
+
+        for i in range(len(levels), 0, -1):
+            node = path[i]
+            if(node.subscribers or node.children):
+                break
+            del path[i-1].children[levels[i-1]]
+
+    def match(self, topic):
+        """Finds the subscribers of a topic.
+
+        Args:
+            topic (str): Topic of a published message.
+
+        Returns:
+            A dict mapping each subscribed connection to the highest QoS of its matching subscriptions.
+
+        """
+
+        matched = {}
+
+        def collect(subscribers):
+            for x, y in subscribers.items():
+                if(matched.get(x, -1) < y):
+                    matched[x] = y
+
+        # Per the MQTT specification, topics starting with '$' are not matched by a leading wildcard
+        wildcards = not topic.startswith('$')
+        nodes = [self._root]
+
+        for level in topic.split('/'):
+            next_nodes = []
+            for x in nodes:
+                if(wildcards):
+                    child = x.children.get('#')
+                    if(child is not None):
+                        collect(child.subscribers)
+
+                    child = x.children.get('+')
+                    if(child is not None):
+                        next_nodes.append(child)
+
+                child = x.children.get(level)
+                if(child is not None):
+                    next_nodes.append(child)
+
+            nodes = next_nodes
+            wildcards = True
+            if(not nodes):
+                return matched
+
+        # A '#' also matches the level above it (e.g., 'a/#' matches 'a')
+        for x in nodes:
+            collect(x.subscribers)
+            child = x.children.get('#')
+            if(child is not None):
+                collect(child.subscribers)
+
+        return matched
+
+
+class _RetainedNode():
+    """A level of a _RetainedStore.
+
+    Attributes:
+        children (dict): Maps the next level of the topic to a _RetainedNode.
+        message (tuple): The retained (topic, payload, qos) of the topic ending at this level, or None.
+
+    """
+
+    __slots__ = ('children', 'message')
+
+    def __init__(self):
+        self.children = {}
+        self.message = None
+
+
+class _RetainedStore():
+    """Trie of the retained message of each topic, which finds the retained messages matching a channel."""
+
+    def __init__(self):
+        self._root = _RetainedNode()
+        self.count = 0
+
+    def set(self, topic, payload, qos):
+        """Retains a message for a topic.  An empty payload removes the retained message of the topic."""
+
+        if(not payload):
+            path = [self._root]
+            levels = topic.split('/')
+            for level in levels:
+                node = path[-1].children.get(level)
+                if(node is None):
+                    return
+                path.append(node)
+
+            if(path[-1].message is not None):
+                path[-1].message = None
+                self.count -= 1
+
+            for i in range(len(levels), 0, -1):
+                node = path[i]
+                if(node.message is not None or node.children):
+                    break
+                del path[i-1].children[levels[i-1]]
+        else:
+            node = self._root
+            for level in topic.split('/'):
+                node = node.children.setdefault(level, _RetainedNode())
+
+            if(node.message is None):
+                self.count += 1
+            node.message = (topic, payload, qos)
+
+    def match(self, channel):
+        """Finds the retained messages whose topics match a channel.
+
+        Args:
+            channel (str): Channel, possibly containing wildcards.
+
+        Returns:
+            A list of the matching (topic, payload, qos) messages.
+
+        """
+
+        matched = []
+        levels = channel.split('/')
+
+        def collect_all(node, top):
+            if(node.message is not None):
+                matched.append(node.message)
+            for x, y in node.children.items():
+                if(not (top and x.startswith('$'))):
+                    collect_all(y, False)
+
+        def walk(node, i):
+            if(i == len(levels)):
+                if(node.message is not None):
+                    matched.append(node.message)
+                return
+
+            # Topics starting with '$' are not matched by a leading wildcard
+            top = i == 0
+            level = levels[i]
+            if(level == '#'):
+                if(not top and node.message is not None):
+                    matched.append(node.message)
+                for x, y in node.children.items():
+                    if(not (top and x.startswith('$'))):
+                        collect_all(y, False)
+            elif(level == '+'):
+                for x, y in node.children.items():
+                    if(not (top and x.startswith('$'))):
+                        walk(y, i + 1)
+            else:
+                child = node.children.get(level)
+                if(child is not None):
+                    walk(child, i + 1)
+
+        walk(self._root, 0)
+        return matched
+
+
+class _Connection(asyncio.Protocol):
+    """A client's connection to the broker.  Parses the packets that the client sends, and sends it the messages on its subscriptions.
+
+    Attributes:
+        client_id (str): ID of the client, or None before it has sent a CONNECT packet.
+        keep_alive (int): Keep alive interval of the client in seconds.  0 disables the keep alive.
+        last_activity (double): Event loop time at which the client last sent data.
+        subscriptions (dict): Maps each channel to which the client is subscribed to the granted QoS.
+        dropped (int): Number of QoS 0 messages dropped because the client did not read them fast enough.
+
+    """
+
+    def __init__(self, broker):
+        self._broker = broker
+        self._logger = broker._logger
+        self._transport = None
+        self._buffer = bytearray()
+        self._next_packet_id = 0
+        # IDs of QoS 2 messages received from the client that have not been released
+        self._awaiting_release = set()
+        self._will = None
+        self._closed = False
+
+        self.client_id = None
+        self.keep_alive = 0
+        self.last_activity = 0
+        self.subscriptions = {}
+        self.dropped = 0
+
+    def connection_made(self, transport):
+        self._transport = transport
+        self.last_activity = self._broker._loop.time()
+        self._broker._connections.add(self)
+
+    def connection_lost(self, exc):
+        self._broker._disconnected(self, self._will)
+        self._will = None
+
+    def data_received(self, data):
+        self.last_activity = self._broker._loop.time()
+        self._buffer += data
+
+        buf = self._buffer
+        offset = 0
+        try:
+            while len(buf) - offset >= 2:
+                # The remaining length takes up to four bytes after the first byte
+                length = 0
+                multiplier = 1
+                position = offset + 1
+                while True:
+                    if(position >= len(buf)):
+                        length = None
+                        break
+                    digit = buf[position]
+                    position += 1
+                    length += (digit & 0x7F) * multiplier
+                    multiplier *= 128
+                    if(not digit & 0x80):
+                        break
+                    if(multiplier > 128 ** 3):
+                        raise ValueError('Malformed remaining length')
+
+                if(length is None or len(buf) - position < length):
+                    break
+
+                header = buf[offset]
+                body = bytes(buf[position:position+length])
+                offset = position + length
+
+                self._handle_packet(header >> 4, header & 0x0F, body)
+                if(self._closed):
+                    return
+        except (ValueError, IndexError, struct.error, UnicodeDecodeError) as e:
+            self._logger.warning('Closing connection of client ({0}) after malformed packet: {1}'.format(self.client_id, repr(e)))
+            self.abort()
+            return
+
+        del buf[:offset]
+
+    def _handle_packet(self, packet_type, flags, body):
+        """Handles a packet received from the client."""
+
+        if(self.client_id is None and packet_type != _CONNECT):
+            raise ValueError('First packet must be CONNECT, was ({})'.format(packet_type))
+
+        if(packet_type == _PUBLISH):
+            self._handle_publish(flags, body)
+        elif(packet_type == _PUBACK):
+            # Messages are not retransmitted, since sessions are not persisted, so there is nothing to do
+            pass
+        elif(packet_type == _PUBREL):
+            packet_id, = _uint16.unpack_from(body, 0)
+            self._awaiting_release.discard(packet_id)
+            self.write(_packet(_PUBCOMP, 0, _uint16.pack(packet_id)))
+        elif(packet_type == _SUBSCRIBE):
+            self._handle_subscribe(body)
+        elif(packet_type == _UNSUBSCRIBE):
+            packet_id, = _uint16.unpack_from(body, 0)
+            offset = _uint16.size
+            while offset < len(body):
+                channel, offset = _read_string(body, offset)
+                self._broker._unsubscribe(self, channel)
+            self.write(_packet(_UNSUBACK, 0, _uint16.pack(packet_id)))
+        elif(packet_type == _PINGREQ):
+            self.write(_packet(_PINGRESP, 0, b''))
+        elif(packet_type == _CONNECT):
+            self._handle_connect(body)
+        elif(packet_type == _DISCONNECT):
+            # The will is only published if the client disconnects without a DISCONNECT packet
+            self._will = None
+            self.close()
+        else:
+            raise ValueError('Unexpected packet type ({})'.format(packet_type))
+
+    def _handle_connect(self, body):
+        """Handles a CONNECT packet."""
+
+        if(self.client_id is not None):
+            raise ValueError('Client sent a second CONNECT packet')
+
+        protocol, offset = _read_string(body, 0)
+        level, flags = body[offset], body[offset+1]
+        self.keep_alive, = _uint16.unpack_from(body, offset + 2)
+        client_id, offset = _read_string(body, offset + 4)
+
+        if(_protocols.get(level) != protocol):
+            self.write(_packet(_CONNACK, 0, bytes([0, _unacceptable_protocol])))
+            self.close()
+            return
+
+        clean_session = flags & 0x02
+        if(not client_id):
+            if(not clean_session):
+                self.write(_packet(_CONNACK, 0, bytes([0, _identifier_rejected])))
+                self.close()
+                return
+            client_id = 'vizier_' + binascii.hexlify(os.urandom(8)).decode()
+
+        if(flags & 0x04):
+            will_topic, offset = _read_string(body, offset)
+            length, = _uint16.unpack_from(body, offset)
+            offset += _uint16.size
+            self._will = (will_topic, bytes(body[offset:offset+length]), min((flags >> 3) & 0x03, 1), bool(flags & 0x20))
+
+        self.client_id = client_id
+        self._broker._connected(self)
+
+        # Sessions are not persisted, so there is never a session present
+        self.write(_packet(_CONNACK, 0, bytes([0, _accepted])))
+
+    def _handle_publish(self, flags, body):
+        """Handles a PUBLISH packet."""
+
+        qos = (flags >> 1) & 0x03
+        retain = flags & 0x01
+        topic, offset = _read_string(body, 0)
+
+        if('+' in topic or '#' in topic or not topic):
+            raise ValueError('Invalid topic ({}) for PUBLISH'.format(topic))
+
+        if(qos == 0):
+            self._broker._publish(topic, body[offset:], 0, retain)
+            return
+
+        packet_id, = _uint16.unpack_from(body, offset)
+        payload = body[offset+_uint16.size:]
+
+        if(qos == 1):
+            self.write(_packet(_PUBACK, 0, _uint16.pack(packet_id)))
+            self._broker._publish(topic, payload, 1, retain)
+        elif(qos == 2):
+            # The message is delivered when it is first received.  Retransmissions before it is released are duplicates
+            self.write(_packet(_PUBREC, 0, _uint16.pack(packet_id)))
+            if(packet_id not in self._awaiting_release):
+                self._awaiting_release.add(packet_id)
+                self._broker._publish(topic, payload, 1, retain)
+        else:
+            raise ValueError('Invalid QoS ({}) for PUBLISH'.format(qos))
+
+    def _handle_subscribe(self, body):
+        """Handles a SUBSCRIBE packet."""
+
+        packet_id, = _uint16.unpack_from(body, 0)
+        offset = _uint16.size
+        granted = []
+        subscribed = []
+
+        while offset < len(body):
+            channel, offset = _read_string(body, offset)
+            requested = body[offset]
+            offset += 1
+
+            if(not _is_valid_channel(channel) or requested > 2):
+                granted.append(0x80)
+                continue
+
+            qos = min(requested, 1)
+            granted.append(qos)
+            subscribed.append((channel, qos))
+
+        self.write(_packet(_SUBACK, 0, _uint16.pack(packet_id) + bytes(granted)))
+
+        # Retained messages are sent after the SUBACK
+        for channel, qos in subscribed:
+            self._broker._subscribe(self, channel, qos)
+
+    def deliver(self, topic, payload, qos, retain=False, packet=None):
+        """Sends a message to the client.
+
+        Args:
+            topic (str): Topic of the message.
+            payload (bytes): Payload of the message.
+            qos (int): QoS with which the message is sent.
+            retain (bool, optional): Whether the message is sent because it was retained.
+            packet (bytes, optional): The QoS 0 PUBLISH packet for the message, if it has already been built.
+
+        """
+
+        if(qos == 0):
+            if(self._transport.get_write_buffer_size() > self._broker.max_queued_bytes):
+                self.dropped += 1
+                return
+
+            if(packet is None):
+                packet = _packet(_PUBLISH, 0x01 if retain else 0, _encode_string(topic) + payload)
+            self.write(packet)
+        else:
+            self._next_packet_id = self._next_packet_id % 65535 + 1
+            self.write(_packet(_PUBLISH, (qos << 1) | (0x01 if retain else 0), _encode_string(topic) + _uint16.pack(self._next_packet_id) + payload))
+
+    def write(self, data):
+        """Writes data to the connection, unless it is closed."""
+
+        if(not self._closed):
+            self._transport.write(data)
+
+    def close(self):
+        """Closes the connection once the written data has been sent."""
+
+        self._closed = True
+        self._transport.close()
+
+    def abort(self):
+        """Closes the connection immediately.  The client's will is published."""
+
+        self._closed = True
+        self._transport.abort()
+
+
+class Broker():
+    """An MQTT 3.1.1 broker, which runs on an asyncio event loop in a background thread.  Suited to tests, benchmarks and deployments on a
+    single host, which then need no external broker.
+
+    Supports QoS 0 and 1 (QoS 2 messages are accepted, and delivered with QoS 1), wildcard subscriptions, retained messages, last wills
+    and keep alive.  Sessions are not persisted, so every connection starts a clean session.
+
+    For example, to run a broker on an ephemeral port
+
+    .. code-block:: python
+
+        b = broker.Broker(port=0)
+        b.start()
+        n = node.Node('localhost', b.port, descriptor)
+
+    Attributes:
+        host (str): Host on which the broker listens.
+        port (int): Port on which the broker listens.  If 0, it is set to the port chosen by the operating system when the broker starts.
+        max_queued_bytes (int): Maximum number of bytes waiting to be sent to a client.  QoS 0 messages to clients over this limit are
+            dropped.
+
+    """
+
+    def __init__(self, host='localhost', port=1883, max_queued_bytes=64*1024*1024):
+        self.host = host
+        self.port = port
+        self.max_queued_bytes = max_queued_bytes
+
+        self._logger = log.get_logger()
+        self._loop = None
+        self._thread = None
+        self._server = None
+        self._keep_alive_task = None
+
+        # Only accessed from the event loop
+        self._connections = set()
+        self._clients = {}
+        self._subscriptions = _SubscriptionTrie()
+        self._retained = _RetainedStore()
+
+        self._started = False
+        self._stopped = False
+
+    def _connected(self, connection):
+        """Registers a connection that has sent its CONNECT packet.  An existing connection with the same client ID is closed."""
+
+        existing = self._clients.get(connection.client_id)
+        if(existing is not None):
+            self._logger.info('Client ({}) reconnected.  Closing its previous connection.'.format(connection.client_id))
+            # The previous connection's will is published now, rather than when it closes, so that it precedes the messages of the new one
+            will, existing._will = existing._will, None
+            existing.abort()
+            if(will is not None):
+                self._publish(*will)
+
+        self._clients[connection.client_id] = connection
+
+    def _disconnected(self, connection, will):
+        """Removes a closed connection, publishing its will if it has one."""
+
+        self._connections.discard(connection)
+        if(self._clients.get(connection.client_id) is connection):
+            del self._clients[connection.client_id]
+
+        for x in connection.subscriptions:
+            self._subscriptions.remove(x, connection)
+        connection.subscriptions = {}
+
+        if(will is not None and not self._stopped):
+            self._publish(*will)
+
+    def _subscribe(self, connection, channel, qos):
+        """Subscribes a connection to a channel, sending it the matching retained messages."""
+
+        connection.subscriptions[channel] = qos
+        self._subscriptions.add(channel, connection, qos)
+
+        for topic, payload, retained_qos in self._retained.match(channel):
+            connection.deliver(topic, payload, min(qos, retained_qos), retain=True)
+
+    def _unsubscribe(self, connection, channel):
+        """Unsubscribes a connection from a channel."""
+
+        if(connection.subscriptions.pop(channel, None) is not None):
+            self._subscriptions.remove(channel, connection)
+
+    def _publish(self, topic, payload, qos, retain):
+        """Delivers a message to the subscribers of its topic, and retains it if requested."""
+
+        if(retain):
+            self._retained.set(topic, payload, qos)
+
+        # The QoS 0 packet is the same for every subscriber, so it is only built once
+        packet = None
+        for connection, granted in self._subscriptions.match(topic).items():
+            delivered_qos = min(qos, granted)
+            if(delivered_qos == 0 and packet is None):
+                packet = _packet(_PUBLISH, 0, _encode_string(topic) + payload)
+            connection.deliver(topic, payload, delivered_qos, packet=packet)
+
+    async def _check_keep_alive(self):
+        """Closes connections whose clients have not sent anything within one and a half keep alive intervals."""
+
+        while True:
+            await asyncio.sleep(0.5)
+            now = self._loop.time()
+            for x in list(self._connections):
+                if(x.client_id is None):
+                    timeout = _connect_timeout
+                elif(x.keep_alive > 0):
+                    timeout = 1.5 * x.keep_alive
+                else:
+                    continue
+
+                if(now - x.last_activity > timeout):
+                    self._logger.warning('Client ({}) exceeded its keep alive.  Closing its connection.'.format(x.client_id))
+                    x.abort()
+
+    async def _listen(self):
+        """Starts listening for connections on the running event loop."""
+
+        self._loop = asyncio.get_running_loop()
+        self._server = await self._loop.create_server(lambda: _Connection(self), self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._keep_alive_task = self._loop.create_task(self._check_keep_alive())
+        self._logger.info('Broker listening on host: {0}, port: {1}'.format(self.host, self.port))
+
+    async def _close(self):
+        """Stops listening, and closes all connections."""
+
+        self._keep_alive_task.cancel()
+        self._server.close()
+        for x in list(self._connections):
+            x.abort()
+        await self._server.wait_closed()
+
+    def _check_start(self):
+        """Checks that the broker can be started."""
+
+        if(self._started):
+            error_msg = 'Cannot call start more than once.'
+            self._logger.error(error_msg)
+            raise ValueError(error_msg)
+
+        self._started = True
+
+    def _check_stop(self):
+        """Checks that the broker can be stopped."""
+
+        if(not self._started or self._stopped):
+            error_msg = 'Cannot call stop before calling start, or more than once.'
+            self._logger.error(error_msg)
+            raise ValueError(error_msg)
+
+        self._stopped = True
+
+    def start(self):
+        """Starts the broker in a background thread, returning once it is listening.
+
+        Raises:
+            ValueError: If the broker has already been started.
+            OSError: If the broker could not listen on its host and port.
+
+        """
+
+        self._check_start()
+
+        loop = asyncio.new_event_loop()
+        started = threading.Event()
+        error = None
+
+        def run():
+            nonlocal error
+            asyncio.set_event_loop(loop)
+            try:
+                loop.run_until_complete(self._listen())
+            except Exception as e:
+                error = e
+                started.set()
+                loop.close()
+                return
+
+            started.set()
+            loop.run_forever()
+            loop.close()
+
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+        started.wait()
+
+        if(error is not None):
+            self._thread.join()
+            raise error
+
+    def stop(self):
+        """Stops the broker, closing all of its connections.
+
+        Raises:
+            ValueError: If the broker is not running.
+
+        """
+
+        self._check_stop()
+
+        asyncio.run_coroutine_threadsafe(self._close(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+
+class AsyncBroker(Broker):
+    """A Broker that runs on the caller's asyncio event loop, rather than in a background thread."""
+
+    async def start(self):
+        """Starts the broker on the running event loop.
+
+        Raises:
+            ValueError: If the broker has already been started.
+            OSError: If the broker could not listen on its host and port.
+
+        """
+
+        self._check_start()
+        await self._listen()
+
+    async def stop(self):
+        """Stops the broker, closing all of its connections.
+
+        Raises:
+            ValueError: If the broker is not running.
+
+        """
+
+        self._check_stop()
+        await self._close()
+
+
+def main():
+
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(prog='VIZIER BROKER')
+    parser.add_argument('--host', type=str, default='localhost', help='Host on which the broker listens.')
+    parser.add_argument('--port', type=int, default=1883, help='Port on which the broker listens.')
+    parser.add_argument('--max-queued-bytes', type=int, default=64*1024*1024,
+                        help='Maximum number of bytes waiting to be sent to a client, beyond which QoS 0 messages are dropped.')
+
+    args = parser.parse_args()
+
+    async def serve():
+        b = AsyncBroker(host=args.host, port=args.port, max_queued_bytes=args.max_queued_bytes)
+        await b.start()
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await b.stop()
+
+    print('ctrl+c to quit')
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+import base64
+import json
+
+# The binary codec is optional
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+class JSONCodec():
+    """Encodes messages as UTF-8 JSON.  This is the default codec of the vizier network.
+
+    JSON has no binary type, so bytes are encoded as a dict of the form {'$base64': <base64-encoded str>}.
+
+    """
+
+    name = 'json'
+
+    @staticmethod
+    def _default(obj):
+        if(isinstance(obj, (bytes, bytearray, memoryview))):
+            return {'$base64': base64.b64encode(obj).decode(encoding='ascii')}
+
+        raise TypeError('Object of type ({}) is not JSON serializable'.format(type(obj)))
+
+    @staticmethod
+    def _object_hook(obj):
+        if(len(obj) == 1 and '$base64' in obj):
+            return base64.b64decode(obj['$base64'])
+
+        return obj
+
+    def encode(self, message):
+        """Encodes a message.
+
+        Args:
+            message (dict): JSON-formatted dict representing the message.
+
+        Returns:
+            The encoded message as bytes.
+
+        """
+
+        return json.dumps(message, default=self._default).encode(encoding='UTF-8')
+
+    def decode(self, data):
+        """Decodes a message.
+
+        Args:
+            data (bytes): The encoded message.
+
+        Returns:
+            A JSON-formatted dict representing the message.
+
+        """
+
+        return json.loads(bytes(data).decode(encoding='UTF-8'), object_hook=self._object_hook)
+
+
+class MsgPackCodec():
+    """Encodes messages as MessagePack.  Bytes are encoded directly, without base64.  Requires the msgpack package."""
+
+    name = 'msgpack'
+
+    def __init__(self):
+        if(msgpack is None):
+            raise ValueError('Codec ({}) requires the msgpack package'.format(self.name))
+
+    def encode(self, message):
+        """Encodes a message.
+
+        Args:
+            message (dict): JSON-formatted dict representing the message.  Values may also be bytes.
+
+        Returns:
+            The encoded message as bytes.
+
+        """
+
+        return msgpack.packb(message, use_bin_type=True)
+
+    def decode(self, data):
+        """Decodes a message.
+
+        Args:
+            data (bytes): The encoded message.
+
+        Returns:
+            A dict representing the message.
+
+        """
+
+        return msgpack.unpackb(data, raw=False)
+
+
+_codecs = {JSONCodec.name: JSONCodec, MsgPackCodec.name: MsgPackCodec}
+
+# Codecs are stateless, so one instance of each is shared
+_instances = {}
+
+
+def get_codec(name):
+    """Gets the codec with the given name.
+
+    Args:
+        name (str): Name of the codec (e.g., 'json' or 'msgpack').
+
+    Returns:
+        The codec.
+
+    Raises:
+        ValueError: If there is no such codec, or it is not available.
+
+    """
+
+    if(name not in _codecs):
+        raise ValueError('Unknown codec ({0}).  Codecs are ({1})'.format(name, list(_codecs)))
+
+    if(name not in _instances):
+        _instances[name] = _codecs[name]()
+
+    return _instances[name]
+
+
+def detect_codec(data):
+    """Detects the codec of an encoded message.
+
+    All vizier messages are maps.  A JSON message starts with '{' (possibly after whitespace), whereas a MessagePack map starts with a byte
+    in 0x80-0x8f, 0xde or 0xdf.
+
+    Args:
+        data (bytes): The encoded message.
+
+    Returns:
+        The codec of the message.
+
+    Raises:
+        ValueError: If the codec of the message is not available.
+
+    """
+
+    first = data[0] if len(data) > 0 else None
+
+    if(first is not None and (0x80 <= first <= 0x8f or first in (0xde, 0xdf))):
+        return get_codec(MsgPackCodec.name)
+
+    return get_codec(JSONCodec.name)
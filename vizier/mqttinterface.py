@@ -1,10 +1,15 @@
 import paho.mqtt.client as mqtt
+import asyncio
+import concurrent.futures as futures
 import queue
 import threading
+import time
 import string
 import random
 import enum
+import zlib
 import vizier.log as log
+import vizier.utils as utils
 
 
 # CountDownLatch for some MQTT client checking
@@ -47,11 +52,538 @@ class _CountDownLatch():
             self._cv.wait_for(self._counted_down, timeout=timeout)
 
 
+def is_wildcard(channel):
+    """Checks if an MQTT channel contains any wildcards ('+' or '#')"""
+
+    return '+' in channel or '#' in channel
+
+
+def topic_matches(channel, topic):
+    """Checks if a topic matches an MQTT channel, which may contain wildcards.
+
+    Args:
+        channel (str): Channel, possibly containing the wildcards '+' (a single level) and '#' (any number of trailing levels).
+        topic (str): Topic without wildcards.
+
+    Returns:
+        A bool indicating whether the topic matches the channel
+
+    """
+
+    return mqtt.topic_matches_sub(channel, topic)
+
+
+def _as_payload(message):
+    """Converts a message to a payload accepted by Paho.
+
+    Bytes, bytearrays and strings are passed through without a copy.  Other objects supporting the buffer protocol (e.g., memoryviews or
+    numpy arrays) are copied once into bytes, in C order.
+
+    Args:
+        message: Message to be sent.
+
+    Returns:
+        The payload.
+
+    """
+
+    if(message is None or isinstance(message, (bytes, bytearray, str, int, float))):
+        return message
+
+    return memoryview(message).tobytes()
+
+
+class ExecutionMode(enum.Enum):
+    """Determines the thread on which the callback of a subscription runs.
+
+    INLINE runs the callback on the thread receiving messages, so a slow callback delays every other subscription of the client.  POOL runs
+    it on a thread pool shared by the client's subscriptions, so messages may be handled out of order.  SERIAL runs it on a thread
+    dedicated to the subscription, which handles messages in the order that they arrive.
+
+    """
+
+    INLINE = 0
+    POOL = 1
+    SERIAL = 2
+
+
+class Subscription():
+    """A callback subscribed to a channel.  Runs the callback according to its execution mode and records its latency.
+
+    In the POOL and SERIAL modes, at most max_pending messages wait for or are being handled by the callback.  Further messages are dropped,
+    so that a slow callback never blocks the thread receiving messages.
+
+    Attributes:
+        channel (str): Channel to which the callback is subscribed.
+        mode (ExecutionMode): Thread on which the callback runs.
+        max_pending (int): Maximum number of messages waiting for the callback.
+
+    """
+
+    def __init__(self, channel, callback, mode, executor, max_pending, logger):
+        self.channel = channel
+        self.mode = mode
+        self.max_pending = max_pending
+        self._callback = callback
+        self._executor = executor
+        self._logger = logger
+
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._messages = 0
+        self._dropped = 0
+        self._total_latency = 0.0
+        self._max_latency = 0.0
+
+    def _finished(self, received):
+        """Records that the callback finished handling a message received at the given time (from time.monotonic)."""
+
+        latency = time.monotonic() - received
+
+        with self._lock:
+            if(self.mode != ExecutionMode.INLINE):
+                self._pending -= 1
+            self._messages += 1
+            self._total_latency += latency
+            self._max_latency = max(self._max_latency, latency)
+
+    def _run(self, topic, msg, received):
+        try:
+            self._callback(topic, msg)
+        except Exception as e:
+            self._logger.error('Callback for channel ({0}) raised an exception'.format(self.channel))
+            self._logger.error(repr(e))
+        finally:
+            self._finished(received)
+
+    def dispatch(self, topic, msg):
+        """Thread safe.  Passes a message to the callback according to the execution mode.
+
+        Args:
+            topic (str): Topic on which the message was received.
+            msg (bytes): The message.
+
+        """
+
+        received = time.monotonic()
+
+        if(self.mode == ExecutionMode.INLINE):
+            try:
+                self._callback(topic, msg)
+            finally:
+                self._finished(received)
+            return
+
+        with self._lock:
+            if(self._pending >= self.max_pending):
+                self._dropped += 1
+                return
+            self._pending += 1
+
+        try:
+            self._executor.submit(self._run, topic, msg, received)
+        except RuntimeError:
+            # The executor has been shut down, so the client is stopping
+            with self._lock:
+                self._pending -= 1
+
+    def stats(self):
+        """Thread safe.  Retrieves statistics about the callback.
+
+        Returns:
+            A dict containing the number of messages handled by the callback (messages), messages dropped because too many were pending
+            (dropped), messages waiting for the callback (pending), and the mean and maximum time in seconds from the receipt of a message
+            to the end of its callback (mean_latency and max_latency).
+
+        """
+
+        with self._lock:
+            return {'messages': self._messages, 'dropped': self._dropped, 'pending': self._pending,
+                    'mean_latency': self._total_latency / self._messages if self._messages > 0 else 0.0,
+                    'max_latency': self._max_latency}
+
+    def close(self):
+        """Stops the dedicated thread of a SERIAL subscription.  Messages already waiting are still handled."""
+
+        if(self.mode == ExecutionMode.SERIAL):
+            self._executor.shutdown(wait=False)
+
+
+class _TrieNode():
+    """A level of a _TopicTrie.
+
+    Attributes:
+        children (dict): Maps the next level of the channel (possibly '+' or '#') to a _TrieNode.
+        callbacks (tuple): Callbacks for the channel ending at this level.
+
+    """
+
+    __slots__ = ('children', 'callbacks')
+
+    def __init__(self):
+        self.children = {}
+        self.callbacks = ()
+
+
+class _TopicTrie():
+    """Immutable trie of subscribed channels, which finds the callbacks for a topic with MQTT wildcard semantics.
+
+    The trie is never modified after it is built, so it can be read from any thread without a lock.  Subscriptions are changed by building
+    a new trie (copy-on-write).
+
+    Attributes:
+        _root (_TrieNode): The first level of all channels.
+
+    """
+
+    def __init__(self, callbacks):
+        """Builds the trie.
+
+        Args:
+            callbacks (dict): Maps each channel to a tuple of callbacks.
+
+        """
+
+        self._root = _TrieNode()
+
+        for channel, y in callbacks.items():
+            node = self._root
+            for level in channel.split('/'):
+                node = node.children.setdefault(level, _TrieNode())
+            node.callbacks = tuple(y)
+
+    def match(self, topic):
+        """Finds the callbacks of every channel that matches a topic.
+
+        Args:
+            topic (str): Topic of a received message.
+
+        Returns:
+            A list of the matching callbacks.
+
+        """
+
+        matched = []
+
+        # Per the MQTT specification, topics starting with '$' are not matched by a leading wildcard
+        wildcards = not topic.startswith('$')
+        nodes = [self._root]
+
+        for level in topic.split('/'):
+            next_nodes = []
+            for x in nodes:
+                if(wildcards):
+                    child = x.children.get('#')
+                    if(child is not None):
+                        matched.extend(child.callbacks)
+
+                    child = x.children.get('+')
+                    if(child is not None):
+                        next_nodes.append(child)
+
+                child = x.children.get(level)
+                if(child is not None):
+                    next_nodes.append(child)
+
+            nodes = next_nodes
+            wildcards = True
+            if(not nodes):
+                return matched
+
+        # A '#' also matches the level above it (e.g., 'a/#' matches 'a')
+        for x in nodes:
+            matched.extend(x.callbacks)
+            child = x.children.get('#')
+            if(child is not None):
+                matched.extend(child.callbacks)
+
+        return matched
+
+
 class _Task(enum.Enum):
     RECONNECT = 0
 
 
-class MQTTInterface:
+class DropPolicy(enum.Enum):
+    """Determines what a bounded subscription queue does with a message that arrives when it is full.
+
+    DROP_OLDEST discards the oldest queued message, DROP_NEWEST discards the arriving message, LATEST keeps only the most recent message
+    (the queue holds at most one message) and BLOCK waits for space.  BLOCK stalls the thread delivering messages, so it applies
+    back-pressure to every subscription of the client.
+
+    """
+
+    DROP_OLDEST = 0
+    DROP_NEWEST = 1
+    LATEST = 2
+    BLOCK = 3
+
+
+class SubscriptionQueue(queue.Queue):
+    """A queue.Queue of messages received on a subscription, which handles overflow according to a DropPolicy.
+
+    Attributes:
+        policy (DropPolicy): What to do with a message that arrives when the queue is full.
+        dropped (int): Number of messages that have been discarded.
+
+    """
+
+    def __init__(self, maxsize=0, policy=DropPolicy.BLOCK):
+        super().__init__(maxsize=1 if policy == DropPolicy.LATEST else maxsize)
+        self.policy = policy
+        self.dropped = 0
+
+    def offer(self, msg):
+        """Thread safe.  Adds a message to the queue, discarding a message or waiting for space if the queue is full.
+
+        Args:
+            msg (bytes): Message to be added.
+
+        """
+
+        if(self.policy == DropPolicy.BLOCK):
+            self.put(msg)
+            return
+
+        with self.mutex:
+            if(0 < self.maxsize <= self._qsize()):
+                self.dropped += 1
+                if(self.policy == DropPolicy.DROP_NEWEST):
+                    return
+                self._get()
+            else:
+                self.unfinished_tasks += 1
+
+            self._put(msg)
+            self.not_empty.notify()
+
+
+class LatestValue():
+    """Holds only the most recent message received on a subscription, for readers that only care about the newest value.
+
+    The message, the time at which it was received and its sequence number are stored together in a single slot, which is replaced
+    atomically on each message.  Reading the slot never takes a lock, and the thread delivering messages only takes a lock if a reader is
+    waiting for a newer message.  Messages must be delivered by a single thread.
+
+    For example,
+
+    .. code-block:: python
+
+        latest = client.subscribe_latest('node/stream')
+        seq = 0
+        while True:
+            sample = latest.wait_newer(seq, timeout=1)
+            if(sample is not None):
+                msg, timestamp, seq = sample
+
+    Attributes:
+        _sample (tuple): The most recent (message, timestamp, sequence number).
+        _cv (threading.Condition): Condition variable for readers waiting on a newer message.
+        _waiters (int): Number of readers waiting on a newer message.
+
+    """
+
+    def __init__(self):
+        self._sample = (None, None, 0)
+        self._cv = threading.Condition()
+        self._waiters = 0
+
+    def offer(self, msg):
+        """Replaces the most recent message.
+
+        Args:
+            msg (bytes): Message that was received.
+
+        """
+
+        self._sample = (msg, time.monotonic(), self._sample[2] + 1)
+
+        if(self._waiters > 0):
+            with self._cv:
+                self._cv.notify_all()
+
+    def get(self):
+        """Thread safe.  Gets the most recent message.
+
+        Returns:
+            A tuple (message, timestamp, seq) of the most recent message, the time at which it was received (from time.monotonic) and its
+            sequence number.  The sequence number starts from 1, and is 0 if no message has been received.
+
+        """
+
+        return self._sample
+
+    def wait_newer(self, seq, timeout=None):
+        """Thread safe.  Waits for a message newer than the given sequence number.
+
+        Args:
+            seq (int): Sequence number of the last message that the reader has seen.
+            timeout (double, optional): Maximum time to wait.  If None, waits indefinitely.
+
+        Returns:
+            A tuple (message, timestamp, seq) as returned by get, or None if no newer message was received before the timeout.
+
+        """
+
+        sample = self._sample
+        if(sample[2] > seq):
+            return sample
+
+        with self._cv:
+            self._waiters += 1
+            try:
+                self._cv.wait_for(lambda: self._sample[2] > seq, timeout=timeout)
+            finally:
+                self._waiters -= 1
+
+        sample = self._sample
+        return sample if sample[2] > seq else None
+
+
+class AsyncSubscriptionQueue(asyncio.Queue):
+    """An asyncio.Queue of messages received on a subscription, which handles overflow according to a DropPolicy.
+
+    Messages are delivered on the event loop, which must not block, so DropPolicy.BLOCK is only allowed for unbounded queues.
+
+    Attributes:
+        policy (DropPolicy): What to do with a message that arrives when the queue is full.
+        dropped (int): Number of messages that have been discarded.
+
+    """
+
+    def __init__(self, maxsize=0, policy=DropPolicy.BLOCK):
+        if(policy == DropPolicy.BLOCK and maxsize > 0):
+            raise ValueError('Bounded subscription queues on the event loop cannot block')
+
+        super().__init__(maxsize=1 if policy == DropPolicy.LATEST else maxsize)
+        self.policy = policy
+        self.dropped = 0
+
+    def offer(self, msg):
+        """Adds a message to the queue, discarding a message if the queue is full.
+
+        Args:
+            msg (bytes): Message to be added.
+
+        """
+
+        if(self.full()):
+            self.dropped += 1
+            if(self.policy == DropPolicy.DROP_NEWEST):
+                return
+            self.get_nowait()
+            self.task_done()
+
+        self.put_nowait(msg)
+
+
+class _SubscriptionTable():
+    """Keeps the subscriptions of a client, and dispatches received messages to them.
+
+    Incoming messages are dispatched through an immutable _TopicTrie, which is replaced whenever the subscriptions change, so the thread
+    receiving messages never takes the lock.  Classes using this must set the following attributes.
+
+    Attributes:
+        _lock (threading.Lock): Held while the subscriptions change.
+        _callbacks (dict): Maps each subscribed channel to a tuple of Subscriptions.
+        _dispatch (_TopicTrie): Trie of the subscriptions.
+        _max_workers (int): Number of threads for callbacks in the POOL execution mode.
+        _pool (concurrent.futures.ThreadPoolExecutor): Thread pool for callbacks in the POOL execution mode.  Created when first needed.
+        _logger (logging.Logger): Logger for the client.
+
+    """
+
+    def _rebuild_dispatch(self):
+        """Replaces the dispatch trie after the subscriptions change.  Must hold the lock."""
+
+        self._dispatch = _TopicTrie({x: tuple(z.dispatch for z in y) for x, y in self._callbacks.items()})
+
+    def _dispatch_message(self, topic, msg):
+        """Thread safe.  Passes a message to the callbacks of every channel that matches its topic."""
+
+        for callback in self._dispatch.match(topic):
+            callback(topic, msg)
+
+    def _add_subscription(self, channel, callback, with_topic, mode, max_pending):
+        """Adds a subscription.  Must hold the lock.
+
+        Returns:
+            A tuple (subscription, is_new) of the Subscription, and whether it is the first for its channel.
+
+        """
+
+        if(with_topic):
+            f = callback
+        else:
+            def f(topic, msg):
+                callback(msg)
+
+        if(mode == ExecutionMode.POOL):
+            if(self._pool is None):
+                self._pool = futures.ThreadPoolExecutor(max_workers=self._max_workers)
+            executor = self._pool
+        elif(mode == ExecutionMode.SERIAL):
+            executor = futures.ThreadPoolExecutor(max_workers=1)
+        else:
+            executor = None
+
+        subscription = Subscription(channel, f, mode, executor, max_pending, self._logger)
+        is_new = channel not in self._callbacks
+
+        self._callbacks[channel] = self._callbacks.get(channel, ()) + (subscription,)
+        self._rebuild_dispatch()
+
+        return subscription, is_new
+
+    def _remove_subscription(self, subscription):
+        """Removes a subscription.  Must hold the lock.
+
+        Returns:
+            A bool indicating whether it was the last subscription for its channel.
+
+        """
+
+        channel = subscription.channel
+        if(channel not in self._callbacks):
+            return False
+
+        remaining = tuple(x for x in self._callbacks[channel] if x is not subscription)
+        if(remaining):
+            self._callbacks[channel] = remaining
+        else:
+            self._callbacks.pop(channel)
+        self._rebuild_dispatch()
+
+        return not remaining
+
+    def _remove_channel(self, channel):
+        """Removes all the subscriptions for a channel.  Must hold the lock.
+
+        Returns:
+            A tuple of the removed Subscriptions.
+
+        """
+
+        subscriptions = self._callbacks.pop(channel, ())
+        self._rebuild_dispatch()
+
+        return subscriptions
+
+    def _shutdown_executors(self):
+        """Stops the threads running callbacks, after they finish the messages that are waiting."""
+
+        with self._lock:
+            subscriptions = [x for y in self._callbacks.values() for x in y]
+            pool = self._pool
+
+        for x in subscriptions:
+            x.close()
+
+        if(pool is not None):
+            pool.shutdown(wait=True)
+
+
+class MQTTInterface(_SubscriptionTable):
     """This is a wrapper around the Paho MQTT interface with enhanced functionality
 
     Attributes:
@@ -60,12 +592,16 @@ class MQTTInterface:
 
     """
 
-    def __init__(self, port=1884, keep_alive=5, host="localhost"):
+    def __init__(self, port=1884, keep_alive=5, host="localhost", max_workers=4):
             # Set up MQTT client
             self._host = host
             self._port = port
             self._keep_alive = keep_alive
 
+            # Thread pool for callbacks of subscriptions in the POOL execution mode.  Created when first needed
+            self._max_workers = max_workers
+            self._pool = None
+
             # Internal thread to handle reconnects/resubscribes
             self._reconnect_thread = None
             self._signal_reconnect = queue.Queue()
@@ -84,8 +620,12 @@ class MQTTInterface:
             self._cdl = _CountDownLatch(1)
             self._client.on_connect = self._on_connect
 
-            # I shouldn't need a lock for this...
+            # Subscriptions for each subscribed channel.  Only changed while holding the lock (see _SubscriptionTable)
             self._callbacks = {}
+            self._dispatch = _TopicTrie(self._callbacks)
+
+            # Birth messages, published on each connection, mapped by channel to (message, retain).  Only changed while holding the lock
+            self._births = {}
 
             self._logger = log.get_logger()
 
@@ -127,6 +667,13 @@ class MQTTInterface:
                 with self._lock:
                     for sub in self._callbacks.keys():
                         self._client.subscribe(sub)
+                    self._publish_births()
+
+    def _publish_births(self):
+        """Publishes the birth messages.  Must be called while holding the lock."""
+
+        for channel, (message, retain) in self._births.items():
+            self._client.publish(channel, _as_payload(message), retain=retain)
 
     def _on_message(self, client, userdata, msg):
         """Thread safe. Callback handling messages from the client.  Either puts the message into a callback or a channel
@@ -138,49 +685,72 @@ class MQTTInterface:
 
         """
 
-        callback = self._callbacks.get(msg.topic)
-        if(callback is not None):
-            callback(msg.payload)
+        self._dispatch_message(msg.topic, msg.payload)
 
-    def subscribe_with_callback(self, channel, callback):
+    def subscribe_with_callback(self, channel, callback, with_topic=False, mode=ExecutionMode.INLINE, max_pending=1024):
         """Thread safe.  Subscribes to a channel with a callback using the underlying MQTT client.
 
-        All messages to that channel will be passed into the callback.
+        All messages to that channel will be passed into the callback.  The channel may contain the MQTT wildcards '+' and '#'.  A channel
+        may have more than one callback, and a message is passed to the callbacks of every channel that it matches.
 
         Args:
             channel (str): Channel to which the node subscribes.
             callback (function): Callback function for the topic.
+            with_topic (bool, optional): If True, the callback is called as callback(topic, message) rather than callback(message).
+            mode (ExecutionMode, optional): Thread on which the callback runs.
+            max_pending (int, optional): Maximum number of messages waiting for the callback in the POOL and SERIAL modes.
+
+        Returns:
+            The Subscription, which reports statistics about the callback.
 
         """
 
         with self._lock:
-            self._callbacks.update({channel: callback})
-            self._client.subscribe(channel)
+            subscription, is_new = self._add_subscription(channel, callback, with_topic, mode, max_pending)
+
+            # The broker subscription is shared by all the callbacks of the channel
+            if(is_new):
+                self._client.subscribe(channel)
 
-    def subscribe(self, channel):
+        return subscription
+
+    def subscribe(self, channel, maxsize=0, policy=DropPolicy.BLOCK):
         """Thread safe. A subscribe routine that yields a queue to which all subsequent messages to the given topic will be passed.
 
         Args:
             channel (str): Channel to which the client will subscribe.
+            maxsize (int, optional): Maximum number of queued messages.  If less than or equal to 0, the queue is unbounded.
+            policy (DropPolicy, optional): What to do with a message that arrives when the queue is full.
 
         Returns:
-            A queue containing all future messages from the supplied channel.
+            A SubscriptionQueue containing all future messages from the supplied channel.
 
         """
 
         # Should be thread safe, since locking is handled in subscribe_with_callback
-        q = queue.Queue()
+        q = SubscriptionQueue(maxsize=maxsize, policy=policy)
+        self.subscribe_with_callback(channel, q.offer)
 
-        def f(msg):
-            nonlocal q
-            q.put(msg)
+        return q
 
-        self.subscribe_with_callback(channel, f)
+    def subscribe_latest(self, channel):
+        """Thread safe.  Subscribes to a channel, keeping only the most recent message.
 
-        return q
+        Args:
+            channel (str): Channel to which the client will subscribe.
+
+        Returns:
+            A LatestValue holding the most recent message from the supplied channel.
+
+        """
+
+        latest = LatestValue()
+        self.subscribe_with_callback(channel, latest.offer)
+
+        return latest
 
     def unsubscribe(self, channel):
-        """Thread safe. Unsubscribes from a particular channel.
+        """Thread safe. Unsubscribes from a particular channel, removing all of its callbacks.
 
         Args:
             channel (str): Channel from which the client unsubscribes.
@@ -189,29 +759,100 @@ class MQTTInterface:
 
         with self._lock:
             self._client.unsubscribe(channel)
-            self._callbacks.pop(channel, None)
+            subscriptions = self._remove_channel(channel)
+
+        for x in subscriptions:
+            x.close()
+
+    def remove_subscription(self, subscription):
+        """Thread safe.  Removes a single callback, leaving the other callbacks of its channel.  The client unsubscribes from the channel when
+        its last callback is removed.
+
+        Args:
+            subscription (Subscription): The subscription returned by subscribe_with_callback.
+
+        """
+
+        with self._lock:
+            if(self._remove_subscription(subscription)):
+                self._client.unsubscribe(subscription.channel)
+
+        subscription.close()
 
-    def send_message(self, channel, message):
+    def send_message(self, channel, message, retain=False):
         """Thread safe.  Sends a message on the MQTT client.
 
+        Paho copies the payload into the outgoing packet, so each message costs one copy of its data.  Payloads of types that Paho does not
+        accept (see _as_payload) cost a second, staging copy.
+
         Args:
             channel (str): string (channel on which to send message).
-            message (bytes): Message to be sent.  Should be in an encoded bytes format (like UTF-8).
+            message (bytes): Message to be sent.  Should be in an encoded bytes format (like UTF-8), or any object supporting the buffer
+                protocol (e.g., bytearray, memoryview or a numpy array).
+            retain (bool, optional): Whether the broker retains the message, and sends it to clients that subscribe to the channel later.
+                An empty retained message removes the channel's retained message.
 
         """
 
-        self._client.publish(channel, message)
+        self._client.publish(channel, _as_payload(message), retain=retain)
 
-    def start(self, timeout=None):
-        """Handles starting the underlying MQTT client."""
+    def set_will(self, channel, message, retain=False):
+        """Sets the client's last will, which the broker publishes if the client loses its connection without stopping (e.g., because its
+        process died).
+
+        Args:
+            channel (str): Channel on which the will is published.
+            message (bytes): The will.
+            retain (bool, optional): Whether the broker retains the will (see send_message).
+
+        Raises:
+            ValueError: If the client has already been started.
+
+        """
 
         if(self._started):
-            error_msg = 'Cannot call start more than once.'
+            error_msg = 'Cannot set will after calling start.'
             self._logger.error(error_msg)
             raise ValueError(error_msg)
 
-        if(self._stopped):
-            error_msg = 'Cannot call start after calling stop.'
+        self._client.will_set(channel, _as_payload(message), retain=retain)
+
+    def set_birth(self, channel, message, retain=False):
+        """Thread safe.  Sets a birth message, which is published now and each time the client reconnects to the broker.  Together with a
+        will, it lets other clients track whether this client is connected, since the will may have replaced a retained message.
+
+        Args:
+            channel (str): Channel on which the birth message is published.  A channel has at most one birth message.
+            message (bytes): The birth message.
+            retain (bool, optional): Whether the broker retains the birth message (see send_message).
+
+        """
+
+        with self._lock:
+            self._births[channel] = (message, retain)
+            self._client.publish(channel, _as_payload(message), retain=retain)
+
+    def clear_birth(self, channel):
+        """Thread safe.  Removes the birth message of a channel, so that it is no longer published on reconnects.
+
+        Args:
+            channel (str): Channel of the birth message.
+
+        """
+
+        with self._lock:
+            self._births.pop(channel, None)
+
+    def start(self, timeout=None):
+        """Handles starting the underlying MQTT client."""
+
+        if(self._started):
+            error_msg = 'Cannot call start more than once.'
+            self._logger.error(error_msg)
+            raise ValueError(error_msg)
+
+        if(self._stopped):
+            error_msg = 'Cannot call start after calling stop.'
             self._logger.error(error_msg)
             raise ValueError(error_msg)
 
@@ -244,9 +885,675 @@ class MQTTInterface:
             self._signal_reconnect.put(None)
             self._reconnect_thread.join()
 
-            # Stops MQTT client
+            # Disconnecting cleanly tells the broker not to publish the will.  The client's thread sends any queued messages before it stops
+            self._client.disconnect()
             self._client.loop_stop()
+            self._shutdown_executors()
         else:
             error_msg = 'Cannot call stop before calling start.'
             self._logger.error(error_msg)
             raise ValueError(error_msg)
+
+
+class ConnectionPool():
+    """Shares a few MQTT connections between many clients (e.g., the nodes of a process).
+
+    Each client is a SharedMQTTInterface, created by create_interface, which has the same methods as MQTTInterface.  Channels are sharded
+    across the connections by a hash of the channel, so that the messages on each channel stay in order.  Subscriptions are reference
+    counted, so the connection subscribes to a channel once no matter how many clients subscribe to it.  The connections are started when
+    the first client starts, and stopped when the last client stops.
+
+    For example,
+
+    .. code-block:: python
+
+        pool = ConnectionPool(host='localhost', port=1884, connections=2)
+        nodes = [Node('localhost', 1884, x, connection_pool=pool) for x in descriptors]
+
+    Attributes:
+        host (str): The MQTT broker's host to which the connections connect.
+        port (int): The MQTT broker's port to which the connections connect.
+
+    """
+
+    def __init__(self, port=1884, keep_alive=5, host="localhost", connections=1):
+        self._host = host
+        self._port = port
+        self._interfaces = [MQTTInterface(port=port, keep_alive=keep_alive, host=host) for _ in range(connections)]
+
+        self._lock = threading.Lock()
+        self._clients = 0
+        self._stopped = False
+        self._logger = log.get_logger()
+
+    def create_interface(self):
+        """Thread safe.  Creates a client of the pool.
+
+        Returns:
+            A SharedMQTTInterface.
+
+        """
+
+        return SharedMQTTInterface(self)
+
+    def shard(self, channel):
+        """Thread safe.  Gets the connection for a channel.
+
+        Args:
+            channel (str): An MQTT channel.
+
+        Returns:
+            The MQTTInterface that handles the channel.
+
+        """
+
+        return self._interfaces[zlib.crc32(channel.encode(encoding='UTF-8')) % len(self._interfaces)]
+
+    def acquire(self, timeout=None):
+        """Thread safe.  Starts the connections, if this is the first client to start.
+
+        Raises:
+            ValueError: If the connections have been stopped.
+
+        """
+
+        with self._lock:
+            if(self._stopped):
+                error_msg = 'Cannot use connection pool after all of its clients have stopped.'
+                self._logger.error(error_msg)
+                raise ValueError(error_msg)
+
+            self._clients += 1
+            if(self._clients == 1):
+                for x in self._interfaces:
+                    x.start(timeout=timeout)
+
+    def release(self):
+        """Thread safe.  Stops the connections, if this is the last client to stop."""
+
+        with self._lock:
+            self._clients -= 1
+            if(self._clients == 0):
+                self._stopped = True
+                for x in self._interfaces:
+                    x.stop()
+
+
+class SharedMQTTInterface():
+    """A client of a ConnectionPool.  Has the same methods as MQTTInterface.
+
+    Stopping the client removes all of its subscriptions, without affecting those of the pool's other clients.
+
+    """
+
+    def __init__(self, pool):
+        self._pool = pool
+        self._lock = threading.Lock()
+        self._subscriptions = {}
+        self._started = False
+        self._logger = log.get_logger()
+
+    # These only depend on subscribe_with_callback
+    subscribe = MQTTInterface.subscribe
+    subscribe_latest = MQTTInterface.subscribe_latest
+
+    def subscribe_with_callback(self, channel, callback, with_topic=False, mode=ExecutionMode.INLINE, max_pending=1024):
+        """Thread safe.  Subscribes to a channel with a callback, on the connection for the channel.  See MQTTInterface.subscribe_with_callback.
+
+        Returns:
+            The Subscription, which reports statistics about the callback.
+
+        """
+
+        subscription = self._pool.shard(channel).subscribe_with_callback(channel, callback, with_topic=with_topic, mode=mode,
+                                                                         max_pending=max_pending)
+
+        with self._lock:
+            self._subscriptions.setdefault(channel, []).append(subscription)
+
+        return subscription
+
+    def unsubscribe(self, channel):
+        """Thread safe.  Removes this client's callbacks for a channel.
+
+        Args:
+            channel (str): Channel from which the client unsubscribes.
+
+        """
+
+        with self._lock:
+            subscriptions = self._subscriptions.pop(channel, [])
+
+        for x in subscriptions:
+            self._pool.shard(channel).remove_subscription(x)
+
+    def send_message(self, channel, message, retain=False):
+        """Thread safe.  Sends a message on the connection for the channel.
+
+        Args:
+            channel (str): string (channel on which to send message).
+            message (bytes): Message to be sent.  Should be in an encoded bytes format (like UTF-8).
+            retain (bool, optional): Whether the broker retains the message (see MQTTInterface.send_message).
+
+        """
+
+        self._pool.shard(channel).send_message(channel, message, retain=retain)
+
+    def set_will(self, channel, message, retain=False):
+        """Logs a warning, without setting a will.  The pool's connections are shared by several clients, so the broker cannot tell when
+        one of them has failed.  Clients of the pool must instead publish the will themselves when they stop (e.g., nodes remove their
+        retained descriptor in node.Node.stop).
+
+        Args:
+            channel (str): Channel on which the will would be published.
+            message (bytes): The will.
+            retain (bool, optional): Whether the broker would retain the will.
+
+        """
+
+        self._logger.warning('Cannot set a will on channel ({}) for a pooled connection.  It is not published if the process fails'.format(channel))
+
+    def set_birth(self, channel, message, retain=False):
+        """Thread safe.  Sets a birth message on the connection for the channel (see MQTTInterface.set_birth).
+
+        Args:
+            channel (str): Channel on which the birth message is published.
+            message (bytes): The birth message.
+            retain (bool, optional): Whether the broker retains the birth message.
+
+        """
+
+        self._pool.shard(channel).set_birth(channel, message, retain=retain)
+
+    def clear_birth(self, channel):
+        """Thread safe.  Removes the birth message of a channel (see MQTTInterface.clear_birth).
+
+        Args:
+            channel (str): Channel of the birth message.
+
+        """
+
+        self._pool.shard(channel).clear_birth(channel)
+
+    def start(self, timeout=None):
+        """Starts the pool's connections, if they have not been started."""
+
+        self._started = True
+        self._pool.acquire(timeout=timeout)
+
+    def stop(self):
+        """Removes all of this client's subscriptions, and stops the pool's connections if no other client is using them."""
+
+        if(not self._started):
+            error_msg = 'Cannot call stop before calling start.'
+            self._logger.error(error_msg)
+            raise ValueError(error_msg)
+
+        with self._lock:
+            channels = list(self._subscriptions)
+
+        for x in channels:
+            self.unsubscribe(x)
+
+        self._pool.release()
+
+
+def _destination(channel):
+    """Finds the end point to which a message on a channel is addressed.
+
+    Requests (<end_point>/requests) are addressed to the node receiving the request, responses (<node>/responses/<end_point>/<id>) to the
+    node that made the request, and everything else to the node that owns the link.  Discovery messages (vizier/discovery/<end_point>, see
+    utils.create_discovery_link) are broadcasts, owned by the node that they describe.
+
+    Args:
+        channel (str): Channel on which the message is sent.
+
+    Returns:
+        A tuple (end_point, is_stream) of the end point, and whether the channel is a link rather than a request or response channel.
+
+    """
+
+    if(channel.startswith(utils._discovery_prefix + '/')):
+        return channel[len(utils._discovery_prefix) + 1:], True
+
+    tokens = channel.split('/')
+
+    if(len(tokens) == 2 and tokens[1] == 'requests'):
+        return tokens[0], False
+
+    if(len(tokens) >= 3 and tokens[1] == 'responses'):
+        return tokens[2], False
+
+    return tokens[0], True
+
+
+class LoopbackBus(_SubscriptionTable):
+    """Delivers messages between the nodes of a process directly, without a broker.  Messages are passed by reference, on the sending
+    thread.
+
+    Each node has a LoopbackInterface, created by create_interface, which has the same methods as MQTTInterface.  Messages to nodes that
+    are registered on the bus are delivered through it, and all other messages are sent through the interface's remote client (e.g., an
+    MQTTInterface).  Without remote clients, the bus is a broker-free network for the nodes of the process.
+
+    For example,
+
+    .. code-block:: python
+
+        bus = LoopbackBus()
+        node_a = Node(None, None, descriptor_a, loopback=bus)
+        node_b = Node(None, None, descriptor_b, loopback=bus)
+
+    """
+
+    def __init__(self, max_workers=4):
+        self._lock = threading.Lock()
+        self._callbacks = {}
+        self._dispatch = _TopicTrie(self._callbacks)
+        self._max_workers = max_workers
+        self._pool = None
+        self._logger = log.get_logger()
+
+        # Nodes registered on the bus, by end point.  Replaced rather than modified, so that it can be read without the lock
+        self._nodes = {}
+
+        # Retained message of each channel.  Only changed while holding the lock
+        self._retained = {}
+
+    def create_interface(self, end_point, node=None, remote=None):
+        """Thread safe.  Creates the interface of a node to the bus.
+
+        Args:
+            end_point (str): End point of the node.
+            node (optional): The node, which other nodes may read directly (see get_node).
+            remote (optional): Client through which messages to other processes are sent (e.g., an MQTTInterface).
+
+        Returns:
+            A LoopbackInterface.
+
+        """
+
+        return LoopbackInterface(self, end_point, node=node, remote=remote)
+
+    def register(self, end_point, node=None):
+        """Thread safe.  Registers a node on the bus, so that messages addressed to it are delivered through the bus."""
+
+        with self._lock:
+            nodes = dict(self._nodes)
+            nodes[end_point] = node
+            self._nodes = nodes
+
+    def unregister(self, end_point):
+        """Thread safe.  Removes a node from the bus."""
+
+        with self._lock:
+            nodes = dict(self._nodes)
+            nodes.pop(end_point, None)
+            self._nodes = nodes
+
+    def is_local(self, end_point):
+        """Thread safe.  Checks whether a node is registered on the bus."""
+
+        return end_point in self._nodes
+
+    def get_node(self, end_point):
+        """Thread safe.  Gets a node registered on the bus, or None if there is no such node."""
+
+        return self._nodes.get(end_point)
+
+    def subscribe_with_callback(self, channel, callback, with_topic=False, mode=ExecutionMode.INLINE, max_pending=1024):
+        """Thread safe.  Subscribes to a channel on the bus.  See MQTTInterface.subscribe_with_callback.
+
+        Returns:
+            The Subscription.
+
+        """
+
+        with self._lock:
+            subscription, _ = self._add_subscription(channel, callback, with_topic, mode, max_pending)
+            retained = [(x, y) for x, y in self._retained.items() if topic_matches(channel, x)]
+
+        # As with a broker, the new subscription receives the retained messages of the channel
+        for x, y in retained:
+            subscription.dispatch(x, y)
+
+        return subscription
+
+    def remove_subscription(self, subscription):
+        """Thread safe.  Removes a subscription from the bus."""
+
+        with self._lock:
+            self._remove_subscription(subscription)
+
+        subscription.close()
+
+    def send_message(self, channel, message, retain=False):
+        """Thread safe.  Delivers a message to the bus's subscribers.
+
+        Args:
+            channel (str): Channel on which the message is sent.
+            message: Message to be delivered, by reference.  Strings are UTF-8 encoded, so that all subscribers receive bytes.
+            retain (bool, optional): Whether the message is retained for later subscribers (see MQTTInterface.send_message).
+
+        """
+
+        if(isinstance(message, str)):
+            message = message.encode(encoding='UTF-8')
+
+        if(retain):
+            with self._lock:
+                if(len(message) > 0):
+                    self._retained[channel] = message
+                else:
+                    self._retained.pop(channel, None)
+
+        self._dispatch_message(channel, message)
+
+
+class LoopbackInterface():
+    """A node's interface to a LoopbackBus.  Has the same methods as MQTTInterface.
+
+    Requests and responses go through the bus if they are addressed to a node on the bus, and otherwise through the remote client.  Data
+    published on a link goes to the bus and to the remote client.  Messages from the remote client on the links of nodes on the bus are
+    dropped, since they have already been delivered through the bus.
+
+    """
+
+    def __init__(self, bus, end_point, node=None, remote=None):
+        self._bus = bus
+        self._end_point = end_point
+        self._node = node
+        self._remote = remote
+        self._lock = threading.Lock()
+        self._subscriptions = {}
+        self._started = False
+        self._logger = log.get_logger()
+
+    # These only depend on subscribe_with_callback
+    subscribe = MQTTInterface.subscribe
+    subscribe_latest = MQTTInterface.subscribe_latest
+
+    def subscribe_with_callback(self, channel, callback, with_topic=False, mode=ExecutionMode.INLINE, max_pending=1024):
+        """Thread safe.  Subscribes to a channel on the bus and through the remote client.  See MQTTInterface.subscribe_with_callback.
+
+        Returns:
+            The Subscription on the bus.
+
+        """
+
+        subscription = self._bus.subscribe_with_callback(channel, callback, with_topic=with_topic, mode=mode, max_pending=max_pending)
+
+        if(self._remote is not None):
+            def f(topic, msg):
+                end_point, is_stream = _destination(topic)
+                if(is_stream and self._bus.is_local(end_point)):
+                    return
+
+                if(with_topic):
+                    callback(topic, msg)
+                else:
+                    callback(msg)
+
+            self._remote.subscribe_with_callback(channel, f, with_topic=True, mode=mode, max_pending=max_pending)
+
+        with self._lock:
+            self._subscriptions.setdefault(channel, []).append(subscription)
+
+        return subscription
+
+    def unsubscribe(self, channel):
+        """Thread safe.  Unsubscribes from a channel on the bus and through the remote client.
+
+        Args:
+            channel (str): Channel from which the client unsubscribes.
+
+        """
+
+        with self._lock:
+            subscriptions = self._subscriptions.pop(channel, [])
+
+        for x in subscriptions:
+            self._bus.remove_subscription(x)
+
+        if(self._remote is not None):
+            self._remote.unsubscribe(channel)
+
+    def send_message(self, channel, message, retain=False):
+        """Thread safe.  Sends a message through the bus, the remote client or both, depending on its destination.
+
+        Retained messages are broadcasts (e.g., node descriptors for discovery), so they are always sent through both.  Subscribers with a
+        remote client may then receive them twice.
+
+        Args:
+            channel (str): Channel on which the message is sent.
+            message (bytes): Message to be sent.
+            retain (bool, optional): Whether the message is retained for later subscribers (see MQTTInterface.send_message).
+
+        """
+
+        end_point, is_stream = _destination(channel)
+
+        if(retain or self._bus.is_local(end_point)):
+            self._bus.send_message(channel, message, retain=retain)
+            if(not is_stream):
+                return
+
+        if(self._remote is not None):
+            self._remote.send_message(channel, message, retain=retain)
+
+    def set_will(self, channel, message, retain=False):
+        """Sets the last will of the remote client.  Nodes on the bus fail with their process, so the bus itself has no wills.
+
+        Args:
+            channel (str): Channel on which the will is published.
+            message (bytes): The will.
+            retain (bool, optional): Whether the broker retains the will (see MQTTInterface.send_message).
+
+        """
+
+        if(self._remote is not None):
+            self._remote.set_will(channel, message, retain=retain)
+
+    def set_birth(self, channel, message, retain=False):
+        """Thread safe.  Sends a birth message through the bus, and sets it on the remote client (see MQTTInterface.set_birth).
+
+        Args:
+            channel (str): Channel on which the birth message is published.
+            message (bytes): The birth message.
+            retain (bool, optional): Whether the birth message is retained.
+
+        """
+
+        if(retain or self._bus.is_local(_destination(channel)[0])):
+            self._bus.send_message(channel, message, retain=retain)
+
+        if(self._remote is not None):
+            self._remote.set_birth(channel, message, retain=retain)
+
+    def clear_birth(self, channel):
+        """Thread safe.  Removes the birth message of a channel from the remote client.
+
+        Args:
+            channel (str): Channel of the birth message.
+
+        """
+
+        if(self._remote is not None):
+            self._remote.clear_birth(channel)
+
+    def start(self, timeout=None):
+        """Registers the node on the bus, and starts the remote client."""
+
+        if(self._remote is not None):
+            self._remote.start(timeout=timeout)
+
+        self._started = True
+        self._bus.register(self._end_point, self._node)
+
+    def stop(self):
+        """Removes the node and its subscriptions from the bus, and stops the remote client."""
+
+        if(not self._started):
+            error_msg = 'Cannot call stop before calling start.'
+            self._logger.error(error_msg)
+            raise ValueError(error_msg)
+
+        self._bus.unregister(self._end_point)
+
+        with self._lock:
+            subscriptions = [x for y in self._subscriptions.values() for x in y]
+            self._subscriptions.clear()
+
+        for x in subscriptions:
+            self._bus.remove_subscription(x)
+
+        if(self._remote is not None):
+            self._remote.stop()
+
+
+class AsyncMQTTInterface(MQTTInterface):
+    """An asyncio version of the MQTT interface.  The Paho MQTT client's socket is run directly on the event loop, so no background threads
+    are created and all callbacks are called from the event loop.
+
+    The subscription methods are the same as those of MQTTInterface, except that subscribe returns an asyncio.Queue.  All methods must be
+    called from the event loop.  Callbacks in the POOL and SERIAL execution modes run on other threads, so must not use the event loop
+    directly.
+
+    Attributes:
+        host (str): The MQTT broker's host to which this client connects.
+        port (int): The MQTT broker's port to which this client connects.
+
+    """
+
+    def __init__(self, port=1884, keep_alive=5, host="localhost"):
+        super().__init__(port=port, keep_alive=keep_alive, host=host)
+
+        self._loop = None
+        self._misc_task = None
+        self._connected = None
+        self._disconnected = None
+
+        self._client.on_disconnect = self._on_disconnect
+        self._client.on_socket_open = self._on_socket_open
+        self._client.on_socket_close = self._on_socket_close
+        self._client.on_socket_register_write = self._on_socket_register_write
+        self._client.on_socket_unregister_write = self._on_socket_unregister_write
+
+    def _on_socket_open(self, client, userdata, sock):
+        self._loop.add_reader(sock, self._client.loop_read)
+
+    def _on_socket_close(self, client, userdata, sock):
+        self._loop.remove_reader(sock)
+        self._loop.remove_writer(sock)
+
+    def _on_socket_register_write(self, client, userdata, sock):
+        self._loop.add_writer(sock, self._client.loop_write)
+
+    def _on_socket_unregister_write(self, client, userdata, sock):
+        self._loop.remove_writer(sock)
+
+    def _on_connect(self, client, userdata, flags, rc):
+        """Called whenever the MQTT client connects to the MQTT broker.  Resubscribes to all topics, since this is also called on reconnects.
+
+        Args:
+            Unused for now.
+
+        """
+
+        self._logger.info('MQTT client successfully connected to broker on host: {0}, port: {1}'.format(self._host, self._port))
+        self._connected.set()
+
+        for sub in self._callbacks.keys():
+            self._client.subscribe(sub)
+        self._publish_births()
+
+    def _on_disconnect(self, client, userdata, rc):
+        self._disconnected.set()
+
+    async def _misc_task_loop(self):
+        """Handles keep alives and reconnects for the client.  Runs until the interface is stopped."""
+
+        while(not self._stopped):
+            if(self._client.loop_misc() == mqtt.MQTT_ERR_NO_CONN):
+                try:
+                    self._client.reconnect()
+                except Exception as e:
+                    self._logger.error('MQTT client could not reconnect to broker at host: {0}, port: {1}'.format(self._host, self._port))
+                    self._logger.error(repr(e))
+
+            await asyncio.sleep(1)
+
+    def subscribe(self, channel, maxsize=0, policy=DropPolicy.BLOCK):
+        """A subscribe routine that yields a queue to which all subsequent messages to the given topic will be passed.
+
+        Args:
+            channel (str): Channel to which the client will subscribe.
+            maxsize (int, optional): Maximum number of queued messages.  If less than or equal to 0, the queue is unbounded.
+            policy (DropPolicy, optional): What to do with a message that arrives when the queue is full.  May only be BLOCK if the queue
+                is unbounded.
+
+        Returns:
+            An AsyncSubscriptionQueue containing all future messages from the supplied channel.
+
+        Raises:
+            ValueError: If the queue is bounded and the policy is BLOCK.
+
+        """
+
+        q = AsyncSubscriptionQueue(maxsize=maxsize, policy=policy)
+        self.subscribe_with_callback(channel, q.offer)
+
+        return q
+
+    async def start(self, timeout=None):
+        """Handles starting the underlying MQTT client on the running event loop."""
+
+        if(self._started):
+            error_msg = 'Cannot call start more than once.'
+            self._logger.error(error_msg)
+            raise ValueError(error_msg)
+
+        if(self._stopped):
+            error_msg = 'Cannot call start after calling stop.'
+            self._logger.error(error_msg)
+            raise ValueError(error_msg)
+
+        self._started = True
+        self._loop = asyncio.get_running_loop()
+        self._connected = asyncio.Event()
+        self._disconnected = asyncio.Event()
+
+        # Attempt to connect the client to the specified broker.  The socket is attached to the event loop when it opens
+        try:
+            self._client.connect(self._host, self._port, self._keep_alive)
+        except Exception as e:
+            error_msg = 'MQTT client could not connect to broker at host: {0}, port: {1}'.format(self._host, self._port)
+            self._logger.error(error_msg)
+            self._logger.error(repr(e))
+            raise RuntimeError(error_msg)
+
+        self._misc_task = self._loop.create_task(self._misc_task_loop())
+
+        try:
+            await asyncio.wait_for(self._connected.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def stop(self):
+        """Handles stopping the MQTT client."""
+
+        if(not self._started):
+            error_msg = 'Cannot call stop before calling start.'
+            self._logger.error(error_msg)
+            raise ValueError(error_msg)
+
+        self._stopped = True
+        self._misc_task.cancel()
+
+        # The socket is closed once the disconnect message has been written
+        if(self._client.disconnect() == mqtt.MQTT_ERR_SUCCESS):
+            try:
+                await asyncio.wait_for(self._disconnected.wait(), self._keep_alive)
+            except asyncio.TimeoutError:
+                pass
+
+        self._shutdown_executors()
@@ -1,11 +1,541 @@
 import vizier.mqttinterface as mqtt
 import concurrent.futures as futures
+import asyncio
 import json
+import queue
+import threading
+import heapq
+import itertools
+import time
 import vizier.utils as utils
+import vizier.retry as retry
+import vizier.codec as codec
+import vizier.shm as shm
 import vizier.log as log
+import collections
 
 # HTTP codes for convenience later
-_http_codes = {'success': 200, 'not_found': 404}
+_http_codes = {'success': 200, 'not_modified': 304, 'not_found': 404}
+
+# Number of resolved request IDs remembered, so that late responses can be counted
+_finished_requests_size = 1024
+
+# Number of responses cached for duplicate requests, and the time in seconds for which they are cached
+_response_cache_size = 1024
+_response_cache_ttl = 5.0
+
+# Bodies larger than this number of bytes are sent in chunks of this size
+_chunk_size = 64 * 1024
+
+# Maximum number of incoming requests waiting for or being handled by the request handlers
+_max_in_flight_requests = 256
+
+# Time in seconds that blocking requests wait beyond the longest time allowed by their retry policy, before giving up on a response
+_request_wait_grace = 1.0
+
+
+class _Scheduler():
+    """Runs scheduled functions on a single background thread.  Used to retransmit requests without dedicating a thread to each one.
+
+    Attributes:
+        _cv (threading.Condition): Condition variable signaled when a function is scheduled or the scheduler is stopped.
+        _heap (list): Heap of (deadline, count, function) tuples.
+
+    """
+
+    def __init__(self, logger):
+        self._cv = threading.Condition()
+        self._heap = []
+        self._counter = itertools.count()
+        self._thread = None
+        self._stopped = False
+        self._logger = logger
+
+    @property
+    def running(self):
+        """Whether the scheduler has been started and not stopped, so that scheduled functions will run."""
+
+        return self._thread is not None and not self._stopped
+
+    def schedule(self, delay, f):
+        """Thread safe.  Schedules a function to be run after a delay.
+
+        Args:
+            delay (double): Delay in seconds.
+            f (function): Function to be run.  Takes no arguments.
+
+        """
+
+        with self._cv:
+            heapq.heappush(self._heap, (time.monotonic() + delay, next(self._counter), f))
+            self._cv.notify()
+
+    def _run(self):
+        """Runs scheduled functions as their deadlines pass, until the scheduler is stopped."""
+
+        while True:
+            with self._cv:
+                while not self._stopped and (not self._heap or self._heap[0][0] > time.monotonic()):
+                    self._cv.wait(timeout=(self._heap[0][0] - time.monotonic()) if self._heap else None)
+
+                if(self._stopped):
+                    return
+
+                _, _, f = heapq.heappop(self._heap)
+
+            # An exception must not stop the thread, or no other scheduled function would run
+            try:
+                f()
+            except Exception as e:
+                self._logger.error('Scheduled function raised an exception: {}'.format(repr(e)))
+
+    def start(self):
+        """Starts the scheduler thread."""
+
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stops the scheduler thread.  Functions that have not yet run are discarded."""
+
+        with self._cv:
+            self._stopped = True
+            self._heap.clear()
+            self._cv.notify()
+
+        if(self._thread is not None):
+            self._thread.join()
+
+
+class _LoopScheduler():
+    """Runs scheduled functions on an asyncio event loop.  Has the same interface as _Scheduler, but must be used from the event loop."""
+
+    def __init__(self):
+        self._loop = None
+        self._handles = set()
+        self._stopped = False
+
+    @property
+    def running(self):
+        """Whether the scheduler has been started and not stopped, so that scheduled functions will run."""
+
+        return self._loop is not None and not self._stopped
+
+    def schedule(self, delay, f):
+        """Schedules a function to be run after a delay.
+
+        Args:
+            delay (double): Delay in seconds.
+            f (function): Function to be run.  Takes no arguments.
+
+        """
+
+        def run():
+            self._handles.discard(handle)
+            f()
+
+        handle = self._loop.call_later(delay, run)
+        self._handles.add(handle)
+
+    def start(self):
+        """Attaches the scheduler to the running event loop."""
+
+        self._loop = asyncio.get_running_loop()
+
+    def stop(self):
+        """Cancels all functions that have not yet run."""
+
+        self._stopped = True
+        for x in self._handles:
+            x.cancel()
+        self._handles.clear()
+
+
+class _Batcher():
+    """Packs the messages published on a link into batches (see utils.create_batch), so that many small messages are sent as one.
+
+    A batch is sent when it reaches the maximum size, or when the flush interval has passed since its first message was added.  A batch of
+    one message is sent as is.
+
+    Attributes:
+        _send (function): Sends an encoded message on the link.
+        _scheduler (_Scheduler): Schedules the flushes.
+        _messages (list): Messages in the current batch.
+        _generation (int): Incremented whenever a batch is sent, so that a scheduled flush only sends the batch for which it was scheduled.
+
+    """
+
+    def __init__(self, send, scheduler, flush_interval, max_batch):
+        self._send = send
+        self._scheduler = scheduler
+        self._flush_interval = flush_interval
+        self._max_batch = max_batch
+        self._lock = threading.Lock()
+        self._messages = []
+        self._generation = 0
+
+    def _take(self):
+        """Takes the current batch.  Must hold the lock."""
+
+        messages = self._messages
+        self._messages = []
+        self._generation += 1
+
+        return messages
+
+    def _send_batch(self, messages):
+        if(len(messages) == 1):
+            self._send(messages[0])
+        elif(len(messages) > 1):
+            self._send(utils.create_batch(messages))
+
+    def add(self, msg):
+        """Thread safe.  Adds a message to the current batch, sending the batch if it is full.
+
+        Args:
+            msg (bytes): Message to be published.
+
+        """
+
+        messages = []
+        with self._lock:
+            self._messages.append(msg)
+            if(len(self._messages) >= self._max_batch):
+                messages = self._take()
+            elif(len(self._messages) == 1):
+                generation = self._generation
+                self._scheduler.schedule(self._flush_interval, lambda: self._flush(generation))
+
+        self._send_batch(messages)
+
+    def _flush(self, generation):
+        with self._lock:
+            messages = self._take() if generation == self._generation else []
+
+        self._send_batch(messages)
+
+    def flush(self):
+        """Thread safe.  Sends the current batch immediately."""
+
+        with self._lock:
+            messages = self._take()
+
+        self._send_batch(messages)
+
+
+class _ResponseCache():
+    """Bounded, time-expiring cache of the responses to incoming requests.
+
+    Retransmitted requests are identical to the original, including the request ID, so the cache is keyed by the encoded request.  This way,
+    duplicates are detected without decoding them.
+
+    Attributes:
+        _entries (collections.OrderedDict): Maps each request to a tuple (expiry, response).  The response is _in_progress while the request
+            is being handled.  Entries are in order of expiry.
+
+    """
+
+    _in_progress = object()
+
+    def __init__(self, size=_response_cache_size, ttl=_response_cache_ttl):
+        self._size = size
+        self._ttl = ttl
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def _expire(self, now):
+        """Removes expired entries, and the oldest entries if the cache is over its size.  Must hold the lock."""
+
+        while self._entries and (len(self._entries) > self._size or next(iter(self._entries.values()))[0] <= now):
+            self._entries.popitem(last=False)
+
+    def begin(self, request):
+        """Thread safe.  Checks whether a request is a duplicate.  If it is not, it is marked as in progress.
+
+        Args:
+            request (bytes): The encoded request.
+
+        Returns:
+            A tuple (is_new, response).  If the request is a duplicate, response is the cached response, or None if the original request is
+            still in progress or had no response.
+
+        """
+
+        now = time.monotonic()
+
+        with self._lock:
+            self._expire(now)
+            entry = self._entries.get(request)
+
+            if(entry is None):
+                self._entries[request] = (now + self._ttl, self._in_progress)
+                return True, None
+
+        response = entry[1]
+        return False, (None if response is self._in_progress else response)
+
+    def finish(self, request, response):
+        """Thread safe.  Caches the response to a request.
+
+        Args:
+            request (bytes): The encoded request.
+            response: The response to the request, or None if the request has no response.
+
+        """
+
+        with self._lock:
+            if(request in self._entries):
+                self._entries[request] = (self._entries[request][0], response)
+
+    def abort(self, request):
+        """Thread safe.  Forgets a request that was not handled, so that a retransmission of it is handled as a new request.
+
+        Args:
+            request (bytes): The encoded request.
+
+        """
+
+        with self._lock:
+            self._entries.pop(request, None)
+
+
+class _KeyedExecutor():
+    """Runs functions on a thread pool, in order for each key.  Functions with different keys run in parallel.
+
+    At most max_in_flight functions may be waiting or running at once.  Further functions are rejected.
+
+    Attributes:
+        _lanes (dict): Maps each key with a running function to a deque of the functions waiting behind it.
+        _in_flight (int): Number of functions waiting or running.
+
+    """
+
+    def __init__(self, max_workers, max_in_flight, logger):
+        self._executor = futures.ThreadPoolExecutor(max_workers=max_workers)
+        self._max_in_flight = max_in_flight
+        self._logger = logger
+        self._lock = threading.Lock()
+        self._lanes = {}
+        self._in_flight = 0
+
+    def submit(self, key, f):
+        """Thread safe.  Runs a function after the functions previously submitted with the same key.
+
+        Args:
+            key: Functions with the same key run in the order that they are submitted.
+            f (function): Function to be run.  Takes no arguments.
+
+        Returns:
+            A bool indicating whether the function was accepted.
+
+        """
+
+        with self._lock:
+            if(self._in_flight >= self._max_in_flight):
+                return False
+
+            self._in_flight += 1
+            lane = self._lanes.get(key)
+            if(lane is not None):
+                lane.append(f)
+                return True
+
+            self._lanes[key] = collections.deque()
+
+        try:
+            self._executor.submit(self._run, key, f)
+        except RuntimeError:
+            # The executor has been shut down
+            with self._lock:
+                self._in_flight -= 1
+                self._lanes.pop(key, None)
+            return False
+
+        return True
+
+    def _run(self, key, f):
+        """Runs the functions for a key until its lane is empty."""
+
+        while True:
+            try:
+                f()
+            except Exception as e:
+                self._logger.error(repr(e))
+
+            with self._lock:
+                self._in_flight -= 1
+                lane = self._lanes[key]
+                if(not lane):
+                    del self._lanes[key]
+                    return
+                f = lane.popleft()
+
+    def shutdown(self):
+        """Waits for the submitted functions to finish, and stops the threads."""
+
+        self._executor.shutdown(wait=True)
+
+
+class _PendingRequest():
+    """A request that is waiting for a response.
+
+    Attributes:
+        method (str): Method for request (e.g., 'GET').
+        link (str): Link on which the request is made.
+        request_link (str): Request channel of the node to which the request is sent.
+        encoded_request (bytes): The encoded request message, which is resent on each attempt.
+        policy (retry.RetryPolicy): Determines when the request is retransmitted.
+        attempt (int): Number of attempts made so far.
+        start (double): Time at which the first attempt was made (from time.monotonic).
+        future (concurrent.futures.Future): Resolved with the decoded response, or None if the request fails.  An asyncio.Future for AsyncNode.
+        on_data (function): If not None, called with each piece of the response's body, in order, as it arrives, and then with None.
+        assembly (_ChunkAssembly): Reassembles the response, if it is sent in chunks.
+
+    """
+
+    def __init__(self, method, link, request_link, encoded_request, policy, future, on_data=None):
+        self.method = method
+        self.link = link
+        self.request_link = request_link
+        self.encoded_request = encoded_request
+        self.policy = policy
+        self.attempt = 0
+        self.start = time.monotonic()
+        self.future = future
+        self.on_data = on_data
+        self.assembly = None
+
+
+class _ChunkAssembly():
+    """Reassembles a large response that is sent as a header followed by chunks of the body (see utils.create_chunks).
+
+    Chunks may arrive in any order, and are passed on in order as soon as all of the preceding chunks have arrived.  If the link changes
+    before all the chunks arrive, the responder sends the new version, and the assembly starts over.  This is only possible while no chunks
+    have been passed on.
+
+    Attributes:
+        header (dict): The response, without its body.  Contains the number of chunks ('chunks'), the size of the body ('size') and whether
+            the body is a 'str' or 'bytes' ('encoding').
+        etag (str): Version of the body being reassembled.
+        count (int): Number of chunks in the body.
+        chunks (dict): Received chunks, by index.
+        delivered (int): Number of chunks that have been passed on.
+        progressed (bool): Whether any part of the response has arrived since the last check for progress.
+
+    """
+
+    def __init__(self, streaming):
+        self._lock = threading.Lock()
+        self._streaming = streaming
+        self.header = None
+        self.etag = None
+        self.count = 0
+        self.chunks = {}
+        self.delivered = 0
+        self.progressed = False
+
+    def _start_version(self, etag, count):
+        """Starts reassembling a new version of the body.  Must hold the lock.
+
+        Raises:
+            ValueError: If part of the previous version has already been passed on.
+
+        """
+
+        if(etag == self.etag):
+            return
+
+        if(self.delivered > 0):
+            raise ValueError('Link changed from version ({0}) to ({1}) while its body was being received'.format(self.etag, etag))
+
+        self.header = None
+        self.etag = etag
+        self.count = count
+        self.chunks = {}
+
+    def _ready(self):
+        """Collects the chunks that can be passed on, and checks whether the response is complete.  Must hold the lock."""
+
+        ready = []
+        while(self._streaming and self.delivered in self.chunks):
+            ready.append(self.chunks[self.delivered])
+            self.delivered += 1
+
+        self.progressed = True
+        return ready, (self.header is not None and len(self.chunks) == self.count)
+
+    def add_header(self, header):
+        """Thread safe.  Adds the header of the response.
+
+        Args:
+            header (dict): The decoded header.
+
+        Returns:
+            A tuple (ready, complete) of the chunks that can now be passed on, and whether the response is complete.
+
+        Raises:
+            ValueError: If the link changed after part of the body was passed on.
+
+        """
+
+        with self._lock:
+            self._start_version(header['etag'], header['chunks'])
+            self.header = header
+            return self._ready()
+
+    def add_chunk(self, etag, index, count, data):
+        """Thread safe.  Adds a chunk of the body.
+
+        Args:
+            etag (str): Version of the body.
+            index (int): Index of the chunk.
+            count (int): Number of chunks in the body.
+            data (bytes): The chunk.
+
+        Returns:
+            A tuple (ready, complete) of the chunks that can now be passed on, and whether the response is complete.
+
+        Raises:
+            ValueError: If the link changed after part of the body was passed on.
+
+        """
+
+        with self._lock:
+            self._start_version(etag, count)
+            if(index < self.count):
+                self.chunks.setdefault(index, data)
+            return self._ready()
+
+    def check_progress(self):
+        """Thread safe.  Checks whether any part of the response has arrived since the last check."""
+
+        with self._lock:
+            progressed = self.progressed
+            self.progressed = False
+            return progressed
+
+    def missing(self):
+        """Thread safe.  Gets the indices of the chunks that have not arrived."""
+
+        with self._lock:
+            return [x for x in range(self.count) if x not in self.chunks]
+
+    def response(self):
+        """Combines the header and the chunks into the full response.  Must only be called once the response is complete.
+
+        Returns:
+            A JSON-formatted dict representing the response.
+
+        """
+
+        body = b''.join(self.chunks[x] for x in range(self.count))
+        if(self.header['encoding'] == 'str'):
+            body = body.decode(encoding='UTF-8')
+
+        response = {x: y for x, y in self.header.items() if x not in ('chunks', 'size', 'encoding')}
+        response['body'] = body
+
+        return response
 
 
 # TODO: Data should be in byte format
@@ -18,249 +548,1363 @@ class Node:
 
         _host (str): Host of the MQTT broker.
         _port (int): Port of the MQTT broker.
-        _mqtt_client: Underlying Paho MQTT client.
+        _mqtt_client: Underlying Paho MQTT client.  A mqttinterface.SharedMQTTInterface if the node shares the connections of a
+            mqttinterface.ConnectionPool, or a mqttinterface.LoopbackInterface if the node is on a mqttinterface.LoopbackBus.
+        _loopback (mqttinterface.LoopbackBus): Bus connecting the node to the other nodes of the process, or None.
         _node_descriptor (dict): JSON-formmated dict containing information about the node.  For example,
 
-            .. code-block:: python
+            .. code-block:: python
+
+                {
+                    'end_point': 'node'
+                    'links':
+                    {
+                        '/link': {'type': 'STREAM'}
+                    }
+                    'requests':
+                    [
+                        {
+                            'link': 'node_b/link',
+                            'type': 'DATA',
+                            'required': false
+                        }
+                    ],
+                    'codec': 'json'
+                }
+
+            The optional 'codec' key selects the encoding of the node's requests (see vizier.codec), and defaults to 'json'.  Responses are
+            always encoded with the same codec as the request.
+            A STREAM link may have a 'shared_memory' key giving the size in bytes of a shared memory ring, through which its data is sent to
+            subscribers on the same host (e.g., {'type': 'STREAM', 'shared_memory': 16777216}).
+
+        _end_point (str): Endpoint of the node.
+        _expanded_links (dict): JSON-formatted dict containing the recursively expanded links.  For example, the above node descriptor would expand to
+
+            .. code-block:: python
+
+                {
+                    'node/link': {'type': 'STREAM'}
+                }
+
+            Each link also holds its current body, a version that is incremented each time the body changes, an ETag identifying the version,
+            and the full and 'not modified' responses to a GET request for the link, encoded with each codec that has requested it.
+
+        _requested_links (dict): JSON-formatted dict containing the requests for the node.  For example, the request from the above node descriptor would
+        be
+
+            .. code-block:: python
+
+                {
+                    'node_b/link': {'link': 'node_b/link', 'type': 'DATA', 'required': false}
+                }
+
+        _request_channel (str): Channel on which requests are made.  Always <end_point>/'requests'.
+        _response_channel (str): Wildcard channel on which all responses to this node's requests arrive.  Always +/responses/<end_point>/#.
+        _pending_requests (dict): Outstanding requests made by this node, mapping the request ID to a _PendingRequest.
+        _finished_requests (collections.OrderedDict): The most recently resolved request IDs, mapped to the retry statistics of the request.
+        _get_cache (dict): The most recent response for each gettable link that provided an ETag, for making conditional GET requests.
+        _batchers (dict): Maps each link on which published data is batched to its _Batcher.
+        _shm_rings (dict): Maps each STREAM link that sends its data through shared memory to its shm.SharedMemoryRing.
+        _shm_reader (shm.SharedMemoryReader): Reads data sent through shared memory by other nodes on the same host.
+        _request_lanes (_KeyedExecutor): Handles incoming requests in parallel, in order for each requester.  None if requests are handled on
+            the MQTT client's thread.
+        _chunk_size (int): Bodies larger than this number of bytes are sent in chunks of this size, which the requester reassembles.
+        _logger (logging.Logger): Logger for the node.
+        puttable_links (list): List of links to which data may be put.  These links are the node's links that are of type DATA.
+        publishable_links (list):  List of links to which data may be published.  These links are the node's links that are of type STREAM.
+        gettable_links (list): List of links from which data may be retrieved.  These links are the node's requested links that are of type DATA.
+        subscribable_links (list):  List of links to which the node can subscribe.  These links are the node's requested links that are of type STEAM.
+        retry_stats (retry.RetryStats): Retransmission counters for all requests made without an explicit retry policy.
+
+    """
+
+    def __init__(self, host, port, node_descriptor, chunk_size=_chunk_size, request_workers=4, max_in_flight_requests=_max_in_flight_requests,
+                 connection_pool=None, loopback=None):
+
+        # Setting up MQTT client as well as the dicts to hold DATA information
+        self._host = host
+        self._port = port
+        self._node_descriptor = node_descriptor
+
+        # Store the end point of the node for convenience
+        self._end_point = node_descriptor['end_point']
+
+        self._loopback = loopback
+        self._mqtt_client = self._create_client(connection_pool, loopback)
+
+        # Bodies larger than this number of bytes are sent in chunks
+        self._chunk_size = chunk_size
+
+        # Codec with which requests are encoded
+        self._codec = codec.get_codec(node_descriptor.get('codec', codec.JSONCodec.name))
+
+        # Expand the links from the provided descriptor file.  The compiled descriptor is shared with other nodes that have the same
+        # descriptor
+        # All data regarding the link, including the body, is stored in this dictionary.  Various requests will
+        # usually access it to retrieve this data
+        self._compiled_descriptor = utils.compile_descriptor(self._node_descriptor)
+        self._expanded_links, self._requested_links = self._compiled_descriptor.expand()
+
+        # By convention, the node descriptor is always on this link
+        self._expanded_links[self._end_point + '/node_descriptor'] = {'type': 'DATA', 'body': json.dumps(self._node_descriptor)}
+
+        # Responses to GET requests are encoded once, when the body of the link changes.  The ETag of each link is unique to this instance
+        # of the node and the version of the link's body
+        self._instance_id = utils.create_message_id(self._end_point)
+        self._put_lock = threading.Lock()
+
+        # STREAM links that send their data through shared memory, mapped to the size of their ring.  The rings are created on start
+        self._shm_sizes = dict(self._compiled_descriptor.shared_memory)
+        self._shm_rings = {}
+        self._shm_reader = shm.SharedMemoryReader()
+
+        for x, y in self._expanded_links.items():
+            self._set_body(x, y['body'])
+
+        # Channel on which requests are received
+        self._request_channel = utils.create_request_link(self._end_point)
+
+        # Channel on which the node's descriptor is retained for discovery, once the node has started
+        self._discovery_channel = utils.create_discovery_link(self._end_point)
+        self._discoverable = False
+
+        # Channel on which all responses to our requests are received.  Responses are dispatched to the waiting
+        # request by request ID
+        self._response_channel = utils.create_response_filter(self._end_point)
+        self._pending_requests = {}
+        self._finished_requests = collections.OrderedDict()
+        self._pending_lock = threading.Lock()
+        self.retry_stats = retry.RetryStats()
+        self._get_cache = {}
+
+        # Batches the data published on links for which batching is enabled
+        self._batchers = {}
+
+        # Handles retransmission of pending requests
+        self._scheduler = self._create_scheduler()
+
+        # Incoming requests are handled on this pool, rather than on the MQTT client's thread.  If there are no workers, they are handled
+        # on the client's thread
+        self._request_lanes = None
+        if(request_workers > 0):
+            self._request_lanes = _KeyedExecutor(request_workers, max_in_flight_requests, log.get_logger())
+
+        # Responses to recent requests, for answering retransmitted requests
+        self._response_cache = _ResponseCache()
+
+        # Logging
+        self._logger = log.get_logger()
+
+        # Figure out which topics are providing etc...
+        # Make sure to remove <node>/node_descriptor as a puttable topic, as this is dedicated
+        self.puttable_links = set(self._compiled_descriptor.data_links) - {self._end_point + '/node_descriptor'}
+        self.publishable_links = set(self._compiled_descriptor.stream_links)
+
+        # Parse out data/stream topics
+        self.gettable_links = set(self._compiled_descriptor.gettable_links)
+        self.subscribable_links = set(self._compiled_descriptor.subscribable_links)
+
+    def _create_client(self, connection_pool, loopback):
+        """Creates the node's MQTT client.
+
+        Args:
+            connection_pool (mqttinterface.ConnectionPool): Pool whose connections the node shares with the other nodes of the process, or
+                None for a connection of its own.
+            loopback (mqttinterface.LoopbackBus): Bus on which the node exchanges messages with the other nodes of the process, or None.
+
+        Returns:
+            The client.
+
+        """
+
+        if(connection_pool is not None):
+            # Share the connections of the pool with the other nodes of the process
+            client = connection_pool.create_interface()
+        elif(self._host is not None or loopback is None):
+            client = mqtt.MQTTInterface(port=self._port, host=self._host)
+        else:
+            client = None
+
+        # Messages to the other nodes of the process are delivered directly, and only messages to other processes go through MQTT.  With no
+        # host, the node only communicates with the nodes of the process
+        if(loopback is not None):
+            client = loopback.create_interface(self._end_point, node=self, remote=client)
+
+        return client
+
+    def _create_scheduler(self):
+        """Creates the scheduler that retransmits the node's requests."""
+
+        return _Scheduler(log.get_logger())
+
+    def _make_request_async(self, method, link, body, request_id=None, attempts=15, timeout=0.25, retry_policy=None, on_data=None):
+        """Makes a request for data on a particular topic without blocking.  The exact action depends on the specified method.
+
+        The request is retransmitted by the node's scheduler, according to the retry policy, until a response arrives.
+
+        Args:
+            method (str): Method for request (e.g., 'GET').
+            link (str): Link on which to make request.
+            body (dict): JSON-formatted dict representing the body of the message.
+            request_id (str, optional): Unique request ID for this message.
+            attempts (int, optional): Number of times to retry the request, if it times out.  Ignored if a retry policy is given.
+            timeout (double, optional): Timeout to wait for return message on each request.  Ignored if a retry policy is given.
+            retry_policy (retry.RetryPolicy, optional): Determines when the request is retransmitted.
+            on_data (function, optional): Called with each piece of the response's body, as bytes and in order, as it arrives, and then with None.
+
+        Returns:
+            A concurrent.futures.Future resolving to a JSON-formatted dict representing the contents of the message, or None if the request failed.
+
+        """
+
+        # If we didn't get a request_id, create one
+        if not request_id:
+            request_id = utils.create_message_id(self._end_point)
+
+        if(retry_policy is None):
+            retry_policy = retry.RetryPolicy.fixed(timeout, attempts, stats=self.retry_stats)
+
+        to_node = link.split('/')[0]
+
+        # If the node that owns the link is in this process, read the link directly, without encoding or sending anything
+        owner = self._loopback.get_node(to_node) if (method == 'GET' and self._loopback is not None) else None
+        if(owner is not None):
+            pending = _PendingRequest(method, link, None, None, retry_policy, self._create_future(), on_data=on_data)
+            retry_policy.stats.increment('requests')
+            response = owner._local_get(link, body)
+            retry_policy.stats.increment('responses' if response is not None else 'timeouts')
+            self._resolve_request(pending, response)
+            return pending.future
+
+        # Set up request link for this request.  The response arrives on our response channel
+        encoded_request = self._codec.encode(utils.create_request(request_id, method, link, body))
+        pending = _PendingRequest(method, link, utils.create_request_link(to_node), encoded_request, retry_policy, self._create_future(), on_data=on_data)
+
+        with self._pending_lock:
+            self._pending_requests[request_id] = pending
+
+        # Requests are only retransmitted and timed out while the node is running, so fail them right away otherwise.  Requests made before
+        # the scheduler stops are failed when the node stops
+        if(not self._scheduler.running):
+            if(self._finish_request(request_id) is not None):
+                self._logger.error('Cannot make ({0}) request on link ({1}) while the node is not running'.format(method, link))
+                self._resolve_request(pending, None)
+            return pending.future
+
+        self._send_request(request_id, pending)
+
+        return pending.future
+
+    def _wait_for_responses(self, requests, retry_policy):
+        """Waits for the futures of concurrent requests, for no longer than their retry policy allows.
+
+        Args:
+            requests (dict): Mapping of the link of each request to the future returned by _make_request_async, or derived from it.
+            retry_policy (retry.RetryPolicy): Retry policy of the requests.
+
+        Returns:
+            A dict mapping each link to the result of its future, or None if the future was not resolved in time.
+
+        """
+
+        deadline = time.monotonic() + retry_policy.max_duration() + _request_wait_grace
+        results = {}
+        for x, y in requests.items():
+            try:
+                results[x] = y.result(timeout=max(deadline - time.monotonic(), 0))
+            except futures.TimeoutError:
+                self._logger.error('Timed out waiting for the response to the request on link ({})'.format(x))
+                results[x] = None
+
+        return results
+
+    def _send_request(self, request_id, pending):
+        """Sends a pending request and schedules its retransmission.  If the retry policy allows no more attempts, the request fails instead.
+
+        Args:
+            request_id (str): Unique request ID of the pending request.
+            pending (_PendingRequest): The pending request.
+
+        """
+
+        timeout = pending.policy.attempt_timeout(pending.attempt, time.monotonic() - pending.start)
+
+        if(timeout is None):
+            # Drop the request from the pending table.  Any late response is discarded
+            if(self._finish_request(request_id) is not None):
+                self._logger.error('Get request on topic ({}) failed'.format(pending.link))
+                pending.policy.stats.increment('timeouts')
+                self._resolve_request(pending, None)
+            return
+
+        # If the response is arriving in chunks, only request the missing chunks, and don't request anything while chunks are still arriving
+        request = pending.encoded_request
+        assembly = pending.assembly
+        if(assembly is not None):
+            if(assembly.check_progress()):
+                self._scheduler.schedule(timeout, lambda: self._retry_request(request_id))
+                return
+
+            request = self._codec.encode(utils.create_request(request_id, pending.method, pending.link,
+                                                              {'chunks': assembly.missing(), 'etag': assembly.etag}))
+
+        if(pending.attempt == 0):
+            pending.policy.stats.increment('requests')
+        else:
+            self._logger.info('Retrying (%s) request for link (%s)' % (pending.method, pending.link))
+            pending.policy.stats.increment('retries')
+
+        pending.attempt += 1
+        self._mqtt_client.send_message(pending.request_link, request)
+        self._scheduler.schedule(timeout, lambda: self._retry_request(request_id))
+
+    def _retry_request(self, request_id):
+        """Called by the scheduler when a request times out.  Either retransmits the request or fails it.
+
+        Args:
+            request_id (str): Unique request ID of the request that timed out.
+
+        """
+
+        with self._pending_lock:
+            pending = self._pending_requests.get(request_id)
+
+        # The request has already been answered
+        if(pending is not None):
+            self._send_request(request_id, pending)
+
+    def _finish_request(self, request_id):
+        """Removes a request from the pending table, remembering its ID so that late responses can be counted.
+
+        Args:
+            request_id (str): Unique request ID of the request.
+
+        Returns:
+            The _PendingRequest, or None if the request was no longer pending.
+
+        """
+
+        with self._pending_lock:
+            pending = self._pending_requests.pop(request_id, None)
+
+            if(pending is not None):
+                self._finished_requests[request_id] = pending.policy.stats
+                if(len(self._finished_requests) > _finished_requests_size):
+                    self._finished_requests.popitem(last=False)
+
+        return pending
+
+    def _resolve_request(self, pending, response):
+        """Resolves a request that has been removed from the pending table.
+
+        Args:
+            pending (_PendingRequest): The request.
+            response (dict): The decoded response, or None if the request failed.
+
+        """
+
+        self._complete_future(pending.future, response)
+
+        if(pending.on_data is not None):
+            # Chunked responses have already been passed on as they arrived
+            if(response is not None and pending.assembly is None):
+                body = response.get('body')
+                if(isinstance(body, str)):
+                    body = body.encode(encoding='UTF-8')
+                if(isinstance(body, bytes)):
+                    pending.on_data(body)
+
+            pending.on_data(None)
+
+    def _make_request(self, method, link, body, request_id=None, attempts=15, timeout=0.25, retry_policy=None):
+        """Makes a request for data on a particular topic.  The exact action depends on the specified method.
+
+        Args:
+            method (str): Method for request (e.g., 'GET').
+            link (str): Link on which to make request.
+            body (dict): JSON-formatted dict representing the body of the message.
+            request_id (str, optional): Unique request ID for this message.
+            attempts (int, optional): Number of times to retry the request, if it times out.  Ignored if a retry policy is given.
+            timeout (double, optional): Timeout to wait for return message on each request.  Ignored if a retry policy is given.
+            retry_policy (retry.RetryPolicy, optional): Determines when the request is retransmitted.
+
+        Returns:
+            A JSON-formatted dict representing the contents of the message, or None if the request failed.
+
+        """
+
+        if(retry_policy is None):
+            retry_policy = retry.RetryPolicy.fixed(timeout, attempts, stats=self.retry_stats)
+
+        future = self._make_request_async(method, link, body, request_id=request_id, retry_policy=retry_policy)
+
+        return self._wait_for_responses({link: future}, retry_policy)[link]
+
+    def _create_future(self):
+        """Creates the future on which the response to a request is delivered."""
+
+        return futures.Future()
+
+    def _complete_future(self, future, result):
+        """Sets the result of a future created by _create_future, unless it has been cancelled."""
+
+        if(future.set_running_or_notify_cancel()):
+            future.set_result(result)
+
+    def _handle_response(self, topic, network_message):
+        """Private function for handling incoming network responses.  All responses on the channel +/responses/<end_point>/# are passed
+        to this function, and then dispatched to the pending request with the matching request ID.
+
+        Args:
+            topic (str): Response link on which the message was received.
+            network_message (bytes): A UTF-8-encoded string representing a JSON-formatted response message.
+
+        """
+
+        try:
+            _, request_id = utils.parse_response_link(topic)
+        except ValueError as e:
+            self._logger.error(repr(e))
+            return
+
+        with self._pending_lock:
+            pending = self._pending_requests.get(request_id)
+
+        # The request may have already timed out or been answered, in which case the response is dropped
+        if(pending is None):
+            stats = self._finished_requests.get(request_id)
+            if(stats is not None):
+                stats.increment('late_responses')
+            return
+
+        chunk = utils.parse_chunk(network_message)
+        if(chunk is not None):
+            self._handle_chunk(request_id, pending, chunk=chunk)
+            return
+
+        # Try to decode packet.  If this fails, the request is left pending so that it is retried
+        try:
+            decoded_message = codec.detect_codec(network_message).decode(network_message)
+        except Exception:
+            self._logger.error('Could not decode network message')
+            return
+
+        # Large responses are sent as a header, followed by the body in chunks
+        if('chunks' in decoded_message):
+            self._handle_chunk(request_id, pending, header=decoded_message)
+            return
+
+        if(self._finish_request(request_id) is not None):
+            pending.policy.stats.increment('responses')
+            self._resolve_request(pending, decoded_message)
+
+    def _handle_chunk(self, request_id, pending, header=None, chunk=None):
+        """Handles the header or a chunk of a response that is sent in chunks.  The request is resolved once the response is complete.
+
+        Args:
+            request_id (str): Unique request ID of the request.
+            pending (_PendingRequest): The request.
+            header (dict, optional): The decoded header of the response.
+            chunk (tuple, optional): The parsed chunk (see utils.parse_chunk).
+
+        """
+
+        if(pending.assembly is None):
+            pending.assembly = _ChunkAssembly(pending.on_data is not None)
+
+        try:
+            if(header is not None):
+                ready, complete = pending.assembly.add_header(header)
+            else:
+                ready, complete = pending.assembly.add_chunk(*chunk)
+        except ValueError as e:
+            # Part of the previous version of the body has been passed on, so the request can't be completed
+            if(self._finish_request(request_id) is not None):
+                self._logger.error(repr(e))
+                self._resolve_request(pending, None)
+            return
+
+        for x in ready:
+            pending.on_data(x)
+
+        if(complete and self._finish_request(request_id) is not None):
+            pending.policy.stats.increment('responses')
+            self._resolve_request(pending, pending.assembly.response())
+
+    def _handle_request(self, network_message):
+        """Private function for handling incoming network requests.  All requests on the channel <node_name>/requests
+        are passed to this function.  Then, responses are returned on the channel <node_name>/responses/<message_id>.
+
+        Requests are retransmitted with the same request ID, so each response is cached for a short time.  Duplicates of a request
+        are answered with the cached response, or dropped if the original request is still being handled.
+
+        Args:
+            network_message (bytes): A UTF-8-encoded string representing a JSON-formatted request message.
+
+        """
+
+        # Make request handler for vizier network.  Later this function is attached as a callback to
+        # <node_name>/requests to handle incoming requests.  All requests are passed through this function
+        is_new, response = self._response_cache.begin(network_message)
+
+        if(not is_new):
+            if(response is not None):
+                self._send_response(*response)
+            return
+
+        decoded = self._decode_request(network_message)
+        if(decoded is None):
+            self._response_cache.finish(network_message, None)
+            return
+
+        def respond():
+            response = None
+            try:
+                response = self._respond(*decoded)
+            finally:
+                self._response_cache.finish(network_message, response)
+
+            if(response is not None):
+                self._send_response(*response)
+
+        if(self._request_lanes is None):
+            respond()
+            return
+
+        # Requests are handled in parallel, except that the requests from each node are handled in order.  If too many requests are in
+        # flight, the request is dropped, and is handled when the requester retransmits it
+        requester = decoded[0]['id'].rsplit('/', 1)[0]
+        if(not self._request_lanes.submit(requester, respond)):
+            self._logger.warning('Too many requests in flight.  Dropping request from ({})'.format(requester))
+            self._response_cache.abort(network_message)
+
+    def _send_response(self, response_channel, messages):
+        """Sends the messages making up a response.
+
+        Args:
+            response_channel (str): Channel on which the response is sent.
+            messages (list): Encoded messages.
+
+        """
+
+        for x in messages:
+            self._mqtt_client.send_message(response_channel, x)
+
+    def _create_response(self, network_message):
+        """Decodes a network request and creates the response to it.
+
+        The response is encoded with the same codec as the request.
+
+        Args:
+            network_message (bytes): An encoded request message.
+
+        Returns:
+            A tuple (response_channel, messages) of the channel and list of encoded messages making up the response, or None if there is no
+            response to the request.
+
+        """
+
+        decoded = self._decode_request(network_message)
+        if(decoded is None):
+            return None
+
+        return self._respond(*decoded)
+
+    def _decode_request(self, network_message):
+        """Decodes a network request and checks that it is valid.
+
+        Args:
+            network_message (bytes): An encoded request message.
+
+        Returns:
+            A tuple (decoded_message, request_codec) of the decoded request and the codec with which it was encoded, or None if the request
+            is invalid.
+
+        """
+
+        try:
+            request_codec = codec.detect_codec(network_message)
+            decoded_message = request_codec.decode(network_message)
+        except Exception as e:
+            self._logger.error('Received undecodable network message in request handler')
+            self._logger.error(repr(e))
+            return None
+
+        # Check to make sure that it's a valid request
+        # TODO: Handle error in a more specific way
+        encountered_error = False
+        if(not isinstance(decoded_message.get('id'), str)):
+            # This is an error.  Return from the callback
+            self._logger.error('Request received without valid id')
+            encountered_error = True
+
+        if('method' not in decoded_message):
+            # This is an error.  Return from the callback
+            self._logger.error('Request received without valid method')
+            encountered_error = True
+
+        if('link' not in decoded_message):
+            # This is an error.  Return from the callback
+            self._logger.error('Request received without valid link')
+            encountered_error = True
+
+        if(encountered_error):
+            # TODO: Create and send error message
+            # response = utils.create_response(_http_codes['not_found'], {"error": "Encountered error in request"}, "ERROR")
+            # response_channel = utils.create_response_link(self.end_point, message_id)
+            return None
+
+        return decoded_message, request_codec
+
+    def _respond(self, decoded_message, request_codec):
+        """Creates the response to a valid request.
+
+        Args:
+            decoded_message (dict): The decoded request.
+            request_codec: Codec with which the request was encoded, and with which the response is encoded.
+
+        Returns:
+            A tuple (response_channel, messages) of the channel and list of encoded messages making up the response, or None if there is no
+            response to the request.
+
+        """
+
+        message_id = decoded_message['id']
+        method = decoded_message['method']
+        requested_link = decoded_message['link']
+
+        # We have a valid request at this point
+        if(method == 'GET'):
+            self._logger.info('Received GET request for topic %s' % requested_link)
+            self._logger.info(repr(decoded_message))
+            # Handle the get request by looking for information under the specified URI
+            if(requested_link in self._expanded_links):
+                # If we have any record of this URI, respond with the response encoded when the body was set.  If the requester already
+                # has the current version, just tell it that the link hasn't been modified
+                link = self._expanded_links[requested_link]
+                response_channel = utils.create_response_link(self._end_point, message_id)
+                request_body = decoded_message.get('body')
+                if(not isinstance(request_body, dict)):
+                    request_body = {}
+
+                messages, not_modified = self._encode_responses(link, request_codec)
+
+                if(request_body.get('if_none_match') == link['etag']):
+                    return response_channel, [not_modified]
+
+                # The requester is missing some chunks of this version of the body.  Resend them, along with the header
+                if(len(messages) > 1 and 'chunks' in request_body and request_body.get('etag') == link['etag']):
+                    return response_channel, messages[:1] + [messages[x+1] for x in request_body['chunks'] if 0 <= x < len(messages) - 1]
+
+                return response_channel, messages
+
+        # TODO: Handle other methods
+        return None
+
+    def _local_get(self, link, body):
+        """Answers a GET request from a node in the same process (see vizier.mqttinterface.LoopbackBus).  The body of the link is returned by
+        reference, without encoding.
+
+        Args:
+            link (str): Link on which the GET request is made.
+            body (dict): Body of the request.
+
+        Returns:
+            A JSON-formatted dict representing the response, or None if the node has no such link.
+
+        """
+
+        entry = self._expanded_links.get(link)
+        if(entry is None):
+            return None
+
+        if(isinstance(body, dict) and body.get('if_none_match') == entry['etag']):
+            return utils.create_response(_http_codes['not_modified'], None, entry['type'], etag=entry['etag'])
+
+        return utils.create_response(_http_codes['success'], entry['body'], entry['type'], etag=entry['etag'])
+
+    def put(self, link, info):
+        """Puts data on a particular link.
+
+        This data is retrievable from other nodes via a GET request.
+
+        Args:
+            link (str): Link on which to place data.
+            info (str or bytes): Gettable data.  Bytes are sent as-is by binary codecs.
+
+        Raises:
+            ValueError: If the provided link is not classified as DATA.
+
+        """
+
+        # Ensure type of info
+        if(type(info) is not str and type(info) is not bytes):
+            error_msg = 'Type of info must be str or bytes was ({})'.format(type(info))
+            self._logger.error(error_msg)
+            raise ValueError(error_msg)
+
+        # Ensure that the link has been specified by the node descriptor
+
+        dedicated = self._end_point + '/node_descriptor'
+        if(link is dedicated):
+            error_msg = 'Cannot PUT to dedicated link ({})'.format(dedicated)
+            self._logger.error(error_msg)
+            raise ValueError(error_msg)
+
+        if(link in self.puttable_links):
+            self._set_body(link, info)
+        else:
+            error_msg = 'Link ({0}) not in puttable links ({1})'.format(link, self.puttable_links)
+            self._logger.error(error_msg)
+            raise ValueError(error_msg)
+
+    def _set_body(self, link, body):
+        """Thread safe.  Sets the body of a link, and encodes the responses to GET requests for it with the node's codec.
+
+        The link's entry is replaced rather than modified, so that concurrent requests always see a consistent body, version and response.
+
+        Args:
+            link (str): Link on which to place data.
+            body (str or bytes): The new body of the link.
+
+        """
+
+        link_type = self._expanded_links[link]['type']
+
+        with self._put_lock:
+            version = self._expanded_links[link].get('version', -1) + 1
+            etag = '{0}:{1}'.format(self._instance_id, version)
+            entry = {'type': link_type, 'body': body, 'version': version, 'etag': etag, 'encoded': {}}
+            self._encode_responses(entry, self._codec)
+            self._expanded_links[link] = entry
+
+    def _encode_responses(self, entry, response_codec):
+        """Gets the encoded responses to a GET request for a link.  Responses for each codec are encoded once per version of the link.
+
+        If the body is larger than the node's chunk size, the full response is a header followed by the body in chunks.  The chunks are the
+        same for every codec.
+
+        Args:
+            entry (dict): The link's entry in the expanded links.
+            response_codec: Codec with which to encode the responses.
+
+        Returns:
+            A tuple (messages, not_modified) of the list of encoded messages making up the full response, and the encoded 'not modified'
+            response.
+
+        """
+
+        encoded = entry['encoded'].get(response_codec.name)
+
+        if(encoded is None):
+            body = entry['body']
+            data = body.encode(encoding='UTF-8') if isinstance(body, str) else body
+            not_modified = utils.create_response(_http_codes['not_modified'], None, entry['type'], etag=entry['etag'])
+
+            if(isinstance(data, bytes) and len(data) > self._chunk_size):
+                if('chunks' not in entry):
+                    entry['chunks'] = utils.create_chunks(entry['etag'], data, self._chunk_size)
+
+                header = utils.create_response(_http_codes['success'], None, entry['type'], etag=entry['etag'])
+                header.update({'chunks': len(entry['chunks']), 'size': len(data), 'encoding': 'str' if isinstance(body, str) else 'bytes'})
+                messages = [response_codec.encode(header)] + entry['chunks']
+            else:
+                response = utils.create_response(_http_codes['success'], body, entry['type'], etag=entry['etag'])
+                messages = [response_codec.encode(response)]
+
+            encoded = (messages, response_codec.encode(not_modified))
+            entry['encoded'][response_codec.name] = encoded
+
+        return encoded
+
+    def publish(self, link, data):
+        """Publishes data on a particular link.  Link should have been classified as STREAM in node descriptor.
+
+        If batching is enabled for the link (see enable_batching), the data is added to the link's current batch instead of being sent
+        immediately.  If the link's descriptor has a 'shared_memory' size, the data is written to a shared memory ring (see
+        vizier.shm.SharedMemoryRing), and only a small frame describing it is sent.  Subscribers on other hosts cannot read such links.
+
+        Args:
+            link (str): Link on which data is published.
+            data (bytes): Bytes to be published over MQTT, or any object supporting the buffer protocol (e.g., bytearray, memoryview or a
+                numpy array).  See mqttinterface.MQTTInterface.send_message for the copies made of the data.
+
+        Raises:
+            ValueError: If the provided link is not classified as STREAM.
+
+        """
+
+        if(link in self.publishable_links):
+            ring = self._shm_rings.get(link)
+            if(ring is not None):
+                data = ring.write(data)
+
+            batcher = self._batchers.get(link)
+            if(batcher is not None):
+                batcher.add(data)
+            else:
+                self._mqtt_client.send_message(link, data)
+        else:
+            error_msg = 'Link ({0}) not contained in publishable links ({1})'.format(link, self.publishable_links)
+            self._logger.error(error_msg)
+            raise ValueError(error_msg)
+
+    def enable_batching(self, link, flush_interval=0.005, max_batch=64):
+        """Batches the data published on a link, so that high-rate links send fewer, larger MQTT messages.  Subscribers unpack the batches
+        transparently.
+
+        Args:
+            link (str): Link on which data is published.
+            flush_interval (double, optional): Maximum time in seconds that data waits in a batch before it is sent.
+            max_batch (int, optional): Maximum number of messages in a batch.
+
+        Raises:
+            ValueError: If the provided link is not classified as STREAM.
+
+        """
+
+        if(link not in self.publishable_links):
+            error_msg = 'Link ({0}) not contained in publishable links ({1})'.format(link, self.publishable_links)
+            self._logger.error(error_msg)
+            raise ValueError(error_msg)
+
+        self.disable_batching(link)
+        self._batchers[link] = _Batcher(lambda x: self._mqtt_client.send_message(link, x), self._scheduler, flush_interval, max_batch)
+
+    def disable_batching(self, link):
+        """Stops batching the data published on a link.  Any data in the current batch is sent.
+
+        Args:
+            link (str): Link on which data is published.
+
+        """
+
+        batcher = self._batchers.pop(link, None)
+        if(batcher is not None):
+            batcher.flush()
+
+    def get(self, link, timeout=0.20, attempts=5, retry_policy=None):
+        """Make a get request on a particular link, provided that the link is in the gettable links for the node.
+
+        Args:
+            link (str): Link on which GET request is made.
+            timeout (double): Timeout for GET request.
+            attempts (int): Number of times to attempt each GET request.
+            retry_policy (retry.RetryPolicy, optional): Determines when the requests are retransmitted.  Overrides timeout and attempts.
+
+        Returns:
+            Data that was retrieved from the link as a JSON-formatted dict, or None if the request failed.
+
+        Raises:
+            ValueErorr: If link is not classified as gettable (remote DATA).
+
+        """
+
+        if(retry_policy is None):
+            retry_policy = retry.RetryPolicy.fixed(timeout, attempts, stats=self.retry_stats)
+
+        return self._wait_for_responses({link: self.get_async(link, retry_policy=retry_policy)}, retry_policy)[link]
+
+    def get_async(self, link, timeout=0.20, attempts=5, retry_policy=None):
+        """Make a get request on a particular link without blocking, provided that the link is in the gettable links for the node.
+
+        The returned future is resolved from the MQTT client's thread when the response arrives.
+
+        Args:
+            link (str): Link on which GET request is made.
+            timeout (double): Timeout for GET request.
+            attempts (int): Number of times to attempt each GET request.
+            retry_policy (retry.RetryPolicy, optional): Determines when the requests are retransmitted.  Overrides timeout and attempts.
+
+        Returns:
+            A concurrent.futures.Future resolving to the data retrieved from the link, or None if the request failed.
+
+        Raises:
+            ValueError: If link is not classified as gettable (remote DATA).
+
+        """
+
+        if(link not in self.gettable_links):
+            error_msg = 'Link ({0}) not contained in gettable links ({1})'.format(link, self.gettable_links)
+            self._logger.error(error_msg)
+            raise ValueError(error_msg)
+
+        future = futures.Future()
+
+        def f(response_future):
+            response = response_future.result()
+            if(future.set_running_or_notify_cancel()):
+                future.set_result(None if response is None else response['body'])
+
+        self._get_async(link, timeout=timeout, attempts=attempts, retry_policy=retry_policy).add_done_callback(f)
+
+        return future
+
+    def _get_async(self, link, timeout=0.20, attempts=5, retry_policy=None):
+        """Makes a conditional GET request on a link without blocking.
+
+        If a response for the link has been cached, its ETag is sent with the request.  If the link has not changed, the responder replies
+        with a small 'not modified' response, and the cached response is used instead.
+
+        Args:
+            link (str): Link on which GET request is made.
+            timeout (double): Timeout for GET request.
+            attempts (int): Number of times to attempt each GET request.
+            retry_policy (retry.RetryPolicy, optional): Determines when the requests are retransmitted.  Overrides timeout and attempts.
+
+        Returns:
+            A concurrent.futures.Future resolving to a JSON-formatted dict representing the full response, or None if the request failed.
+
+        """
+
+        cached = self._get_cache.get(link)
+        body = {} if cached is None else {'if_none_match': cached['etag']}
+        future = futures.Future()
+
+        def f(response_future):
+            response = response_future.result()
+
+            if(response is not None):
+                if(response.get('status') == _http_codes['not_modified'] and cached is not None):
+                    response = cached
+                elif('etag' in response):
+                    self._get_cache[link] = response
+
+            if(future.set_running_or_notify_cancel()):
+                future.set_result(response)
+
+        self._make_request_async('GET', link, body, timeout=timeout, attempts=attempts, retry_policy=retry_policy).add_done_callback(f)
+
+        return future
+
+    def get_stream(self, link, timeout=0.20, attempts=5, retry_policy=None):
+        """Make a get request on a particular link, provided that the link is in the gettable links for the node, and iterate over the body
+        as it arrives.
+
+        Large bodies are sent in chunks, which are yielded in order as soon as they arrive.  Smaller bodies are yielded all at once.
+
+        Args:
+            link (str): Link on which GET request is made.
+            timeout (double): Timeout for GET request.
+            attempts (int): Number of times to attempt each GET request.
+            retry_policy (retry.RetryPolicy, optional): Determines when the requests are retransmitted.  Overrides timeout and attempts.
+
+        Returns:
+            An iterator over the body of the link, as bytes.  String bodies are UTF-8 encoded.  The iterator raises a RuntimeError if the
+            request fails.
+
+        Raises:
+            ValueError: If link is not classified as gettable (remote DATA).
+
+        """
+
+        if(link not in self.gettable_links):
+            error_msg = 'Link ({0}) not contained in gettable links ({1})'.format(link, self.gettable_links)
+            self._logger.error(error_msg)
+            raise ValueError(error_msg)
+
+        q = queue.Queue()
+        future = self._make_request_async('GET', link, {}, timeout=timeout, attempts=attempts, retry_policy=retry_policy, on_data=q.put)
+
+        def body():
+            data = q.get()
+            while(data is not None):
+                yield data
+                data = q.get()
+
+            if(future.result() is None):
+                error_msg = 'GET request on link ({}) failed'.format(link)
+                self._logger.error(error_msg)
+                raise RuntimeError(error_msg)
+
+        return body()
+
+    def get_many(self, links, timeout=0.20, attempts=5, retry_policy=None):
+        """Make get requests on several links at once, provided that all the links are in the gettable links for the node.
+
+        All of the requests are sent before waiting on any of the responses.
+
+        Args:
+            links (list): Links on which GET requests are made.
+            timeout (double): Timeout for each GET request.
+            attempts (int): Number of times to attempt each GET request.
+            retry_policy (retry.RetryPolicy, optional): Determines when the requests are retransmitted.  Overrides timeout and attempts.
+
+        Returns:
+            A dict mapping each link to the data retrieved from it, or None if the request for that link failed.
+
+        Raises:
+            ValueError: If any link is not classified as gettable (remote DATA).
+
+        """
+
+        not_gettable = [x for x in links if x not in self.gettable_links]
+        if(not_gettable):
+            error_msg = 'Links ({0}) not contained in gettable links ({1})'.format(not_gettable, self.gettable_links)
+            self._logger.error(error_msg)
+            raise ValueError(error_msg)
+
+        if(retry_policy is None):
+            retry_policy = retry.RetryPolicy.fixed(timeout, attempts, stats=self.retry_stats)
+
+        requests = {x: self.get_async(x, retry_policy=retry_policy) for x in links}
+
+        return self._wait_for_responses(requests, retry_policy)
+
+    def subscribe(self, link, maxsize=0, policy=mqtt.DropPolicy.BLOCK, as_memoryview=False):
+        """Subscribes to the provided link with the underlying MQTT client, provided that the link is in the subscribable links for the node.
+
+        Each message received over MQTT is a bytes object allocated by Paho.  With as_memoryview, no further copies are made: messages are
+        memoryviews of that object, and the messages of a batch are views into it.  Otherwise, each message of a batch is copied out of it.
+
+        For example, to always read the most recent message with bounded memory
+
+        .. code-block:: python
+
+            q = node.subscribe('node_b/stream', policy=mqtt.DropPolicy.LATEST)
+
+        Args:
+            link (str): Link to which the node should subscribe.
+            maxsize (int, optional): Maximum number of queued messages.  If less than or equal to 0, the queue is unbounded.
+            policy (mqttinterface.DropPolicy, optional): What to do with a message that arrives when the queue is full.
+            as_memoryview (bool, optional): Whether messages are put in the queue as memoryviews of the received payload.
+
+        Returns:
+            A mqttinterface.SubscriptionQueue containing all future messages on the link.  Its dropped attribute counts the discarded messages.
+
+        Raises:
+            ValueError: If link is not classified as subscrbable (remote STREAM).
+
+        """
+
+        if(link in self.subscribable_links):
+            q = self._create_queue(maxsize, policy)
+            self._subscribe_unbatched(link, q.offer, as_memoryview=as_memoryview)
+            return q
+        else:
+            raise ValueError('Link ({0}) not contained in subscribable_links ({1})'.format(link, self.subscribable_links))
+
+    def _create_queue(self, maxsize, policy):
+        """Creates the queue into which the messages of a subscription are put."""
+
+        return mqtt.SubscriptionQueue(maxsize=maxsize, policy=policy)
+
+    def _subscribe_unbatched(self, link, callback, mode=mqtt.ExecutionMode.INLINE, max_pending=1024, as_memoryview=False):
+        """Subscribes to a link, unpacking any batches (see enable_batching) so that the callback is called once for each message.  Data
+        sent through shared memory is passed to the callback as a memoryview of the publisher's ring (see vizier.shm.SharedMemoryReader.read).
+
+        Args:
+            link (str): Link to which the node subscribes.
+            callback (function): Called with each message on the link.
+            mode (mqttinterface.ExecutionMode, optional): Thread on which the callback runs.
+            max_pending (int, optional): Maximum number of messages waiting for the callback in the POOL and SERIAL modes.
+            as_memoryview (bool, optional): Whether messages are passed to the callback as memoryviews of the received payload.  The
+                messages of a batch are then views into the batch, rather than copies of its parts.
+
+        Returns:
+            The mqttinterface.Subscription.
+
+        """
+
+        def f(msg):
+            if(as_memoryview and not isinstance(msg, memoryview)):
+                msg = memoryview(msg)
+
+            batch = utils.parse_batch(msg)
+            for x in ([msg] if batch is None else batch):
+                # Data sent through shared memory is read directly from the publisher's ring
+                frame = shm.parse_frame(x)
+                if(frame is not None):
+                    x = self._shm_reader.read(frame)
+                    if(x is None):
+                        self._logger.warning('Could not read data on link ({}) from shared memory'.format(link))
+                        continue
+
+                callback(x)
+
+        return self._mqtt_client.subscribe_with_callback(link, f, mode=mode, max_pending=max_pending)
+
+    def subscribe_latest(self, link, as_memoryview=False):
+        """Subscribes to the provided link, provided that the link is in the subscribable links for the node, keeping only the most recent
+        message.  Suited to control loops, which only need the newest sample of a link.
+
+        Args:
+            link (str): Link to which the node should subscribe.
+            as_memoryview (bool, optional): Whether messages are held as memoryviews of the received payload.
+
+        Returns:
+            A mqttinterface.LatestValue holding the most recent message on the link.
+
+        Raises:
+            ValueError: If link is not classified as subscrbable (remote STREAM).
+
+        """
+
+        if(link in self.subscribable_links):
+            latest = mqtt.LatestValue()
+            self._subscribe_unbatched(link, latest.offer, as_memoryview=as_memoryview)
+            return latest
+        else:
+            raise ValueError('Link ({0}) not contained in subscribable links ({1})'.format(link, self.subscribable_links))
+
+    def subscribe_with_callback(self, link, callback, mode=mqtt.ExecutionMode.INLINE, max_pending=1024, as_memoryview=False):
+        """Subscribes to link with the callback using the underlying MQTT client.
+
+        Args:
+            link (str): Link to which the client subscribes.
+            callback (function): All messages recieved on link are passed through this function.
+            mode (mqttinterface.ExecutionMode, optional): Thread on which the callback runs.  Slow callbacks should not run INLINE, since
+                they delay every other message received by the node.
+            max_pending (int, optional): Maximum number of messages waiting for the callback in the POOL and SERIAL modes.
+            as_memoryview (bool, optional): Whether messages are passed to the callback as memoryviews of the received payload, which avoids
+                copying the messages of batches (see subscribe).
+
+        Returns:
+            The mqttinterface.Subscription, which reports statistics about the callback.
+
+        Raises:
+            ValueError: If the provided link is not subscribable (remote STREAM).
+
+        """
+
+        if(link in self.subscribable_links):
+            return self._subscribe_unbatched(link, callback, mode=mode, max_pending=max_pending, as_memoryview=as_memoryview)
+        else:
+            raise ValueError('Link ({0}) not contained in subscribable links ({1})'.format(link, self.subscribable_links))
+
+    def unsubscribe(self, link):
+        """If the specified link is in the subscribable links, the node unsubscribes from the link.
+
+        Args:
+            link (str): Link from which the node unsubscribes.
+
+        Raises:
+            ValueError: If the provided link is not subscribable (remote STREAM).
+
+        """
+
+        if(link in self.subscribable_links):
+            self._mqtt_client.unsubscribe(link)
+        else:
+            raise ValueError('Link ({0}) not contained in subscribable links ({1})'.format(link, self.subscribable_links))
+
+    def verify_dependencies(self, attempts=10, timeout=0.25, retry_policy=None):
+        """Verifies the node's dependencies.  In particular, it attempts to make a GET request for each required request in the node descriptor.
+
+        Args:
+            attempts (int): number of times to attempt the GET requests.
+            timeout (float): timeout for the GET requests in seconds.
+            retry_policy (retry.RetryPolicy, optional): Determines when the requests are retransmitted.  Overrides timeout and attempts.
+
+        Raises:
+            ValueError: If the requests were not present on the network.
+
+        """
+
+        # Get required requests.  Key 'required' will be present due to prior parsing
+        required_links = [x for x, y in self._requested_links.items() if y['required']]
+        if(retry_policy is None):
+            retry_policy = retry.RetryPolicy.fixed(timeout, attempts, stats=self.retry_stats)
+
+        requests = {x: self._make_request_async('GET', x, {}, retry_policy=retry_policy) for x in required_links}
+
+        self._check_dependencies(self._wait_for_responses(requests, retry_policy))
+
+    def _check_dependencies(self, receive_results):
+        """Checks the results of the GET requests made to verify the node's dependencies.
+
+        Args:
+            receive_results (dict): Mapping of each required link to its response, or None if the request failed.
+
+        Raises:
+            ValueError: If the requests were not present on the network.
+
+        """
+
+        # Ensure that all required links were obtained
+        deps_satisfied = True
+        failed_to_get = []
+        for x, y in receive_results.items():
+            if y is None:
+                # At this point, 'required' key is definitely included from the parsing, so we can just check for it
+                if(self._requested_links[x]['required']):
+                    deps_satisfied = False
+                    failed_to_get.append(x)
+                else:
+                    self._logger.error('Could not get required link ({})'.format(x))
+
+        # If one of the required links couldn't be obtained, throw an error
+        if (not deps_satisfied):
+            raise ValueError('Could not get required links ({})'.format(failed_to_get))
 
-                {
-                    'end_point': 'node'
-                    'links':
-                    {
-                        '/link': {'type': 'STREAM'}
-                    }
-                    'requests':
-                    [
-                        {
-                            'link': 'node_b/link',
-                            'type': 'DATA',
-                            'required': false
-                        }
-                    ]
-                }
+        self._logger.info('Succesfully connected to vizier network')
 
-        _end_point (str): Endpoint of the node.
-        _expanded_links (dict): JSON-formatted dict containing the recursively expanded links.  For example, the above node descriptor would expand to
+    def start(self, attempts=10, timeout=0.25, retry_policy=None):
+        """Start the MQTT client and connect to the vizier network
 
-            .. code-block:: python
+        The node's descriptor is published as a retained message on vizier/discovery/<end_point>, so that it can be discovered without a
+        request.  It is removed when the node stops, or by the broker (through the node's last will) if the node loses its connection.
+        Nodes that share a connection pool (see mqttinterface.ConnectionPool) have no will, so their descriptor is only removed when they
+        stop.
 
-                {
-                    'node/link': {'type': 'STREAM'}
-                }
+        Args:
+            attempts (int):  Number of times to attempt each GET request.
+            timeout (double): Timeout for each GET Request.
+            retry_policy (retry.RetryPolicy, optional): Determines when the requests are retransmitted.  Overrides timeout and attempts.
 
-        _requested_links (dict): JSON-formatted dict containing the requests for the node.  For example, the request from the above node descriptor would
-        be
+        Raises:
+            ValueError: If all required links were not available on the network.
 
-            .. code-block:: python
+        """
 
-                {
-                    'node_b/link': {'link': 'node_b/link', 'type': 'DATA', 'required': false}
-                }
+        self._set_will()
+        self._start_client()
 
-        _request_channel (str): Channel on which requests are made.  Always <end_point>/'requests'.
-        _logger (logging.Logger): Logger for the node.
-        puttable_links (list): List of links to which data may be put.  These links are the node's links that are of type DATA.
-        publishable_links (list):  List of links to which data may be published.  These links are the node's links that are of type STREAM.
-        gettable_links (list): List of links from which data may be retrieved.  These links are the node's requested links that are of type DATA.
-        subscribable_links (list):  List of links to which the node can subscribe.  These links are the node's requested links that are of type STEAM.
+        # Subscribe to requests channel with request handler
+        self._mqtt_client.subscribe_with_callback(self._request_channel, self._handle_request)
+        self._publish_descriptor()
 
-    """
+        self.verify_dependencies(attempts=attempts, timeout=timeout, retry_policy=retry_policy)
 
-    def __init__(self, host, port, node_descriptor, max_workers=20):
+    def _start_client(self):
+        """Starts the MQTT client and the request scheduler, and subscribes to the responses for all of the node's requests."""
 
-        # Executor for parallelizing requests
-        self._executor = futures.ThreadPoolExecutor(max_workers=max_workers)
+        # Start the MQTT client to ensure we can attach this callback
+        self._mqtt_client.start()
+        self._scheduler.start()
+        self._open_shared_memory()
 
-        # Setting up MQTT client as well as the dicts to hold DATA information
-        self._host = host
-        self._port = port
-        self._mqtt_client = mqtt.MQTTInterface(port=self._port, host=self._host)
-        self._node_descriptor = node_descriptor
+        # Subscribe to responses for all of our requests
+        self._mqtt_client.subscribe_with_callback(self._response_channel, self._handle_response, with_topic=True)
 
-        # Store the end point of the node for convenience
-        self._end_point = node_descriptor['end_point']
+    def _set_will(self):
+        """Sets the node's last will, which removes its retained descriptor if the node loses its connection without stopping."""
 
-        # Recursively expand the links from the provided descriptor file
-        # All data regarding the link, including the body, is stored in this dictionary.  Various requests will
-        # usually access it to retrieve this data
-        self._expanded_links, self._requested_links = utils.generate_links_from_descriptor(self._node_descriptor)
+        self._mqtt_client.set_will(self._discovery_channel, b'', retain=True)
 
-        # By convention, the node descriptor is always on this link
-        self._expanded_links[self._end_point + '/node_descriptor'] = {'type': 'DATA', 'body': json.dumps(self._node_descriptor)}
+    def _publish_descriptor(self):
+        """Publishes the node's descriptor as a retained birth message, so that it is discovered by subscribers to the discovery channels
+        (see vizier.Vizier.start).  It is published again whenever the client reconnects, since the node's will removes it when the
+        connection is lost.  The descriptor is the same as the body of the <node>/node_descriptor link.
+        """
 
-        # Channel on which requests are received
-        self._request_channel = utils.create_request_link(self._end_point)
+        descriptor = self._expanded_links[self._end_point + '/node_descriptor']['body']
+        self._mqtt_client.set_birth(self._discovery_channel, descriptor.encode(encoding='UTF-8'), retain=True)
+        self._discoverable = True
 
-        # Logging
-        self._logger = log.get_logger()
+    def _withdraw_descriptor(self):
+        """Removes the node's retained descriptor, so that stopped nodes are not discovered."""
 
-        # Figure out which topics are providing etc...
-        # Make sure to remove <node>/node_descriptor as a puttable topic, as this is dedicated
-        self.puttable_links = {x for x, y in self._expanded_links.items() if y['type'] == 'DATA'} - {self._end_point + '/node_descriptor'}
-        self.publishable_links = {x for x, y in self._expanded_links.items() if y['type'] == 'STREAM'}
+        if(self._discoverable):
+            self._mqtt_client.clear_birth(self._discovery_channel)
+            self._mqtt_client.send_message(self._discovery_channel, b'', retain=True)
+            self._discoverable = False
 
-        # Parse out data/stream topics
-        self.gettable_links = {x for x, y in self._requested_links.items() if y['type'] == 'DATA'}
-        self.subscribable_links = {x for x, y in self._requested_links.items() if y['type'] == 'STREAM'}
+    def _flush_batches(self):
+        """Sends the current batch of every link on which data is batched."""
 
-    def _make_request(self, method, link, body, request_id=None, attempts=15, timeout=0.25):
-        """Makes a request for data on a particular topic.  The exact action depends on the specified method.
+        for x in list(self._batchers):
+            self.disable_batching(x)
 
-        Args:
-            method (str): Method for request (e.g., 'GET').
-            link (str): Link on which to make request.
-            body (dict): JSON-formatted dict representing the body of the message.
-            request_id (str, optional): Unique request ID for this message.
-            attempts (int, optional): Number of times to retry the request, if it times out.
-            timeout (double, optional): Timeout to wait for return message on each request.
+    def _open_shared_memory(self):
+        """Creates the shared memory rings of the node's STREAM links that send their data through shared memory."""
 
-        Returns:
-            A JSON-formatted dict representing the contents of the message.
+        for x, y in self._shm_sizes.items():
+            self._shm_rings[x] = shm.SharedMemoryRing(y)
 
-        """
+    def _close_shared_memory(self):
+        """Removes the node's shared memory rings, and detaches from those of other nodes."""
 
-        # If we didn't get a request_id, create one
-        if not request_id:
-            request_id = utils.create_message_id(self._end_point)
+        for x in self._shm_rings.values():
+            x.close()
+        self._shm_rings.clear()
+        self._shm_reader.close()
 
-        # Set up request/response link for this request
-        to_node = link.split('/')[0]
-        request_link = utils.create_request_link(to_node)
-        response_link = utils.create_response_link(to_node, request_id)
+    def stop(self):
+        """Stop the MQTT client"""
 
-        q = self._mqtt_client.subscribe(response_link)
-        decoded_message = None
-        encoded_request = json.dumps(utils.create_request(request_id, method, link, body)).encode(encoding='UTF-8')
+        self._flush_batches()
+        self._withdraw_descriptor()
+        self._scheduler.stop()
+        self._mqtt_client.stop()
+        if(self._request_lanes is not None):
+            self._request_lanes.shutdown()
+        self._close_shared_memory()
+        self._fail_pending_requests()
 
-        # Repeat request a number of times based on the specified number of attempts
-        for _ in range(attempts):
-            self._mqtt_client.send_message(request_link, encoded_request)
+    def _fail_pending_requests(self):
+        """Fails any outstanding requests, since they can no longer be answered."""
 
-            # We expect this to potentially fail with a timeout
-            try:
-                mqtt_message = q.get(timeout=timeout)
-            except Exception:
-                # Don't try to decode message if we didn't get anything
-                self._logger.info('Retrying (%s) request for node (%s) for link (%s)' % (method, to_node, link))
-                continue
+        with self._pending_lock:
+            pending = list(self._pending_requests.values())
+            self._pending_requests.clear()
 
-            # Try to decode packet.  Could potentially fail
-            try:
-                decoded_message = json.loads(mqtt_message.decode(encoding='UTF-8'))
-                break
-            except Exception:
-                # Just pass here because we expect to fail.  In the future,
-                # split the exceptions up into reasonable cases
-                self._logger.error('Could not decode network message')
+        for x in pending:
+            self._resolve_request(x, None)
 
-        if(decoded_message is None):
-            self._logger.error('Get request on topic ({}) failed'.format(link))
 
-        # Make sure that we unsubscribe from the response channel, and, finally, return the decoded message
-        self._mqtt_client.unsubscribe(response_link)
 
-        return decoded_message
+class AsyncNode(Node):
+    """Creates a node on a vizier network that runs on an asyncio event loop.
 
-    def _handle_request(self, network_message):
-        """Private function for handling incoming network requests.  All requests on the channel <node_name>/requests
-        are passed to this function.  Then, responses are returned on the channel <node_name>/responses/<message_id>.
+    The underlying MQTT client's socket is driven by the event loop (see mqttinterface.AsyncMQTTInterface), and requests, responses and
+    retransmissions are all handled on the loop.  Links are checked in the same way as for Node.  All methods must be called from the
+    event loop.
 
-        Args:
-            network_message (bytes): A UTF-8-encoded string representing a JSON-formatted request message.
+    For example,
 
-        """
+    .. code-block:: python
 
-        # Make request handler for vizier network.  Later this function is attached as a callback to
-        # <node_name>/requests to handle incoming requests.  All requests are passed through this function
-        encountered_error = False
-        try:
-            decoded_message = json.loads(network_message.decode(encoding='UTF-8'))
-        except Exception as e:
-            self._logger.error('Received undecodable network message in request handler')
-            self._logger.error(repr(e))
-            encountered_error = True
+        node = AsyncNode('localhost', 1884, node_descriptor)
+        await node.start()
+        data = await node.get('node_b/link')
+        async for msg in node.subscribe('node_b/stream'):
+            await node.publish('node/stream', msg)
 
-        # Check to make sure that it's a valid request
-        # TODO: Handle error in a more specific way
-        if('id' not in decoded_message):
-            # This is an error.  Return from the callback
-            self._logger.error('Request received without valid id')
-            encountered_error = True
-        else:
-            message_id = decoded_message['id']
+    """
 
-        if('method' not in decoded_message):
-            # This is an error.  Return from the callback
-            self._logger.error('Request received without valid method')
-            encountered_error = True
-        else:
-            method = decoded_message['method']
+    def __init__(self, host, port, node_descriptor, chunk_size=_chunk_size):
+        # Requests are handled on the event loop
+        super().__init__(host, port, node_descriptor, chunk_size=chunk_size, request_workers=0)
 
-        if('link' not in decoded_message):
-            # This is an error.  Return from the callback
-            self._logger.error('Request received without valid link')
-            encountered_error = True
-        else:
-            requested_link = decoded_message['link']
+    def _create_client(self, connection_pool, loopback):
+        """Creates the node's MQTT client, whose socket is driven by the event loop."""
 
-        if(encountered_error):
-            # TODO: Create and send error message
-            # response = utils.create_response(_http_codes['not_found'], {"error": "Encountered error in request"}, "ERROR")
-            # response_channel = utils.create_response_link(self.end_point, message_id)
-            return
+        return mqtt.AsyncMQTTInterface(port=self._port, host=self._host)
 
-        # We have a valid request at this point
-        if(method == 'GET'):
-            self._logger.info('Received GET request for topic %s' % requested_link)
-            self._logger.info(repr(decoded_message))
-            # Handle the get request by looking for information under the specified URI
-            if(requested_link in self._expanded_links):
-                # If we have any record of this URI, create a response message
-                response = utils.create_response(_http_codes['success'],
-                                                 self._expanded_links[requested_link]['body'], self._expanded_links[requested_link]['type'])
-                response_channel = utils.create_response_link(self._end_point, message_id)
-                self._mqtt_client.send_message(response_channel, json.dumps(response).encode(encoding='UTF-8'))
+    def _create_scheduler(self):
+        """Creates the scheduler that retransmits the node's requests on the event loop."""
 
-        # TODO: Handle other methods
+        return _LoopScheduler()
 
-    def put(self, link, info):
-        """Puts data on a particular link.
+    def _create_future(self):
+        """Creates the future on which the response to a request is delivered."""
 
-        This data is retrievable from other nodes via a GET request.
+        return asyncio.get_running_loop().create_future()
 
-        Args:
-            link (str): Link on which to place data.
-            info (dict): JSON-formatted dict representing gettable data.
+    def _complete_future(self, future, result):
+        """Sets the result of a future created by _create_future, unless the task awaiting it has been cancelled."""
 
-        Raises:
-            ValueError: If the provided link is not classified as DATA.
+        if(not future.done()):
+            future.set_result(result)
 
-        """
+    def _create_queue(self, maxsize, policy):
+        """Creates the queue into which the messages of a subscription are put."""
 
-        # Ensure type of info
-        if(type(info) is not str):
-            error_msg = 'Type of info must be str was ({})'.format(type(info))
-            self._logger.error(error_msg)
-            raise ValueError(error_msg)
+        return mqtt.AsyncSubscriptionQueue(maxsize=maxsize, policy=policy)
 
-        # Ensure that the link has been specified by the node descriptor
+    async def _make_request(self, method, link, body, request_id=None, attempts=15, timeout=0.25, retry_policy=None):
+        """Makes a request for data on a particular topic.  See Node._make_request.
 
-        dedicated = self._end_point + '/node_descriptor'
-        if(link is dedicated):
-            error_msg = 'Cannot PUT to dedicated link ({})'.format(dedicated)
-            self._logger.error(error_msg)
-            raise ValueError(error_msg)
+        Returns:
+            A JSON-formatted dict representing the contents of the message.
 
-        if(link in self.puttable_links):
-            # This operation should be threadsafe (for future reference)
-            # Ensure that the link is of type DATA
-            self._expanded_links[link]['body'] = info
-        else:
-            error_msg = 'Link ({0}) not in puttable links ({1})'.format(link, self.puttable_links)
-            self._logger.error(error_msg)
-            raise ValueError(error_msg)
+        """
 
-    def publish(self, link, data):
+        return await self._make_request_async(method, link, body, request_id=request_id, attempts=attempts, timeout=timeout,
+                                              retry_policy=retry_policy)
+
+    async def publish(self, link, data):
         """Publishes data on a particular link.  Link should have been classified as STREAM in node descriptor.
 
         Args:
@@ -272,20 +1916,16 @@ class Node:
 
         """
 
-        if(link in self.publishable_links):
-            self._mqtt_client.send_message(link, data)
-        else:
-            error_msg = 'Link ({0}) not contained in publishable links ({1})'.format(link, self.publishable_links)
-            self._logger.error(error_msg)
-            raise ValueError(error_msg)
+        super().publish(link, data)
 
-    def get(self, link, timeout=0.20, attempts=5):
+    async def get(self, link, timeout=0.20, attempts=5, retry_policy=None):
         """Make a get request on a particular link, provided that the link is in the gettable links for the node.
 
         Args:
             link (str): Link on which GET request is made.
             timeout (double): Timeout for GET request.
             attempts (int): Number of times to attempt each GET request.
+            retry_policy (retry.RetryPolicy, optional): Determines when the requests are retransmitted.  Overrides timeout and attempts.
 
         Returns:
             Data that was retrieved from the link as a JSON-formatted dict.
@@ -295,124 +1935,172 @@ class Node:
 
         """
 
-        if(link in self.gettable_links):
-            response = self._make_request('GET', link, {}, timeout=timeout, attempts=attempts)
-            if response is None:
-                return
-            else:
-                return response['body']
-        else:
-            error_msg = 'Link ({0}) not contained in gettable links ({1})'.format(link, self.gettable_links)
-            self._logger.error(error_msg)
-            raise ValueError(error_msg)
+        return await self.get_async(link, timeout=timeout, attempts=attempts, retry_policy=retry_policy)
 
-    def subscribe(self, link):
-        """Subscribes to the provided link with the underlying MQTT client, provided that the link is in the subscribable links for the node.
+    def get_async(self, link, timeout=0.20, attempts=5, retry_policy=None):
+        """Make a get request on a particular link, provided that the link is in the gettable links for the node.
 
         Args:
-            link (str): Link to which the node should subscribe.
+            link (str): Link on which GET request is made.
+            timeout (double): Timeout for GET request.
+            attempts (int): Number of times to attempt each GET request.
+            retry_policy (retry.RetryPolicy, optional): Determines when the requests are retransmitted.  Overrides timeout and attempts.
+
+        Returns:
+            An asyncio.Future resolving to the data retrieved from the link, or None if the request failed.
 
         Raises:
-            ValueError: If link is not classified as subscrbable (remote STREAM).
+            ValueErorr: If link is not classified as gettable (remote DATA).
 
         """
 
-        if(link in self.subscribable_links):
-            q = self._mqtt_client.subscribe(link)
-            return q
-        else:
-            raise ValueError('Link ({0}) not contained in subscribable_links ({1})'.format(link, self.subscribable_links))
+        return asyncio.wrap_future(super().get_async(link, timeout=timeout, attempts=attempts, retry_policy=retry_policy))
 
-    def subscribe_with_callback(self, link, callback):
-        """Subscribes to link with the callback using the underlying MQTT client.
+    def get_stream(self, link, timeout=0.20, attempts=5, retry_policy=None):
+        """Make a get request on a particular link, provided that the link is in the gettable links for the node, and iterate over the body
+        as it arrives.  See Node.get_stream.
 
         Args:
-            link (str): Link to which the client subscribes.
-            callback (function): All messages recieved on link are passed through this function.
+            link (str): Link on which GET request is made.
+            timeout (double): Timeout for GET request.
+            attempts (int): Number of times to attempt each GET request.
+            retry_policy (retry.RetryPolicy, optional): Determines when the requests are retransmitted.  Overrides timeout and attempts.
+
+        Returns:
+            An asynchronous iterator over the body of the link, as bytes.  The iterator raises a RuntimeError if the request fails.
 
         Raises:
-            ValueError: If the provided link is not subscribable (remote STREAM).
+            ValueError: If link is not classified as gettable (remote DATA).
 
         """
 
-        if(link in self.subscribable_links):
-            self._mqtt_client.subscribe_with_callback(link, callback)
-        else:
-            raise ValueError('Link ({0}) not contained in subscribable links ({1})'.format(link, self.subscribable_links))
+        if(link not in self.gettable_links):
+            error_msg = 'Link ({0}) not contained in gettable links ({1})'.format(link, self.gettable_links)
+            self._logger.error(error_msg)
+            raise ValueError(error_msg)
 
-    def unsubscribe(self, link):
-        """If the specified link is in the subscribable links, the node unsubscribes from the link.
+        q = asyncio.Queue()
+        future = self._make_request_async('GET', link, {}, timeout=timeout, attempts=attempts, retry_policy=retry_policy, on_data=q.put_nowait)
+
+        async def body():
+            data = await q.get()
+            while(data is not None):
+                yield data
+                data = await q.get()
+
+            if((await future) is None):
+                error_msg = 'GET request on link ({}) failed'.format(link)
+                self._logger.error(error_msg)
+                raise RuntimeError(error_msg)
+
+        return body()
+
+    async def get_many(self, links, timeout=0.20, attempts=5, retry_policy=None):
+        """Make get requests on several links at once, provided that all the links are in the gettable links for the node.
 
         Args:
-            link (str): Link from which the node unsubscribes.
+            links (list): Links on which GET requests are made.
+            timeout (double): Timeout for each GET request.
+            attempts (int): Number of times to attempt each GET request.
+            retry_policy (retry.RetryPolicy, optional): Determines when the requests are retransmitted.  Overrides timeout and attempts.
+
+        Returns:
+            A dict mapping each link to the data retrieved from it, or None if the request for that link failed.
 
         Raises:
-            ValueError: If the provided link is not subscribable (remote STREAM).
+            ValueError: If any link is not classified as gettable (remote DATA).
 
         """
 
-        if(link in self.subscribable_links):
-            self._mqtt_client.unsubscribe(link)
-        else:
-            raise ValueError('Link ({0}) not contained in subscribable links ({1})'.format(link, self.subscribable_links))
+        not_gettable = [x for x in links if x not in self.gettable_links]
+        if(not_gettable):
+            error_msg = 'Links ({0}) not contained in gettable links ({1})'.format(not_gettable, self.gettable_links)
+            self._logger.error(error_msg)
+            raise ValueError(error_msg)
+
+        requests = {x: self.get_async(x, timeout=timeout, attempts=attempts, retry_policy=retry_policy) for x in links}
+
+        return {x: (await y) for x, y in requests.items()}
+
+    def subscribe(self, link, maxsize=0, policy=mqtt.DropPolicy.BLOCK, as_memoryview=False):
+        """Subscribes to the provided link with the underlying MQTT client, provided that the link is in the subscribable links for the node.
+
+        The node unsubscribes from the link when the returned iterator is closed.
+
+        Args:
+            link (str): Link to which the node should subscribe.
+            maxsize (int, optional): Maximum number of queued messages.  If less than or equal to 0, the queue is unbounded.
+            policy (mqttinterface.DropPolicy, optional): What to do with a message that arrives when the queue is full.  May only be BLOCK
+                if the queue is unbounded.
+            as_memoryview (bool, optional): Whether messages are memoryviews of the received payload.
+
+        Returns:
+            An asynchronous iterator over all future messages on the link.
 
-    def verify_dependencies(self, attempts=10, timeout=0.25):
+        Raises:
+            ValueError: If link is not classified as subscrbable (remote STREAM), or the queue is bounded and the policy is BLOCK.
+
+        """
+
+        q = super().subscribe(link, maxsize=maxsize, policy=policy, as_memoryview=as_memoryview)
+
+        async def messages():
+            try:
+                while True:
+                    yield await q.get()
+            finally:
+                self._mqtt_client.unsubscribe(link)
+
+        return messages()
+
+    async def verify_dependencies(self, attempts=10, timeout=0.25, retry_policy=None):
         """Verifies the node's dependencies.  In particular, it attempts to make a GET request for each required request in the node descriptor.
 
         Args:
             attempts (int): number of times to attempt the GET requests.
             timeout (float): timeout for the GET requests in seconds.
+            retry_policy (retry.RetryPolicy, optional): Determines when the requests are retransmitted.  Overrides timeout and attempts.
 
         Raises:
             ValueError: If the requests were not present on the network.
 
         """
 
-        # Executor for handling multiple GET requests
-        # Get required requests.  Key 'required' will be present due to prior parsing
         required_links = [x for x, y in self._requested_links.items() if y['required']]
-        receive_results = dict(zip(required_links, self._executor.map(lambda x: self._make_request('GET', x, {}, timeout=timeout, attempts=attempts),
-                                                                      required_links)))
-
-        # Ensure that all required links were obtained
-        deps_satisfied = True
-        failed_to_get = []
-        for x, y in receive_results.items():
-            if y is None:
-                # At this point, 'required' key is definitely included from the parsing, so we can just check for it
-                if(self._requested_links[x]['required']):
-                    deps_satisfied = False
-                    failed_to_get.append(x)
-                else:
-                    self._logger.error('Could not get required link ({})'.format(x))
-
-        # If one of the required links couldn't be obtained, throw an error
-        if (not deps_satisfied):
-            raise ValueError('Could not get required links ({})'.format(failed_to_get))
+        requests = {x: self._make_request_async('GET', x, {}, timeout=timeout, attempts=attempts, retry_policy=retry_policy) for x in required_links}
 
-        self._logger.info('Succesfully connected to vizier network')
+        self._check_dependencies({x: (await y) for x, y in requests.items()})
 
-    def start(self, attempts=10, timeout=0.25):
-        """Start the MQTT client and connect to the vizier network
+    async def start(self, attempts=10, timeout=0.25, retry_policy=None):
+        """Start the MQTT client on the running event loop and connect to the vizier network
 
         Args:
             attempts (int):  Number of times to attempt each GET request.
             timeout (double): Timeout for each GET Request.
+            retry_policy (retry.RetryPolicy, optional): Determines when the requests are retransmitted.  Overrides timeout and attempts.
 
         Raises:
             ValueError: If all required links were not available on the network.
 
         """
 
-        # Start the MQTT client to ensure we can attach this callback
-        self._mqtt_client.start()
+        self._set_will()
+        await self._mqtt_client.start()
+        self._scheduler.start()
+        self._open_shared_memory()
 
-        # Subscribe to requests channel with request handler
+        self._mqtt_client.subscribe_with_callback(self._response_channel, self._handle_response, with_topic=True)
         self._mqtt_client.subscribe_with_callback(self._request_channel, self._handle_request)
+        self._publish_descriptor()
 
-        self.verify_dependencies(attempts=attempts, timeout=timeout)
+        await self.verify_dependencies(attempts=attempts, timeout=timeout, retry_policy=retry_policy)
 
-    def stop(self):
+    async def stop(self):
         """Stop the MQTT client"""
 
-        self._mqtt_client.stop()
+        self._flush_batches()
+        self._withdraw_descriptor()
+        self._scheduler.stop()
+        await self._mqtt_client.stop()
+        self._close_shared_memory()
+        self._fail_pending_requests()
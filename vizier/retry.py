@@ -0,0 +1,150 @@
+import random
+import threading
+
+
+class RetryStats():
+    """Thread-safe counters describing the retransmission behavior of requests.
+
+    Attributes:
+        _lock (threading.Lock): Lock protecting the counters.
+        _counts (dict): Current value of each counter.
+
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {'requests': 0, 'responses': 0, 'retries': 0, 'timeouts': 0, 'late_responses': 0}
+
+    def increment(self, counter):
+        """Thread safe.  Increments a counter.
+
+        Args:
+            counter (str): One of 'requests', 'responses', 'retries', 'timeouts' or 'late_responses'.
+
+        """
+
+        with self._lock:
+            self._counts[counter] += 1
+
+    def get(self):
+        """Thread safe.  Retrieves the current counts.
+
+        Returns:
+            A dict containing the number of requests sent, responses received, retransmissions (retries), requests that failed because
+            they ran out of time or attempts (timeouts) and responses that arrived after their request was resolved (late_responses).  For example
+
+            .. code-block:: python
+
+                {'requests': 10, 'responses': 9, 'retries': 3, 'timeouts': 1, 'late_responses': 2}
+
+        """
+
+        with self._lock:
+            return dict(self._counts)
+
+    def reset(self):
+        """Thread safe.  Sets all counters to zero."""
+
+        with self._lock:
+            for x in self._counts:
+                self._counts[x] = 0
+
+
+class RetryPolicy():
+    """Determines how requests are retransmitted when no response arrives.
+
+    The wait after the n-th attempt (starting at 0) is min(timeout * backoff^n, max_timeout), scaled by a random factor in [1 - jitter, 1 + jitter]
+    so that nodes retrying at the same time spread out.  Requests are retried until the deadline passes or the attempts are exhausted,
+    whichever is first.  For example, the following policy waits 0.1, 0.2, 0.4, 0.8, 1, 1, ... seconds (plus jitter) for up to 5 seconds total
+
+    .. code-block:: python
+
+        RetryPolicy(timeout=0.1, backoff=2, max_timeout=1, jitter=0.2, deadline=5)
+
+    Attributes:
+        timeout (double): Time to wait for a response to the first attempt.
+        backoff (double): Factor by which the wait grows after each attempt.
+        max_timeout (double): Maximum wait for any one attempt.
+        jitter (double): Fraction by which each wait is randomly scaled.
+        deadline (double): Overall time allowed for the request, or None for no deadline.
+        attempts (int): Maximum number of attempts, or None for no limit.
+        stats (RetryStats): Counters for the requests made with this policy.
+
+    """
+
+    def __init__(self, timeout=0.1, backoff=2.0, max_timeout=1.0, jitter=0.2, deadline=5.0, attempts=None, stats=None):
+
+        if(deadline is None and attempts is None):
+            raise ValueError('Retry policy must have a deadline or a number of attempts')
+
+        if(jitter < 0 or jitter >= 1):
+            raise ValueError('Jitter must be in [0, 1) was ({})'.format(jitter))
+
+        self.timeout = timeout
+        self.backoff = backoff
+        self.max_timeout = max_timeout
+        self.jitter = jitter
+        self.deadline = deadline
+        self.attempts = attempts
+        self.stats = RetryStats() if stats is None else stats
+
+    @classmethod
+    def fixed(cls, timeout, attempts, stats=None):
+        """Creates a policy that waits the same time after every attempt, with no jitter or deadline.
+
+        Args:
+            timeout (double): Time to wait for a response to each attempt.
+            attempts (int): Maximum number of attempts.
+            stats (RetryStats, optional): Counters for the requests made with this policy.
+
+        Returns:
+            A RetryPolicy.
+
+        """
+
+        return cls(timeout=timeout, backoff=1.0, max_timeout=timeout, jitter=0.0, deadline=None, attempts=attempts, stats=stats)
+
+    def max_duration(self):
+        """Computes the longest time that a request made with this policy can take, from its first attempt until it fails.
+
+        Returns:
+            The time in seconds.
+
+        """
+
+        if(self.attempts is None):
+            return self.deadline
+
+        duration = 0
+        for attempt in range(self.attempts):
+            duration += min(self.timeout * (self.backoff ** attempt), self.max_timeout) * (1 + self.jitter)
+            if(self.deadline is not None and duration >= self.deadline):
+                return self.deadline
+
+        return duration
+
+    def attempt_timeout(self, attempt, elapsed):
+        """Computes the time to wait for a response to an attempt.
+
+        Args:
+            attempt (int): Index of the attempt, starting from 0.
+            elapsed (double): Time in seconds since the first attempt was sent.
+
+        Returns:
+            The time in seconds to wait for a response, or None if the attempt should not be made.
+
+        """
+
+        if(self.attempts is not None and attempt >= self.attempts):
+            return None
+
+        timeout = min(self.timeout * (self.backoff ** attempt), self.max_timeout)
+        timeout *= 1 + random.uniform(-self.jitter, self.jitter)
+
+        if(self.deadline is not None):
+            remaining = self.deadline - elapsed
+            if(remaining <= 0):
+                return None
+            timeout = min(timeout, remaining)
+
+        return timeout
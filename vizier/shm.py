@@ -0,0 +1,189 @@
+import os
+import binascii
+import struct
+import threading
+from multiprocessing import shared_memory, resource_tracker
+
+# Frames are sent over MQTT in place of the data, which is written to the ring
+_frame_magic = b'\x00VZS'
+_frame_header = struct.Struct('>QQIH')
+
+# Each slot of the ring starts with the sequence number and length of the data in it
+_slot_header = struct.Struct('>QI')
+
+
+def create_frame(name, seq, offset, length):
+    """Creates the frame describing data written to a shared memory ring.
+
+    Args:
+        name (str): Name of the ring's shared memory segment.
+        seq (int): Sequence number of the data.
+        offset (int): Offset of the data's slot in the segment.
+        length (int): Length of the data in bytes.
+
+    Returns:
+        The frame as bytes
+
+    """
+
+    encoded_name = name.encode(encoding='UTF-8')
+    return _frame_magic + _frame_header.pack(seq, offset, length, len(encoded_name)) + encoded_name
+
+
+def parse_frame(message):
+    """Parses a frame created by create_frame.
+
+    Args:
+        message (bytes): A message received on a STREAM link.
+
+    Returns:
+        A tuple (name, seq, offset, length), or None if the message is not a frame.
+
+    """
+
+    if(message[:len(_frame_magic)] != _frame_magic or len(message) < len(_frame_magic) + _frame_header.size):
+        return None
+
+    seq, offset, length, name_length = _frame_header.unpack_from(message, len(_frame_magic))
+    start = len(_frame_magic) + _frame_header.size
+
+    return bytes(message[start:start+name_length]).decode(encoding='UTF-8'), seq, offset, length
+
+
+class SharedMemoryRing():
+    """A ring buffer in shared memory, into which a node writes the data published on a link.  Only a small frame describing where the data
+    was written is sent over MQTT, and subscribers on the same host read the data directly from shared memory.
+
+    Each write takes the next slot of the ring, wrapping around to the start when the end is reached, so data is overwritten once the
+    writer has gone around the ring.  Each slot is marked with a sequence number, so readers can tell when this has happened.
+
+    Attributes:
+        name (str): Name of the shared memory segment.
+        size (int): Size of the segment in bytes.
+
+    """
+
+    def __init__(self, size):
+        self.name = 'vz_' + binascii.hexlify(os.urandom(8)).decode()
+        self.size = size
+        self._shm = shared_memory.SharedMemory(name=self.name, create=True, size=size)
+        self._lock = threading.Lock()
+        self._offset = 0
+        self._seq = 0
+
+    def write(self, data):
+        """Thread safe.  Writes data to the next slot of the ring.
+
+        Args:
+            data: Any object supporting the buffer protocol (e.g., bytes, memoryview or a numpy array).
+
+        Returns:
+            The frame describing the data (see create_frame).
+
+        Raises:
+            ValueError: If the data does not fit in the ring.
+
+        """
+
+        if(isinstance(data, str)):
+            data = data.encode(encoding='UTF-8')
+
+        view = memoryview(data).cast('B')
+        length = len(view)
+        needed = _slot_header.size + length
+
+        if(needed > self.size):
+            raise ValueError('Data of size ({0}) does not fit in shared memory ring of size ({1})'.format(length, self.size))
+
+        with self._lock:
+            if(self._offset + needed > self.size):
+                self._offset = 0
+
+            self._seq += 1
+            offset = self._offset
+            buf = self._shm.buf
+
+            # Mark the slot as being written, so that readers of the data previously in it don't use it
+            _slot_header.pack_into(buf, offset, 0, length)
+            buf[offset+_slot_header.size:offset+needed] = view
+            _slot_header.pack_into(buf, offset, self._seq, length)
+
+            self._offset += needed
+            return create_frame(self.name, self._seq, offset, length)
+
+    def close(self):
+        """Closes and removes the shared memory segment."""
+
+        self._shm.close()
+        self._shm.unlink()
+
+
+class SharedMemoryReader():
+    """Reads the data described by frames (see create_frame) from the shared memory rings of other nodes on the same host.
+
+    Segments are attached when the first frame for them is read.
+
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._segments = {}
+
+    def _attach(self, name):
+        """Thread safe.  Gets the segment with the given name, or None if it is not on this host."""
+
+        with self._lock:
+            segment = self._segments.get(name)
+            if(segment is not None):
+                return segment
+
+            try:
+                try:
+                    segment = shared_memory.SharedMemory(name=name, track=False)
+                except TypeError:
+                    # Before Python 3.13, attached segments are tracked, and would be removed when this process exits
+                    segment = shared_memory.SharedMemory(name=name)
+                    resource_tracker.unregister(segment._name, 'shared_memory')
+            except FileNotFoundError:
+                return None
+
+            self._segments[name] = segment
+            return segment
+
+    def read(self, frame):
+        """Thread safe.  Reads the data described by a frame, without copying it.
+
+        The returned memoryview refers directly to the shared memory, so it only holds the data until the writer goes around the ring.
+        Copy it (e.g., with bytes()) to keep the data.
+
+        Args:
+            frame (tuple): The parsed frame (see parse_frame).
+
+        Returns:
+            A memoryview of the data, or None if the segment is not on this host or the data has been overwritten.
+
+        """
+
+        name, seq, offset, length = frame
+        segment = self._attach(name)
+        if(segment is None or offset + _slot_header.size + length > segment.size):
+            return None
+
+        if(_slot_header.unpack_from(segment.buf, offset) != (seq, length)):
+            return None
+
+        start = offset + _slot_header.size
+        return segment.buf[start:start+length]
+
+    def close(self):
+        """Detaches from all segments.  Segments whose data is still referenced stay attached until the references are released."""
+
+        with self._lock:
+            segments = list(self._segments.values())
+            self._segments.clear()
+
+        for x in segments:
+            try:
+                x.close()
+            except BufferError:
+                pass
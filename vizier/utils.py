@@ -1,5 +1,9 @@
 import binascii
+import functools
+import json
 import os
+import struct
+import types
 
 # Global definitions for particular key names
 _get_response_types = {'data', 'link', 'stream'}
@@ -9,6 +13,19 @@ _response_types = {'DATA', 'STREAM'}
 _descriptor_keys = {'type': True, 'body': False}
 GetResponseTypeError = ValueError
 
+# Chunks of large responses are framed as <magic><index><count><etag length><etag><data>.  The first byte of the magic distinguishes chunks
+# from encoded messages (see vizier.codec)
+_chunk_magic = b'\x00VZC'
+_chunk_header = struct.Struct('>IIH')
+_batch_magic = b'\x00VZB'
+_batch_length = struct.Struct('>I')
+
+# Nodes publish their descriptors as retained messages on <prefix>/<node_name>, so that they can be discovered with one subscription
+_discovery_prefix = 'vizier/discovery'
+
+# Number of distinct node descriptors whose compiled form is kept (see compile_descriptor)
+_compiled_descriptor_cache_size = 1024
+
 
 def create_message_id(node):
     """Creates a unique message id for a request.
@@ -21,18 +38,23 @@ def create_message_id(node):
     return node + '/' + binascii.hexlify(os.urandom(20)).decode()
 
 
-def create_response(status, body, topic_type):
+def create_response(status, body, topic_type, etag=None):
     """Creates a response message suitable for the vizier network.
 
     Args:
         status (int): Status integer for response
+        etag (str, optional): Identifies the version of the body.  Requesters may send it back as 'if_none_match' in the body of a later request.
 
     Returns:
         A JSON-formatted dict representing the response message
 
     """
 
-    return {'status': status, 'body': body, 'type': topic_type}
+    response = {'status': status, 'body': body, 'type': topic_type}
+    if(etag is not None):
+        response['etag'] = etag
+
+    return response
 
 
 def create_response_link(node, message_id):
@@ -50,6 +72,44 @@ def create_response_link(node, message_id):
     return '/'.join([node, 'responses', message_id])
 
 
+def create_response_filter(node):
+    """Creates the wildcard channel that matches every response to requests made by the given node.
+
+    Message IDs are of the form <node_name>/<random_hex> (see create_message_id), so all responses to a node's requests,
+    from any other node, can be received through a single subscription.
+
+    Args:
+        node (str): Name of the node making the requests
+
+    Returns:
+        String of the form +/responses/<node_name>/#
+
+    """
+
+    return '/'.join(['+', 'responses', node, '#'])
+
+
+def parse_response_link(link):
+    """Splits a response link into the responding node and the message id.
+
+    Args:
+        link (str): Response link of the form <node_name>/responses/message_id
+
+    Returns:
+        A tuple (node_name, message_id)
+
+    Raises:
+        ValueError: If the link is not a valid response link
+
+    """
+
+    tokens = link.split('/', 2)
+    if(len(tokens) != 3 or tokens[1] != 'responses'):
+        raise ValueError('Link (%s) is not a valid response link' % link)
+
+    return tokens[0], tokens[2]
+
+
 def create_request_link(node):
     """Creates the appropriate request channel for a given node
 
@@ -64,6 +124,52 @@ def create_request_link(node):
     return '/'.join([node, 'requests'])
 
 
+def create_discovery_link(node):
+    """Creates the channel on which a node publishes its descriptor for discovery.
+
+    Args:
+        node (str):  Name of the node
+
+    Returns:
+        String of the form vizier/discovery/<node_name>
+
+    """
+
+    return '/'.join([_discovery_prefix, node])
+
+
+def create_discovery_filter():
+    """Creates the wildcard channel that matches the discovery channels of all nodes.
+
+    Returns:
+        String of the form vizier/discovery/+
+
+    """
+
+    return '/'.join([_discovery_prefix, '+'])
+
+
+def parse_discovery_link(link):
+    """Gets the name of the node from a discovery channel.
+
+    Args:
+        link (str): Discovery channel of the form vizier/discovery/<node_name>
+
+    Returns:
+        The name of the node
+
+    Raises:
+        ValueError: If the link is not a valid discovery channel
+
+    """
+
+    prefix, _, node = link.rpartition('/')
+    if(prefix != _discovery_prefix or not node):
+        raise ValueError('Link (%s) is not a valid discovery link' % link)
+
+    return node
+
+
 def create_request(request_id, method, link, body):
     """Create vizier request message.
 
@@ -71,7 +177,9 @@ def create_request(request_id, method, link, body):
         id (str):  Unique identifier for request.  Ideally, should be somethign large and random
         method (str):  Method for request (e.g., GET)
         link (str):  Link on which request is made
-        body (dict): JSON-formatted dict containing the body for the request (could be optional)
+        body (dict): JSON-formatted dict containing the body for the request (could be optional).  For a GET request, the body may contain
+            'if_none_match' with the ETag of a previous response, in which case a 'not modified' (304) response is returned if the link is unchanged.
+            It may also contain 'chunks', a list of chunk indices, and 'etag', in which case only those chunks of a large response are resent
 
     Returns:
         JSON-formatted dict respresenting the request message.  This message can be published on the requests channel
@@ -81,6 +189,101 @@ def create_request(request_id, method, link, body):
     return {'id': request_id, 'method': method, 'link': link, 'body': body}
 
 
+def create_chunks(etag, data, chunk_size):
+    """Splits data into framed chunks, suitable for sending on a response link.
+
+    Args:
+        etag (str): Identifies the version of the data, so that chunks of different versions are never combined.
+        data (bytes): Data to be split.
+        chunk_size (int): Maximum number of bytes of data in each chunk.
+
+    Returns:
+        A list of framed chunks (bytes)
+
+    """
+
+    encoded_etag = etag.encode(encoding='UTF-8')
+    count = max((len(data) + chunk_size - 1) // chunk_size, 1)
+
+    return [_chunk_magic + _chunk_header.pack(i, count, len(encoded_etag)) + encoded_etag + data[i*chunk_size:(i+1)*chunk_size]
+            for i in range(count)]
+
+
+def parse_chunk(message):
+    """Parses a framed chunk created by create_chunks.
+
+    Args:
+        message (bytes): A message received on a response link.
+
+    Returns:
+        A tuple (etag, index, count, data), or None if the message is not a chunk.
+
+    """
+
+    if(message[:len(_chunk_magic)] != _chunk_magic or len(message) < len(_chunk_magic) + _chunk_header.size):
+        return None
+
+    offset = len(_chunk_magic)
+    index, count, etag_length = _chunk_header.unpack_from(message, offset)
+    offset += _chunk_header.size
+    etag = bytes(message[offset:offset+etag_length]).decode(encoding='UTF-8')
+
+    return etag, index, count, message[offset+etag_length:]
+
+
+def create_batch(messages):
+    """Packs several messages into a single framed message, suitable for publishing on a STREAM link.
+
+    Args:
+        messages (list): Messages (bytes, or any object supporting the buffer protocol) to be packed.  Strings are UTF-8 encoded.
+
+    Returns:
+        The framed batch as bytes
+
+    """
+
+    parts = [_batch_magic, _batch_length.pack(len(messages))]
+    for x in messages:
+        if(isinstance(x, str)):
+            x = x.encode(encoding='UTF-8')
+        elif(not isinstance(x, (bytes, bytearray))):
+            # The length of other buffers (e.g., numpy arrays) is not necessarily their size in bytes
+            x = memoryview(x)
+            x = x.cast('B') if x.c_contiguous else x.tobytes()
+        parts.append(_batch_length.pack(len(x)))
+        parts.append(x)
+
+    return b''.join(parts)
+
+
+def parse_batch(message):
+    """Unpacks a framed batch created by create_batch.
+
+    Args:
+        message (bytes): A message received on a STREAM link.  If it is a memoryview, the messages are views into it, rather than copies.
+
+    Returns:
+        A list of the messages (bytes) in the batch, or None if the message is not a batch.
+
+    """
+
+    if(message[:len(_batch_magic)] != _batch_magic or len(message) < len(_batch_magic) + _batch_length.size):
+        return None
+
+    offset = len(_batch_magic)
+    count, = _batch_length.unpack_from(message, offset)
+    offset += _batch_length.size
+
+    messages = []
+    for _ in range(count):
+        length, = _batch_length.unpack_from(message, offset)
+        offset += _batch_length.size
+        messages.append(message[offset:offset+length])
+        offset += length
+
+    return messages
+
+
 def is_subpath_of(superpath, subpath, delimiter='/'):
     """Checks if subpath is a subpath of superpath
 
@@ -153,11 +356,149 @@ def extract_keys(descriptor):
     # Initialize body to empty dict
     extracted['body'] = ""
 
+    # STREAM links may opt in to sending their data through shared memory, giving the size of the ring in bytes
+    if('shared_memory' in descriptor):
+        extracted['shared_memory'] = descriptor['shared_memory']
+
     return extracted
 
 
+class CompiledDescriptor():
+    """Immutable, expanded form of a node descriptor (see compile_descriptor).  Compiled descriptors are hashable, and compare equal if
+    the descriptors they were compiled from have the same content.
+
+    Attributes:
+        end_point (str): End point of the node.
+        links (mapping): Read-only mapping of each expanded link to its read-only entry (see extract_keys).
+        requests (mapping): Read-only mapping of each requested link to its read-only request, in which 'required' defaults to False.
+        data_links (frozenset): Links of type DATA.
+        stream_links (frozenset): Links of type STREAM.
+        shared_memory (mapping): Read-only mapping of each STREAM link that sends its data through shared memory to the size of its ring.
+        required_links (frozenset): Requested links that are required.
+        optional_links (frozenset): Requested links that are optional.
+        gettable_links (frozenset): Requested links of type DATA.
+        subscribable_links (frozenset): Requested links of type STREAM.
+
+    """
+
+    __slots__ = ('_key', 'end_point', 'links', 'requests', 'data_links', 'stream_links', 'shared_memory', 'required_links',
+                 'optional_links', 'gettable_links', 'subscribable_links')
+
+    def __init__(self, key, end_point, links, requests):
+        set_attribute = super().__setattr__
+        set_attribute('_key', key)
+        set_attribute('end_point', end_point)
+        set_attribute('links', types.MappingProxyType({x: types.MappingProxyType(y) for x, y in links.items()}))
+        set_attribute('requests', types.MappingProxyType({x: types.MappingProxyType(y) for x, y in requests.items()}))
+        set_attribute('data_links', frozenset(x for x, y in links.items() if y['type'] == 'DATA'))
+        set_attribute('stream_links', frozenset(x for x, y in links.items() if y['type'] == 'STREAM'))
+        set_attribute('shared_memory', types.MappingProxyType({x: links[x]['shared_memory'] for x in self.stream_links
+                                                               if 'shared_memory' in links[x]}))
+        set_attribute('required_links', frozenset(x for x, y in requests.items() if y['required']))
+        set_attribute('optional_links', frozenset(requests) - self.required_links)
+        set_attribute('gettable_links', frozenset(x for x, y in requests.items() if y['type'] == 'DATA'))
+        set_attribute('subscribable_links', frozenset(x for x, y in requests.items() if y['type'] == 'STREAM'))
+
+    def __setattr__(self, name, value):
+        raise AttributeError('Compiled descriptors are immutable')
+
+    def __delattr__(self, name):
+        raise AttributeError('Compiled descriptors are immutable')
+
+    def __eq__(self, other):
+        return isinstance(other, CompiledDescriptor) and self._key == other._key
+
+    def __hash__(self):
+        return hash(self._key)
+
+    def __repr__(self):
+        return 'CompiledDescriptor({})'.format(self._key)
+
+    def expand(self):
+        """Expands the descriptor into mutable copies of its links and requests, in the form returned by generate_links_from_descriptor.
+
+        Returns:
+            A tuple of a dict of the expanded links and a dict of the requests, which may be changed without affecting the compiled
+            descriptor.
+
+        """
+
+        return {x: dict(y) for x, y in self.links.items()}, {x: dict(y) for x, y in self.requests.items()}
+
+
+def _expand_descriptor(descriptor):
+    """Expands the links and requests of a descriptor in a single pass over its links (see compile_descriptor).  Does not change the
+    descriptor.
+    """
+
+    links = {}
+    # Each entry is the path of the parent link, the link as written in the descriptor, and the link's descriptor
+    remaining = [('', descriptor['end_point'], descriptor)]
+    while remaining:
+        path, link, local_descriptor = remaining.pop()
+
+        # Relative links are appended to the path of their parent.  Absolute links must be under the parent's path
+        if(link[0] == '/'):
+            link = path + link
+        elif(path and link != path and not link.startswith(path + '/')):
+            raise ValueError('Cannot have link (%s) that is not a subset of the current path (%s)' % (link, path))
+
+        children = local_descriptor.get('links')
+        if(children):
+            # A link with sub-links is itself a valid link if it has a type
+            if('type' in local_descriptor):
+                links[link] = extract_keys(local_descriptor)
+            remaining.extend((link, x, y) for x, y in reversed(list(children.items())))
+        elif('type' in local_descriptor):
+            links[link] = extract_keys(local_descriptor)
+        elif(children is None):
+            raise ValueError('Link ({}) has neither a type nor sub-links'.format(link))
+
+    requests = {}
+    for x in descriptor.get('requests', []):
+        if('link' not in x):
+            raise ValueError('Request type must be in proper format')
+
+        # Requests are optional unless specified otherwise
+        request = dict(x)
+        request.setdefault('required', False)
+        requests[x['link']] = request
+
+    return links, requests
+
+
+@functools.lru_cache(maxsize=_compiled_descriptor_cache_size)
+def _compile_descriptor(key):
+    """Compiles the descriptor serialized as key.  Memoized, so that descriptors with the same content are compiled once."""
+
+    descriptor = json.loads(key)
+    links, requests = _expand_descriptor(descriptor)
+
+    return CompiledDescriptor(key, descriptor['end_point'], links, requests)
+
+
+def compile_descriptor(descriptor):
+    """Compiles a node descriptor into an immutable, hashable form, which holds the expanded links and requests of the node and the sets of
+    links of each type.  Compiled descriptors are memoized by the content of the descriptor, so nodes and the vizier share the work of
+    expanding the same descriptor.
+
+    Args:
+        descriptor (dict): A JSON-formatted descriptor for the node (see generate_links_from_descriptor).  It is not changed.
+
+    Returns:
+        A CompiledDescriptor.
+
+    Raises:
+        ValueError: If the recursive definition of the link paths is invalid, or a link or request is malformed.
+
+    """
+
+    # Canonical serialization, which identifies descriptors with the same content
+    return _compile_descriptor(json.dumps(descriptor, sort_keys=True, separators=(',', ':')))
+
+
 def generate_links_from_descriptor(descriptor):
-    """Recursively parses a descriptor file, expanding links as it goes.  This function will
+    """Parses a descriptor file, expanding links as it goes.  This function will
     also check to ensure that all specified paths are valid, with respect to the local node.
 
     The descriptor is a JSON-formatted dict.  For example,
@@ -176,75 +517,19 @@ def generate_links_from_descriptor(descriptor):
             'requests': []
         }
 
+    The descriptor is expanded through compile_descriptor, so the expansion is memoized, and the descriptor and its requests are not
+    changed.
+
     Args:
         descriptor (dict):  A JSON-formatted descriptor for the node.
 
     Returns:
-        A dict containing the non-recursively defined links, and the requests of the node.  For example
+        A dict containing the non-recursively defined links, and the requests of the node, in which 'required' defaults to False.  Both
+        are copies, which the caller may change.
 
     Raises:
         ValueError: If the recursive definition of the link paths is invalid.
 
     """
 
-    def parse_links(path, link, local_descriptor):
-        """Sub function to be recursively called to process node descriptor
-
-        Args:
-            link (str): Link that is currently being parsed
-            local_descriptor (dict): Descriptor for link that is currently being parsed
-
-        Returns:
-            A dict representing the recursively parsed descriptors from this link down
-
-        Raises:
-            ValueError:  If the recursive definition of the link paths is invalid
-        """
-
-        link = combine_paths(path, link)
-
-        if not is_subpath_of(link, path):
-            # We want to ensure that this subset relation holds
-            raise ValueError('Cannot have link (%s) that is not a subset of the current path (%s)' % (link, path))
-
-        # If there are no more links from the current path, terminate the recursion and extract the relevant keys
-        if('links' not in local_descriptor or len(local_descriptor['links']) == 0):
-            if('type' in local_descriptor):
-                return {link: extract_keys(local_descriptor)}
-
-        # Else, recursively process all the links stemming from this one
-        local_links = {}
-        for x in local_descriptor['links']:
-            local_links.update(parse_links(link, x, local_descriptor['links'][x]))
-            # If the base path has a type attribute, include it as a valid link
-            if('type' in local_descriptor):
-                local_links[link] = extract_keys(local_descriptor)
-
-        return local_links
-
-    # Start recursion with an empty base path, the endpoint name, and the descriptor
-    expanded_links = parse_links('', descriptor['end_point'], descriptor)
-
-    requests = None
-    # Ensure that requests are present and get them (if present)
-    if('requests' in descriptor):
-        requests = descriptor['requests']
-    else:
-        requests = []
-
-    # Parse out required vs. optional requests.  Requests formatted as a string are assumed to be optional.  Those formatted as a dict are the most general
-    # and the type defaults to the Boolean value of the 'required' field
-    requests_d = {}
-    for x in requests:
-        # Check optional keys
-        if('required' not in x):
-            # optional key is included
-            x['required'] = False
-
-        # Put into dictionary rather than list form
-        if('link' in x):
-            requests_d[x['link']] = x
-        else:
-            raise ValueError('Request type must be in proper format')
-
-    return expanded_links, requests_d
+    return compile_descriptor(descriptor).expand()
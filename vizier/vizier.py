@@ -1,13 +1,30 @@
 import graphviz
 import vizier.utils as utils
 import vizier.node as node
+import vizier.mqttinterface as mqtt
+import vizier.retry as retry
 import concurrent.futures as futures
 import argparse
+import enum
 import logging
+import threading
 import time
 import json
 
 
+class TopologyChange(enum.Enum):
+    """Kinds of changes to the nodes on the network, which are passed to topology listeners (see Vizier.add_topology_listener).
+
+    JOINED means that a node started, UPDATED that a running node published a different descriptor, and LEFT that a node stopped or lost
+    its connection to the broker.
+
+    """
+
+    JOINED = 0
+    UPDATED = 1
+    LEFT = 2
+
+
 # TODO: Split up some of these functions into network query vs graph operations
 class Vizier(node.Node):
     """Handles inspection and dependency verification for the nodes passed into the network
@@ -38,52 +55,331 @@ class Vizier(node.Node):
         # To contain future node descriptors.
         self._nodes = nodes
 
-        # These attributes are set in the start method.
-        self._nodes_to_descriptors = None
-        self._link_graph = None
-        self._links = None
-
-    def start(self, attempts=15, timeout=0.25, max_workers=100):
+        # These attributes are filled in by the start method, and then kept up to date as nodes join and leave.  They are only changed
+        # while holding the condition's lock
+        self._topology = threading.Condition()
+        self._nodes_to_descriptors = {}
+        self._expanded_descriptors = {}
+        self._link_graph = {}
+        self._links = {}
+        self._last_change = time.monotonic()
+        self._topology_listeners = []
+
+        # Reverse indexes, kept up to date with the link graph, so that dependencies are verified without walking every request.  Maps each
+        # link to the node providing it, each requested link to the requesting nodes (and whether they require it), and each node to its
+        # unsatisfied required and optional requests
+        self._providers = {}
+        self._requesters = {}
+        self._unsatisfied = {}
+        self._optionally_unsatisfied = {}
+        # For each dependency changed by the current update, whether it was satisfied before the update (None if the request did not
+        # exist)
+        self._dependency_changes = {}
+        self._dependency_listeners = []
+
+    def start(self, attempts=15, timeout=0.25, max_workers=100, retry_policy=None, quiet_period=0.25):
         """Starts the vizier node
 
-        Starts the underlying MQTT client and makes GET requests for specified nodes.  These requests retrieve all the relevant data for the nodes so that
-        inspection can occur.  This data is only retrieved once and is static over the lifetime of the vizier object.
+        Starts the underlying MQTT client and discovers the nodes on the network.  Nodes publish their descriptors as retained messages
+        (see node.Node.start), so the descriptors of all running nodes, including nodes that were not specified, arrive through a single
+        subscription.  Discovery finishes once the specified nodes have been found, or no descriptor has arrived for the quiet period.
+        Descriptors of specified nodes that were not discovered are retrieved with GET requests.
+
+        Afterwards, the vizier keeps tracking the nodes on the network.  Nodes that start, change their descriptor or stop are added to,
+        updated in or removed from the link graph, and the topology listeners are notified (see add_topology_listener).
 
         Args:
             retries (int):  Number of times to retry the GET requests
             timeout (double): Timeout for the GET requests
+            retry_policy (retry.RetryPolicy, optional): Determines when the GET requests are retransmitted.  Overrides timeout and attempts.
+            quiet_period (double): Time in seconds without a new descriptor after which discovery finishes.
 
         """
-        self._mqtt_client.start()
+        self._start_client()
+
+        self._mqtt_client.subscribe_with_callback(utils.create_discovery_filter(), self._on_descriptor, with_topic=True)
+
+        with self._topology:
+            # The quiet period starts with the subscription, not when the vizier was created
+            self._last_change = time.monotonic()
+            # Without specified nodes, every node is discovered
+            while not (self._nodes and all(x in self._nodes_to_descriptors for x in self._nodes)):
+                remaining = self._last_change + quiet_period - time.monotonic()
+                if(remaining <= 0):
+                    break
+                self._topology.wait(remaining)
 
-        request_links = [x + '/node_descriptor' for x in self._nodes]
+            missing = [x for x in self._nodes if x not in self._nodes_to_descriptors]
+
+        request_links = [x + '/node_descriptor' for x in missing]
         # Paralellize GET requests
         with futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-            results = list(executor.map(lambda x: self._make_request('GET', x, {}, attempts=attempts, timeout=timeout), request_links))
+            results = list(executor.map(lambda x: self._make_request('GET', x, {}, attempts=attempts, timeout=timeout,
+                                                                         retry_policy=retry_policy), request_links))
 
         # Check that we got all the required node descriptors
         in_error = []
         for i, r in enumerate(results):
             if r is None:
-                in_error.append(self._nodes[i])
+                in_error.append(missing[i])
             else:
                 try:
-                    results[i] = json.loads(r['body'])
+                    self._update_node(missing[i], json.loads(r['body']))
                 except Exception as e:
-                    in_error.append(self._nodes[i])
+                    in_error.append(missing[i])
                     print(repr(e))
-                    results[i] = None
 
         # If not empty
         if(in_error):
             self._logger.warning('Could not retrieve descriptor for nodes ({}).'.format(in_error))
 
-        self._nodes_to_descriptors = dict({x: y for x, y in zip(self._nodes, results) if y is not None})
-        self._expanded_descriptors = dict({x: utils.generate_links_from_descriptor(y) for x, y in self._nodes_to_descriptors.items()})
-        self._link_graph = dict({x: {'links': y[0], 'requests': y[1]} for x, y in self._expanded_descriptors.items()})
-        self._links = dict({y: z for x in self._link_graph.values() for y, z in x['links'].items()})
+    def _on_descriptor(self, topic, message):
+        """Handles a descriptor published on a discovery channel (see utils.create_discovery_link).  An empty message means that the node
+        has stopped, or lost its connection to the broker.
+        """
+
+        try:
+            end_point = utils.parse_discovery_link(topic)
+            descriptor = json.loads(bytes(message).decode(encoding='UTF-8')) if len(message) > 0 else None
+        except Exception as e:
+            self._logger.warning('Could not parse descriptor on ({0}): {1}'.format(topic, repr(e)))
+            return
+
+        self._update_node(end_point, descriptor)
+
+    def _update_node(self, end_point, descriptor):
+        """Thread safe.  Updates the link graph with the descriptor of a node, changing only the entries of that node, and notifies the
+        topology listeners.
+
+        Args:
+            end_point (str): End point of the node.
+            descriptor (dict): The node's descriptor, or None if the node has left.
+
+        """
+
+        with self._topology:
+            previous = self._nodes_to_descriptors.get(end_point)
+            if(descriptor == previous):
+                return
+
+            if(descriptor is not None):
+                # Compile first, so that an invalid descriptor leaves the link graph unchanged.  Compiled descriptors are memoized, so a node
+                # that joins again with the same descriptor is not expanded again
+                compiled = utils.compile_descriptor(descriptor)
+
+            self._dependency_changes = {}
+            if(previous is not None):
+                self._remove_dependencies(end_point)
+                for x in self._link_graph.pop(end_point)['links']:
+                    self._links.pop(x, None)
+                del self._expanded_descriptors[end_point]
+                del self._nodes_to_descriptors[end_point]
+
+            if(descriptor is not None):
+                self._nodes_to_descriptors[end_point] = descriptor
+                self._expanded_descriptors[end_point] = compiled
+                self._link_graph[end_point] = {'links': compiled.links, 'requests': compiled.requests}
+                self._links.update(compiled.links)
+                self._add_dependencies(end_point)
+
+            if(descriptor is None):
+                change = TopologyChange.LEFT
+            elif(previous is None):
+                change = TopologyChange.JOINED
+            else:
+                change = TopologyChange.UPDATED
+
+            self._last_change = time.monotonic()
+            self._topology.notify_all()
+            listeners = list(self._topology_listeners)
+            newly_satisfied, newly_broken = self._dependency_delta()
+            dependency_listeners = list(self._dependency_listeners) if (newly_satisfied or newly_broken) else []
+
+        self._logger.info('Node ({0}) {1}'.format(end_point, change.name.lower()))
+
+        for x in listeners:
+            try:
+                x(change, end_point, descriptor)
+            except Exception as e:
+                self._logger.error('Topology listener raised an exception: {}'.format(repr(e)))
+
+        for x in dependency_listeners:
+            try:
+                x(newly_satisfied, newly_broken)
+            except Exception as e:
+                self._logger.error('Dependency listener raised an exception: {}'.format(repr(e)))
+
+    def _dependency_state(self, end_point, link):
+        """Whether a node's request for a link is satisfied, or None if the node does not request the link."""
+
+        if(end_point not in self._requesters.get(link, {})):
+            return None
+
+        return link in self._providers
+
+    def _track_dependency(self, end_point, link):
+        """Records the state of a dependency before the current update changes it (see _dependency_delta)."""
+
+        key = (end_point, link)
+        if(key not in self._dependency_changes):
+            self._dependency_changes[key] = self._dependency_state(end_point, link)
+
+    def _dependency_delta(self):
+        """Finds the dependencies that the current update has satisfied or broken.  New requests that are satisfied are not reported, and
+        neither are requests that were removed.  Must be called while holding the topology lock.
+
+        Returns:
+            A tuple of the newly satisfied and newly broken dependencies, each a list of dicts containing a node and a set of links.
+
+        """
+
+        newly_satisfied = {}
+        newly_broken = {}
+        for (x, y), before in self._dependency_changes.items():
+            after = self._dependency_state(x, y)
+            if(after is True and before is False):
+                newly_satisfied.setdefault(x, set()).add(y)
+            elif(after is False and before is not False):
+                newly_broken.setdefault(x, set()).add(y)
+
+        return ([{'node': x, 'links': y} for x, y in newly_satisfied.items()],
+                [{'node': x, 'links': y} for x, y in newly_broken.items()])
+
+    def _mark_unsatisfied(self, end_point, link, required):
+        """Adds a link to the unsatisfied requests of a node."""
+
+        unsatisfied = self._unsatisfied if required else self._optionally_unsatisfied
+        unsatisfied.setdefault(end_point, set()).add(link)
+
+    def _mark_satisfied(self, end_point, link, required):
+        """Removes a link from the unsatisfied requests of a node."""
+
+        unsatisfied = self._unsatisfied if required else self._optionally_unsatisfied
+        links = unsatisfied.get(end_point)
+        if(links is not None):
+            links.discard(link)
+            if(not links):
+                del unsatisfied[end_point]
+
+    def _add_dependencies(self, end_point):
+        """Adds the links and requests of a node in the link graph to the reverse indexes.  Takes time proportional to the number of links
+        and requests of the node, and of requests for its links.  Must be called while holding the topology lock.
+        """
+
+        for x in self._link_graph[end_point]['links']:
+            for y, required in self._requesters.get(x, {}).items():
+                self._track_dependency(y, x)
+                self._mark_satisfied(y, x, required)
+            self._providers[x] = end_point
+
+        for x, y in self._link_graph[end_point]['requests'].items():
+            self._track_dependency(end_point, x)
+            self._requesters.setdefault(x, {})[end_point] = y['required']
+            if(x not in self._providers):
+                self._mark_unsatisfied(end_point, x, y['required'])
+
+    def _remove_dependencies(self, end_point):
+        """Removes the links and requests of a node in the link graph from the reverse indexes (see _add_dependencies).  Must be called
+        while holding the topology lock.
+        """
+
+        for x, y in self._link_graph[end_point]['requests'].items():
+            self._track_dependency(end_point, x)
+            self._mark_satisfied(end_point, x, y['required'])
+            requesters = self._requesters[x]
+            del requesters[end_point]
+            if(not requesters):
+                del self._requesters[x]
+
+        for x in self._link_graph[end_point]['links']:
+            # Another node may have since provided the same link
+            if(self._providers.get(x) != end_point):
+                continue
+            for y, required in self._requesters.get(x, {}).items():
+                self._track_dependency(y, x)
+                self._mark_unsatisfied(y, x, required)
+            del self._providers[x]
+
+    def add_topology_listener(self, callback):
+        """Thread safe.  Adds a callback that is notified whenever a node joins, updates its descriptor or leaves.  Listeners added before
+        start are also notified of the nodes found by discovery.
+
+        For example,
+
+        .. code-block:: python
+
+            v.add_topology_listener(lambda change, end_point, descriptor: print(change, end_point))
+
+        Args:
+            callback (function): Called as callback(change, end_point, descriptor) from the MQTT client's thread, where change is a
+                TopologyChange and descriptor is the node's new descriptor (None if it left).
+
+        """
+
+        with self._topology:
+            self._topology_listeners.append(callback)
+
+    def remove_topology_listener(self, callback):
+        """Thread safe.  Removes a callback added by add_topology_listener.
+
+        Args:
+            callback (function): The callback.
+
+        Raises:
+            ValueError: If the callback is not a topology listener.
+
+        """
+
+        with self._topology:
+            if(callback not in self._topology_listeners):
+                error_msg = 'Callback ({}) is not a topology listener'.format(callback)
+                self._logger.error(error_msg)
+                raise ValueError(error_msg)
+
+            self._topology_listeners.remove(callback)
+
+    def add_dependency_listener(self, callback):
+        """Thread safe.  Adds a callback that is notified whenever a change to the network satisfies or breaks dependencies between nodes.
+        Each dependency is reported once, when its state changes, so listeners need not call verify_deps after every change.
+
+        Args:
+            callback (function): Called as callback(newly_satisfied, newly_broken) from the MQTT client's thread, where each argument is a
+                list of dicts containing a node and the set of its requested links.  For example, newly_broken could be
+                [{'node': 'b', 'links': {'a/a_sub'}}].
+
+        """
+
+        with self._topology:
+            self._dependency_listeners.append(callback)
+
+    def remove_dependency_listener(self, callback):
+        """Thread safe.  Removes a callback added by add_dependency_listener.
+
+        Args:
+            callback (function): The callback.
+
+        Raises:
+            ValueError: If the callback is not a dependency listener.
+
+        """
+
+        with self._topology:
+            if(callback not in self._dependency_listeners):
+                error_msg = 'Callback ({}) is not a dependency listener'.format(callback)
+                self._logger.error(error_msg)
+                raise ValueError(error_msg)
+
+            self._dependency_listeners.remove(callback)
 
     def visualize(self):
+        """Thread safe.  Prints the link graph in the graphviz format."""
+
+        with self._topology:
+            self._visualize()
+
+    def _visualize(self):
+        """Prints the link graph in the graphviz format.  Must be called while holding the topology lock."""
+
         graph = graphviz.Digraph(comment='System Graph')
 
         # Initialize graph and subgraph
@@ -118,51 +414,80 @@ class Vizier(node.Node):
         print('~~ PASTE THE ABOVE INTO GRAPHVIZ SOMEWHERE ~~')
 
     def verify_deps(self):
-        """Verifies the dependencies of the specified nodes.
+        """Thread safe.  Verifies the dependencies of the nodes on the network.
 
-        Ensures that for each request that has been made, that link is being provided by another provided node.
+        Ensures that for each request that has been made, that link is being provided by another node.  The unsatisfied requests are
+        kept up to date as nodes join and leave, so verification takes time proportional to the number of unsatisfied requests rather
+        than to the size of the network.  To be notified as dependencies are satisfied or broken, see add_dependency_listener.
 
         Returns:
-            True if all the inter-node dependencies are met
+            A dict containing the unsatisfied required ('unsatisfied') and optional ('optionally_unsatisfied') requests of each node.
+            For example
 
-        Raises:
-            ValueError: If any dependency is unsatified
+            .. code-block:: python
+
+                {
+                    'unsatisfied': [{'node': 'b', 'unsatisfied': {'a/a_sub'}}],
+                    'optionally_unsatisfied': [{'endpoint': 'b', 'unsatisfied': {'a/a_sub2'}}]
+                }
 
         """
-        # TODO: Modify this to account for new request structure
-        # Filter out optional dependencies
-        only_required = dict({x: {i for i, j in y['requests'].items() if j['required']} for x, y in self._link_graph.items()})
-        unsatisfied = [{'node': x, 'unsatisfied': y - y.intersection(self._links)}
-                       for x, y in only_required.items() if not y.issubset(self._links)]
+        with self._topology:
+            return self._verify_deps()
+
+    def _verify_deps(self):
+        """Verifies the dependencies in the link graph (see verify_deps).  Must be called while holding the topology lock."""
 
-        # Now only look at the optional dependencies and see if any are missing
-        only_optional = dict({x: {i for i, j in y['requests'].items() if not j['required']} for x, y in self._link_graph.items()})
-        optionally_unsatisfied = list([{'endpoint': x,
-                                        'unsatisfied': y - y.intersection(self._links)} for x, y in only_optional.items() if not y.issubset(self._links)])
+        unsatisfied = [{'node': x, 'unsatisfied': set(y)} for x, y in self._unsatisfied.items()]
+        optionally_unsatisfied = [{'endpoint': x, 'unsatisfied': set(y)} for x, y in self._optionally_unsatisfied.items()]
 
         return {'unsatisfied': unsatisfied, 'optionally_unsatisfied': optionally_unsatisfied}
 
     def get_links(self):
-        return self._links
+        """Thread safe.  Gets the links of all nodes on the network.
 
-    def listen(self, link, callback=print):
+        Returns:
+            A dict mapping each link to its entry in the expanded descriptor of its node.  The dict is a copy, which does not change as
+            nodes join and leave.
+
+        """
+
+        with self._topology:
+            return dict(self._links)
+
+    def listen(self, link, callback=print, with_topic=False):
         """Listens on a particular link for all information.  Topic must be subscribable (i.e., remote STREAM)
 
+        The link may contain the MQTT wildcards '+' and '#' to listen on many links at once.  For example, 'robot_1/#' listens on every link
+        of the node robot_1, and '+/status' listens on the status link of every node.
+
         Args:
             link (str): The link to which the vizier listens
+            callback (function): Called with each message on the link
+            with_topic (bool, optional): If True, the callback is called as callback(topic, message) rather than callback(message)
         """
 
-        if(link in self._links):
+        if(mqtt.is_wildcard(link)):
+            links = self.get_links()
+            matched = [x for x in links if mqtt.topic_matches(link, x)]
+            if(not matched):
+                self._logger.warning('Link ({}) does not match any link in retrieved node descriptors.'.format(link))
+            for x in matched:
+                if(links[x]['type'] != 'STREAM'):
+                    self._logger.warning('Link ({0}) matches ({1}), which is not of type STREAM'.format(link, x))
+        elif(link in self._links):
             if(self._links[link]['type'] != 'STREAM'):
                 self._logger.warning('Link ({0}) is not of type STREAM ({1})'.format(link, self._links[link]))
         else:
             self._logger.warning('Link ({}) not listed in retrieved node descriptors.'.format(link))
 
-        self._mqtt_client.subscribe_with_callback(link, callback)
+        self._mqtt_client.subscribe_with_callback(link, callback, with_topic=with_topic)
 
     def unlisten(self, link):
 
-        if(link in self._links):
+        if(mqtt.is_wildcard(link)):
+            pass
+        elif(link in self._links):
             if(self._links[link]['type'] != 'STREAM'):
                 self._logger.warning('Link ({0}) is not of type STREAM ({1}).'.format(link, self._links[link]))
         else:
@@ -170,7 +495,7 @@ class Vizier(node.Node):
 
         self._mqtt_client.unsubscribe(link)
 
-    def get(self, link, attempts=10, timeout=0.25):
+    def get(self, link, attempts=10, timeout=0.25, retry_policy=None):
 
         if(link in self._links):
             if(self._links[link]['type'] is not 'DATA'):
@@ -178,8 +503,11 @@ class Vizier(node.Node):
         else:
             self._logger.warning('Link ({}) not listed in retrieved node descriptors.'.format(link))
 
+        if(retry_policy is None):
+            retry_policy = retry.RetryPolicy.fixed(timeout, attempts, stats=self.retry_stats)
+
         st = time.time()
-        response = self._make_request('GET', link, {}, attempts=attempts, timeout=timeout)
+        response = self._wait_for_responses({link: self._get_async(link, retry_policy=retry_policy)}, retry_policy)[link]
         print(time.time() - st)
         return response
 
@@ -213,10 +541,14 @@ def main():
     action_group.add_argument('--visualize', action='store_true', help='Visualize the network')
     action_group.add_argument('--listen', nargs='+', help='Listen on the list of links')
     action_group.add_argument('--publish', nargs=2, help='Publish a value on a link')
+    action_group.add_argument('--watch', action='store_true', help='Print nodes as they join and leave the network')
 
     args = parser.parse_args()
 
     v = Vizier(args.host, args.port, args.nodes)
+    if(args.watch):
+        v.add_topology_listener(lambda change, end_point, descriptor: print(change.name, ':', end_point))
+
     try:
         v.start()
     except Exception as e:
@@ -253,6 +585,14 @@ def main():
                 v.unlisten(x)
     elif(args.publish):
         v.publish(args.publish[0], args.publish[1])
+    elif(args.watch):
+        print('ctrl+c to quit')
+
+        try:
+            while True:
+                time.sleep(5)
+        except KeyboardInterrupt:
+            pass
 
     else:
         print('No action supplied.')